@@ -1,6 +1,23 @@
 import { NextResponse } from "next/server";
 const OPENAI_API_KEY = process.env.OPENAI_API_KEY;
 const OPENAI_MODEL = process.env.OPENAI_MODEL || "gpt-4o-mini";
+// models/guardrail_server.py (long-lived, micro-batched guardrail daemon)
+const GUARDRAIL_URL = process.env.LOCAL_GUARDRAIL_URL || "http://127.0.0.1:8787";
+
+async function guardrail(input: unknown) {
+  try {
+    const r = await fetch(`${GUARDRAIL_URL}/v1/guardrail`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ input })
+    });
+    const data = await r.json();
+    const headers = r.headers.get("retry-after") ? { "Retry-After": r.headers.get("retry-after")! } : undefined;
+    return NextResponse.json(data, { status: r.status, headers });
+  } catch (err: any) {
+    return NextResponse.json({ ok: false, error: `guardrail daemon: ${String(err?.message ?? err)}` }, { status: 502 });
+  }
+}
 
 export async function GET() {
   const ok = Boolean(OPENAI_API_KEY);
@@ -9,11 +26,18 @@ export async function GET() {
 }
 
 export async function POST(req: Request) {
+  const body = await req.json().catch(() => ({}));
+  if (!body || typeof body !== "object" || Array.isArray(body)) {
+    return NextResponse.json({ ok: false, error: "body must be a JSON object" }, { status: 400 });
+  }
+  // {"input": {...}} is a guardrail check, served by the local daemon
+  if (body.input !== undefined) {
+    return guardrail(body.input);
+  }
   if (!OPENAI_API_KEY) {
     return NextResponse.json({ ok: false, error: "Missing OPENAI_API_KEY" }, { status: 500 });
   }
   try {
-    const body = await req.json().catch(() => ({}));
     const prompt: string = body.prompt ?? "Say hello from KaizenEdge.";
     const model: string = body.model ?? OPENAI_MODEL;
 
@@ -0,0 +1,429 @@
+import argparse, hashlib, json, os, random, re, sys, time, zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE); sys.path.insert(0, os.path.join(ROOT, "services", "common"))
+from guardrail_rules import canonicalize_flags, rule_expected
+import taxonomy
+
+# Instruct dataset builder: candidates -> checks -> near-duplicate removal -> shards.
+#
+# Candidates come from existing JSONL files ({"id", "instruction", "input",
+# "output"}, v1.3 style) and/or a seeded generator. Worker processes take
+# chunks and run, per record: parse, validate the embedded profile ("input",
+# when it is a JSON object) against schemas/input_taxonomy_v1.json with the
+# compiled taxonomy index check (services/common/taxonomy.py), run the rule_expected oracle on every recipe
+# of the output plan (any hard fail, or a guardrail_report whose hard_fail or
+# string flags disagree with the oracle, rejects the example; allergen names
+# are mapped onto the oracle's spellings and unknown ones are rejected), and
+# compute a MinHash signature of
+# instruction + output word 3-grams. The main process removes exact duplicates
+# and near-duplicates (LSH over signature bands, confirmed by estimated Jaccard
+# >= --jaccard) in input order, so the earliest copy wins, and writes sharded
+# JSONL with a sha256 sidecar per shard and a manifest.json. Chunks in flight
+# are bounded, so memory is the dedupe index plus a few chunks.
+#
+#   python models/build_dataset.py --ingest models/data/KaizenEdge_Instruct_v1.3.jsonl --generate 2000 \
+#       --out-dir models/data/instruct_v1.4 -j 8
+#   python models/build_dataset.py --generate 100000 --out-dir /tmp/ds --shard-size 20000
+
+CHUNK = 500
+NUM_PERM = 64
+BANDS = 8                    # 8 bands x 8 rows: pairs above ~0.77 Jaccard collide in some band
+PRIME = 4294967311           # smallest prime above 2**32
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+# ----- Generator vocabulary -----
+PROTEINS = [("chicken thighs", "150 g"), ("lentils", "1 cup"), ("chickpeas", "1 can"), ("salmon", "150 g"),
+            ("tofu", "200 g"), ("eggs", "2"), ("beef strips", "150 g"), ("shrimp", "150 g"), ("pork loin", "150 g"),
+            ("swordfish", "150 g"), ("turkey breast", "150 g"), ("black beans", "1 can"), ("cod", "150 g")]
+VEG = ["spinach", "kale", "tomatoes", "zucchini", "bell pepper", "broccoli", "carrots", "onion", "mushrooms",
+       "eggplant", "cauliflower", "green beans", "cabbage", "sweet potato"]
+GRAINS = ["brown rice", "quinoa", "whole wheat pasta", "corn tortillas", "barley", "couscous", "potatoes", "oats",
+          "flour tortillas", "rice noodles"]
+EXTRAS = ["olive oil", "lemon juice", "garlic", "yogurt", "cheddar", "peanut butter", "sesame oil", "soy sauce", "milk",
+          "almonds", "beer", "grapefruit", "cumin", "ginger", "cilantro", "chili flakes"]
+DISHES = ["Stew", "Bowl", "Stir-Fry", "Skillet", "Salad", "Curry", "Bake", "Soup", "Wrap", "Tacos", "Pilaf", "Sheet-Pan"]
+REGIONS = [("MiddleEastern", "HomeCooking"), ("Mexican", "StreetFood"), ("Indian", "HomeCooking"), ("Japanese", "Washoku"),
+           ("Mediterranean", "HomeCooking"), ("WestAfrican", "Festive"), ("SoutheastAsian", "StreetFood"),
+           ("American", "Southern"), ("Korean", "HomeCooking"), ("Italian", "Trattoria")]
+CONDITIONS = ["Diabetes", "Hypertension", "Pregnancy", "Chronic Kidney Disease"]
+ALLERGENS = {"Peanuts": "peanuts", "Tree Nuts": "tree_nuts", "Shellfish": "crustacean_shellfish", "Sesame": "sesame",
+             "Milk": "milk", "Eggs": "egg", "Wheat": "wheat", "Soy": "soy"}
+RETAILERS = {"Walmart": "walmart", "Costco": "costco", "Kroger": "kroger", "Target": "target", "Trader Joes": "trader_joes"}
+
+
+def _recipe(rng, n, pools=(PROTEINS, VEG, GRAINS, EXTRAS)):
+    proteins, vegs, grains, extras = pools
+    (protein, pqty), veg, grain = rng.choice(proteins), rng.sample(vegs, 2), rng.choice(grains)
+    extras = rng.sample(extras, min(len(extras), rng.randint(1, 3)))
+    title = f"{protein.title()} & {veg[0].title()} {rng.choice(DISHES)}"
+    return {"id": f"rcp-{n}-{zlib.crc32(title.encode('utf-8')) % 10**6:06d}", "title": title,
+            "nutrition_estimate": {"calories": rng.randrange(250, 750, 10), "protein_g": rng.randint(8, 55),
+                                   "carbs_g": rng.randint(10, 90), "fat_g": rng.randint(4, 35),
+                                   "sodium_mg": rng.randrange(150, 1400, 10), "sugar_g": rng.randint(1, 25)},
+            "ingredients": [{"name": protein, "qty": pqty}] + [{"name": v, "qty": rng.choice(["1 cup", "100 g", "1"])} for v in veg]
+                           + [{"name": grain, "qty": "1 cup"}] + [{"name": e, "qty": rng.choice(["1 tbsp", "1 tsp", "30 g"])} for e in extras],
+            "steps": [f"Prep the {veg[0]} and {veg[1]}.", f"Cook the {protein} until done.", f"Serve over {grain}."]}
+
+def generate(seed: int, index: int) -> dict:
+    """One candidate example, fully determined by (seed, index)."""
+    rng = random.Random(seed * 1_000_003 + index)
+    conds = rng.sample(CONDITIONS, rng.choice([0, 0, 1, 1, 2]))
+    allergens = rng.sample(list(ALLERGENS), rng.choice([0, 1, 1, 2]))
+    religious = rng.choice([None, None, "Halal", "Kosher"])
+    diets = rng.sample(["Vegan", "Gluten Free", "Keto"], rng.choice([0, 0, 1]))
+    region, tradition = rng.choice(REGIONS)
+    retailer = rng.choice(list(RETAILERS))
+    budget = rng.choice(["Low", "Medium", "High"])
+    pantry = rng.sample(VEG + GRAINS, 3)
+    days = rng.choice([1, 1, 2])
+    profile = {"mode": "Lifestyle", "age": rng.randint(19, 80), "life_stage": "Adult", "medical_conditions": conds,
+               "cultural_prefs": {"regions": [region], "traditions": [tradition]}, "religious_diet": religious,
+               "allergens_banned": allergens, "diets": diets, "budget_level": budget, "retailers": [retailer], "pantry": pantry}
+    pools = _pools(profile)
+    recipes = []
+    for k in range(3 * days):
+        for _ in range(RECIPE_TRIES):  # combinations (meat + dairy, sodium, sugar) can still fail; redraw
+            r = _recipe(rng, k, pools)
+            if not _fails({"profile": profile, "recipes": [r]}):
+                break
+        recipes.append(r)
+    plan = [{"day": d + 1, "meals": [{"name": m, "recipe_id": recipes[3 * d + i]["id"], "servings": 1}
+                                     for i, m in enumerate(("Breakfast", "Lunch", "Dinner"))]} for d in range(days)]
+    cart = [{"name": i["name"], "qty": i["qty"], "unit_price": round(rng.uniform(0.5, 9), 2)}
+            for r in recipes for i in r["ingredients"][:2]]
+    output = {"profile": profile, "meal_plan": plan, "recipes": recipes,
+              "grocery_cart": {"retailer": retailer, "items": cart, "estimated_total": round(sum(c["unit_price"] for c in cart), 2)},
+              "guardrail_report": {"hard_fail": False, "flags": []},
+              "disclaimers": ["Not medical advice; consult your clinician for medical conditions."]}
+    taxonomy = {
+        "account_locale_consent": {"units": rng.choice(["metric", "imperial"]), "timezone": "America/New_York"},
+        "demographics_anthropometrics": {"sex_at_birth": rng.choice(["female", "male"]), "height": rng.randint(150, 195),
+                                         "weight": rng.randint(45, 140), "life_stage": "adult",
+                                         "pregnancy_status": "pregnant" if "Pregnancy" in conds else "not_pregnant"},
+        "clinical_conditions": {k: v for k, v in (("metabolic", ["type2_diabetes"] if "Diabetes" in conds else []),
+                                                  ("cardiovascular", ["hypertension"] if "Hypertension" in conds else []),
+                                                  ("renal", ["ckd_stage_3"] if "Chronic Kidney Disease" in conds else [])) if v},
+        "allergens_intolerances": {"major_allergens": [ALLERGENS[a] for a in allergens]},
+        "dietary_patterns": {"general": "vegan" if "Vegan" in diets else "omnivore",
+                             "metabolic_goal": "ketogenic" if "Keto" in diets else "none"},
+        "nutrition_targets": {"energy_kcal_per_day": rng.randrange(1400, 3000, 50)},
+        "meal_logistics_household": {"meals_per_day": 3},
+        "budget_stores_inventory": {"budget_usd_per_day": {"Low": 12, "Medium": 20, "High": 35}[budget],
+                                    "primary_store": RETAILERS[retailer]},
+        "food_safety_compliance": {"pasteurization_required": "Pregnancy" in conds},
+        "personalization_content": {"brand_voice": "friendly"},
+    }
+    who = ", ".join(conds).lower() or "no medical conditions"
+    diet = religious or (diets[0] if diets else "no special")
+    avoid = ("no " + "/".join(a.lower() for a in allergens)) if allergens else "no allergies"
+    instruction = (f"Given a user with {who} (Adult), {diet} diet, {avoid}, cultural preference {region} {tradition}, "
+                   f"budget {budget}, pantry: {', '.join(pantry)}. Plan {days} day{'s' if days > 1 else ''} of meals "
+                   f"and build a {retailer} cart.")
+    return {"id": f"gen_{seed}_{index}", "instruction": instruction, "input": json.dumps(taxonomy),
+            "output": json.dumps(output)}
+
+
+RECIPE_TRIES = 8
+_POOLS = {}
+
+def _pools(prof: dict) -> tuple:
+    """Generator vocabulary minus every ingredient the oracle flags on its own for this profile (cached per profile)."""
+    key = (tuple(prof["allergens_banned"]), tuple(prof["medical_conditions"]), prof["religious_diet"], tuple(prof["diets"]))
+    pools = _POOLS.get(key)
+    if pools is None:
+        ok = lambda name: not _fails({"profile": prof, "recipes": [{"ingredients": [{"name": name}]}]})
+        keep = lambda items, name=lambda x: x: [x for x in items if ok(name(x))] or items
+        pools = _POOLS[key] = (keep(PROTEINS, lambda p: p[0]), keep(VEG), keep(GRAINS), keep(EXTRAS))
+    return pools
+
+def _fails(output: dict) -> bool:
+    return any(rule_expected(x)["hard_fail"] for x in oracle_inputs(output))
+
+
+# ----- Checks -----
+# allergen spellings seen in plans -> the names the oracle rules match on
+ORACLE_ALLERGENS = {"peanut": "peanuts", "peanuts": "peanuts", "treenut": "tree nuts", "treenuts": "tree nuts",
+                    "shellfish": "shellfish", "crustaceanshellfish": "shellfish", "sesame": "sesame",
+                    "milk": "milk", "dairy": "milk", "egg": "eggs", "eggs": "eggs", "wheat": "wheat",
+                    "soy": "soy", "soya": "soy"}
+
+def oracle_allergen(name) -> str:
+    """Oracle spelling of an allergen name ("TreeNuts", "tree_nuts" -> "tree nuts"), None if unknown."""
+    return ORACLE_ALLERGENS.get(re.sub(r"[^a-z]", "", str(name).lower()))
+
+def oracle_inputs(output: dict):
+    """rule_expected inputs for every (recipe, diet) of a v1.3-style output plan."""
+    prof = output.get("profile") or {}
+    base = {"allergens_banned": [oracle_allergen(a) or a for a in prof.get("allergens_banned") or []],
+            "medical_conditions": prof.get("medical_conditions") or [], "medications": prof.get("medications") or []}
+    diets = [d for d in [prof.get("religious_diet")] + list(prof.get("diets") or []) if d] or [None]
+    for r in output.get("recipes") or []:
+        if not isinstance(r, dict):
+            continue
+        nut = r.get("nutrition_estimate") or {}
+        recipe = {"name": r.get("title", ""), "ingredients": r.get("ingredients") or [],
+                  "sodium_mg": nut.get("sodium_mg", 0), "sugars_g": nut.get("sugar_g", 0)}
+        for d in diets:
+            yield {"profile": {**base, "diet": d} if d else base, "recipe": recipe}
+
+_validate = None
+_perm = None
+
+def _init():
+    global _validate, _perm
+    _validate = taxonomy.load_index().check
+    rs = np.random.RandomState(20250826)  # the same permutations in every worker and run
+    _perm = (rs.randint(1, 1 << 32, NUM_PERM, dtype=np.uint64) - np.uint64(1),
+             rs.randint(0, 1 << 32, NUM_PERM, dtype=np.uint64))
+
+def minhash(text: str) -> np.ndarray:
+    toks = _TOKEN_RE.findall(text.lower())
+    grams = {" ".join(toks[i:i + 3]) for i in range(max(1, len(toks) - 2))}
+    x = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    a, b = _perm
+    # a < 2**32 - 1 and x < 2**32, so a*x + b stays below 2**64
+    return ((np.outer(x, a) + b) % np.uint64(PRIME)).min(axis=0).astype(np.uint32)
+
+def check_record(rec, t: dict):
+    """None if the record passes, else the rejection reason; timings accumulate into t."""
+    t0 = time.perf_counter()
+    if not isinstance(rec, dict) or not isinstance(rec.get("instruction"), str) or not rec["instruction"].strip() \
+            or not isinstance(rec.get("output"), str):
+        return "missing_fields"
+    inp = rec.get("input") or ""
+    profile = None
+    if isinstance(inp, str) and inp.lstrip().startswith("{"):
+        try:
+            profile = json.loads(inp)
+        except ValueError:
+            return "input_json"
+    elif isinstance(inp, dict):
+        profile = inp
+    if profile is not None and _validate(profile):
+        return "schema"
+    t1 = time.perf_counter(); t["validate"] += t1 - t0
+    out = rec["output"]
+    if out.lstrip().startswith("{"):
+        try:
+            obj = json.loads(out)
+        except ValueError:
+            return "output_json"
+        prof = obj.get("profile") if isinstance(obj.get("profile"), dict) else {}
+        if any(oracle_allergen(a) is None for a in prof.get("allergens_banned") or []):
+            return "unknown_allergen"  # the oracle would never match it, so violations would pass silently
+        flags = set(); hard = False
+        for x in oracle_inputs(obj):
+            r = rule_expected(x)
+            hard |= r["hard_fail"]; flags.update(r["flags"])
+        t["oracle"] += time.perf_counter() - t1
+        if hard:
+            t["flags"].update(flags)
+            return "guardrail"
+        report = obj.get("guardrail_report")
+        if isinstance(report, dict):
+            # string flags are oracle flag names; dict entries ({"type", "detail", "action"}) are advisory notes
+            claimed = set(canonicalize_flags(f for f in report.get("flags") or [] if isinstance(f, str)))
+            if bool(report.get("hard_fail")) != hard or claimed != flags:
+                return "report_mismatch"
+    return None
+
+def process_chunk(task) -> dict:
+    kind = task[0]
+    t = {"generate": 0.0, "parse": 0.0, "validate": 0.0, "oracle": 0.0, "minhash": 0.0, "flags": Counter()}
+    rejected = Counter(); examples = {}; kept = []
+    if kind == "gen":
+        _, seed, start, n = task
+        t0 = time.perf_counter()
+        items = [(f"gen:{i}", generate(seed, i)) for i in range(start, start + n)]
+        t["generate"] += time.perf_counter() - t0
+    else:
+        items = []
+        t0 = time.perf_counter()
+        for label, raw in task[1]:
+            try:
+                items.append((label, json.loads(raw)))
+            except ValueError:
+                rejected["parse"] += 1; examples.setdefault("parse", []).append(label)
+        t["parse"] += time.perf_counter() - t0
+    for label, rec in items:
+        reason = check_record(rec, t)
+        rid = str(rec.get("id") or label) if isinstance(rec, dict) else label
+        if reason:
+            rejected[reason] += 1
+            if len(examples.setdefault(reason, [])) < 5:
+                examples[reason].append(rid)
+            continue
+        t0 = time.perf_counter()
+        text = rec["instruction"] + "\n" + rec["output"]
+        sig = minhash(text)
+        t["minhash"] += time.perf_counter() - t0
+        line = json.dumps(rec, ensure_ascii=False)
+        kept.append((rid, line, hashlib.sha256(text.encode("utf-8")).digest()[:16], sig))
+    return {"n": len(items) + rejected["parse"], "kept": kept, "rejected": rejected, "examples": examples, "t": t}
+
+
+# ----- Dedupe + shards -----
+class NearDupIndex:
+    """LSH over MinHash bands; a candidate pair is confirmed by the fraction of equal signature slots."""
+
+    def __init__(self, jaccard: float = 0.8):
+        self.jaccard = jaccard
+        self.rows = NUM_PERM // BANDS
+        self.buckets = [dict() for _ in range(BANDS)]
+        self.sigs = np.zeros((1024, NUM_PERM), dtype=np.uint32); self.n = 0
+        self.exact = set()
+
+    def add(self, digest: bytes, sig: np.ndarray):
+        """'exact_dup' / 'near_dup' if a kept record matches, else index it and return None."""
+        if digest in self.exact:
+            return "exact_dup"
+        keys = [hash(sig[b * self.rows:(b + 1) * self.rows].tobytes()) for b in range(BANDS)]
+        seen = set()
+        for bucket, key in zip(self.buckets, keys):
+            hit = bucket.get(key)
+            if hit is None:
+                continue
+            for j in (hit if isinstance(hit, list) else (hit,)):
+                if j not in seen:
+                    seen.add(j)
+                    if np.count_nonzero(self.sigs[j] == sig) >= self.jaccard * NUM_PERM:
+                        return "near_dup"
+        if self.n == len(self.sigs):
+            self.sigs = np.concatenate([self.sigs, np.zeros_like(self.sigs)])
+        k = self.n; self.sigs[k] = sig; self.n += 1
+        self.exact.add(digest)
+        for bucket, key in zip(self.buckets, keys):
+            hit = bucket.get(key)
+            if hit is None:
+                bucket[key] = k
+            elif isinstance(hit, list):
+                hit.append(k)
+            else:
+                bucket[key] = [hit, k]
+        return None
+
+
+class ShardWriter:
+    def __init__(self, out_dir: str, prefix: str, shard_size: int):
+        self.out_dir = out_dir; self.prefix = prefix; self.shard_size = shard_size
+        os.makedirs(out_dir, exist_ok=True)
+        self.shards = []; self.f = None
+
+    def _close(self):
+        if self.f is None:
+            return
+        self.f.close()
+        s = self.shards[-1]
+        s["sha256"] = self.h.hexdigest()
+        with open(os.path.join(self.out_dir, s["file"] + ".sha256"), "w", encoding="utf-8") as f:
+            f.write(s["sha256"] + "\n")
+        self.f = None
+
+    def write(self, line: str):
+        if self.f is None or (self.shard_size and self.shards[-1]["lines"] >= self.shard_size):
+            self._close()
+            name = f"{self.prefix}-{len(self.shards):05d}.jsonl"
+            self.f = open(os.path.join(self.out_dir, name), "wb"); self.h = hashlib.sha256()
+            self.shards.append({"file": name, "lines": 0, "bytes": 0})
+        data = (line + "\n").encode("utf-8")
+        self.f.write(data); self.h.update(data)
+        s = self.shards[-1]; s["lines"] += 1; s["bytes"] += len(data)
+
+    def close(self) -> list:
+        self._close()
+        return self.shards
+
+
+def tasks(ingest, generate_n: int, seed: int, chunk: int = CHUNK):
+    for path in ingest:
+        label = os.path.basename(path); buf = []
+        with open(path, "rb") as f:
+            for n, line in enumerate(f, 1):
+                if line.strip():
+                    buf.append((f"{label}:{n}", line))
+                    if len(buf) >= chunk:
+                        yield ("lines", buf); buf = []
+        if buf:
+            yield ("lines", buf)
+    for start in range(0, generate_n, chunk):
+        yield ("gen", seed, start, min(chunk, generate_n - start))
+
+def build(ingest, generate_n: int, out_dir: str, seed: int = 0, jobs: int = 1, shard_size: int = 10000,
+          prefix: str = "instruct", jaccard: float = 0.8) -> dict:
+    index = NearDupIndex(jaccard)
+    taxonomy.load_index()  # generate the cached checker once, before workers import it
+    writer = ShardWriter(out_dir, prefix, shard_size)
+    stats = {"candidates": 0, "kept": 0, "rejected": Counter(), "examples": {}, "flags": Counter(),
+             "worker_s": Counter(), "main_s": Counter()}
+    t_start = time.perf_counter()
+
+    def done(part):
+        stats["candidates"] += part["n"]
+        stats["rejected"].update(part["rejected"])
+        for r, ex in part["examples"].items():
+            cur = stats["examples"].setdefault(r, [])
+            cur.extend(ex[:5 - len(cur)])
+        stats["flags"].update(part["t"].pop("flags"))
+        stats["worker_s"].update(part["t"])
+        for rid, line, digest, sig in part["kept"]:
+            t0 = time.perf_counter()
+            reason = index.add(digest, sig)
+            t1 = time.perf_counter(); stats["main_s"]["dedupe"] += t1 - t0
+            if reason:
+                stats["rejected"][reason] += 1
+                if len(stats["examples"].setdefault(reason, [])) < 5:
+                    stats["examples"][reason].append(rid)
+                continue
+            writer.write(line); stats["kept"] += 1
+            stats["main_s"]["write"] += time.perf_counter() - t1
+
+    if jobs <= 1:
+        _init()
+        for task in tasks(ingest, generate_n, seed):
+            done(process_chunk(task))
+    else:
+        with ProcessPoolExecutor(jobs, initializer=_init) as pool:
+            inflight = []
+            for task in tasks(ingest, generate_n, seed):
+                inflight.append(pool.submit(process_chunk, task))
+                if len(inflight) >= 2 * jobs:  # bounded: results are merged in input order
+                    done(inflight.pop(0).result())
+            for fut in inflight:
+                done(fut.result())
+    shards = writer.close()
+    wall = time.perf_counter() - t_start
+    n = stats["candidates"]
+    rate = lambda s: round(n / s, 1) if s else None
+    report = {"candidates": n, "kept": stats["kept"], "rejected": dict(stats["rejected"]),
+              "rejected_examples": stats["examples"], "guardrail_flags": dict(stats["flags"].most_common()),
+              "stages": {k: {"seconds": round(v, 3), "per_s": rate(v)} for k, v in
+                         list(stats["worker_s"].items()) + list(stats["main_s"].items()) if v},
+              "wall_s": round(wall, 3), "per_s": rate(wall), "jobs": jobs, "seed": seed, "jaccard": jaccard,
+              "num_perm": NUM_PERM, "bands": BANDS, "ingest": list(ingest), "generated": generate_n, "shards": shards}
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ingest", nargs="*", default=[], help="existing JSONL datasets/candidates (kept first on duplicates)")
+    ap.add_argument("--generate", type=int, default=0, help="number of generated candidates")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out-dir", required=True)
+    ap.add_argument("--prefix", default="instruct")
+    ap.add_argument("--shard-size", type=int, default=10000, help="lines per shard (0 = one file)")
+    ap.add_argument("--jaccard", type=float, default=0.8, help="near-duplicate threshold")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    a = ap.parse_args()
+    if not a.ingest and not a.generate:
+        ap.error("--ingest and/or --generate")
+    rep = build(a.ingest, a.generate, a.out_dir, a.seed, a.jobs, a.shard_size, a.prefix, a.jaccard)
+    for stage, s in rep["stages"].items():
+        print(f"{stage:10} {s['seconds']:8.2f}s  {s['per_s'] or 0:10.1f} candidates/s", file=sys.stderr)
+    print(json.dumps({k: rep[k] for k in ("candidates", "kept", "rejected", "wall_s", "per_s")}))
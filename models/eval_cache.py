@@ -0,0 +1,137 @@
+import glob, hashlib, json, os
+
+# Content-addressed cache for model outputs in the guardrail eval.
+#
+# Entries are keyed by a sha256 over everything that determines a generation
+# (adapter weights, tokenizer files, rendered prompt, generation config, ruleset)
+# and stored as one small JSON file each. Hits refresh the file's mtime; when the
+# directory grows past max_bytes the least recently used entries are evicted.
+
+CACHE_DIR = ".cache/guardrail_eval"
+MODEL_FILE_GLOBS = ("*.safetensors", "*.bin", "adapter_config.json", "config.json", "generation_config.json",
+                    "tokenizer.json", "tokenizer_config.json", "special_tokens_map.json",
+                    "chat_template.jinja", "vocab.json", "merges.txt")
+SKIP_FILES = ("training_args.bin",)
+
+
+def sha256_file(path: str, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = 64 << 20, enabled: bool = True):
+        self.root = root; self.max_bytes = max_bytes; self.enabled = enabled
+        self.hits = 0; self.misses = 0; self.evictions = 0
+        self._bytes = None
+
+    # ----- keys -----
+    def model_fingerprint(self, out_dir: str) -> str:
+        """sha256 over the weight/tokenizer files in out_dir; per-file digests are memoized by (size, mtime)."""
+        memo_path = os.path.join(self.root, "files.json")
+        try:
+            with open(memo_path, "r", encoding="utf-8") as f:
+                memo = json.load(f)
+        except (FileNotFoundError, ValueError):
+            memo = {}
+        paths = sorted({p for g in MODEL_FILE_GLOBS for p in glob.glob(os.path.join(out_dir, g))
+                        if os.path.basename(p) not in SKIP_FILES})
+        h = hashlib.sha256(); changed = False
+        for p in paths:
+            st = os.stat(p)
+            rec = memo.get(p)
+            if not rec or rec[0] != st.st_size or rec[1] != st.st_mtime_ns:
+                rec = memo[p] = [st.st_size, st.st_mtime_ns, sha256_file(p)]
+                changed = True
+            h.update(f"{os.path.basename(p)}:{rec[2]}\n".encode("utf-8"))
+        if changed and self.enabled:
+            os.makedirs(self.root, exist_ok=True)
+            tmp = f"{memo_path}.{os.getpid()}.tmp"  # sharded workers may rewrite the memo at the same time
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(memo, f)
+            os.replace(tmp, memo_path)
+        return h.hexdigest()
+
+    @staticmethod
+    def key(*parts) -> str:
+        h = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, str):
+                part = json.dumps(part, sort_keys=True, ensure_ascii=False, default=str)
+            h.update(part.encode("utf-8")); h.update(b"\0")
+        return h.hexdigest()
+
+    # ----- entries -----
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # LRU: most recently used = newest mtime
+        except FileNotFoundError:
+            pass  # evicted by another worker after the read; the value is still good
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value) -> None:
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        if self._bytes is None:
+            self._bytes = sum(e[2] for e in self._entries())
+        else:
+            self._bytes += len(data)
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for sub in os.scandir(self.root):
+            if not sub.is_dir():
+                continue
+            for e in os.scandir(sub.path):
+                if e.name.endswith(".json"):
+                    try:
+                        st = e.stat()
+                    except FileNotFoundError:
+                        continue  # removed by another worker mid-scan
+                    out.append((st.st_mtime_ns, e.path, st.st_size))
+        return out
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache is at 90% of max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(e[2] for e in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size; self.evictions += 1
+        self._bytes = total
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
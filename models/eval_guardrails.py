@@ -1,47 +1,229 @@
-import json, re, os
-from transformers import AutoModelForCausalLM, AutoTokenizer, GenerationConfig
+import argparse, hashlib, json, os, sys, time
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, GenerationConfig, LogitsProcessor, LogitsProcessorList, StoppingCriteriaList
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.common import tracing  # opt-in spans/counters: KAIZEN_TRACE=1
+# Deterministic rules (FDA oracle), compiled from the pinned ruleset
+from guardrail_rules import FLAG_SYNONYMS, ORACLE_FLAGS, RULESET, canonicalize_flags, rule_expected
+from guardrail_decoding import GuardrailDecoding
+from guardrail_parse import extract_json, matches_expected, normalize_guardrail, repair_json
+from eval_cache import ResultCache
 
 # ----- Config -----
 CFG = json.load(open('models/config/sft.json'))
 OUT_DIR = CFG["out_dir"]
 TEST_PATH = 'models/data/KaizenEdge_Guardrail_Tests_v2.jsonl'  # v2 suite
 
-tok = AutoTokenizer.from_pretrained(OUT_DIR)
-mdl = AutoModelForCausalLM.from_pretrained(OUT_DIR)
+# Loaded by load_model(), not at import, so workers and tools can import this module cheaply.
+tok = None
+mdl = None
+MODEL_DIR = None  # directory tok/mdl were loaded from
+
+def load_model(out_dir: str = OUT_DIR):
+    """Load tokenizer + model; the globals are swapped together only once both have loaded."""
+    global tok, mdl, MODEL_DIR
+    t = AutoTokenizer.from_pretrained(out_dir)
+    m = AutoModelForCausalLM.from_pretrained(out_dir)
+    # Batched prompts are left-padded so every row's continuation starts at the same column.
+    t.padding_side = "left"
+    if t.pad_token is None:
+        t.pad_token = t.eos_token
+    # Sanitize generation config to avoid sampling params when do_sample=False.
+    try:
+        # start from current config and null out sampling-only keys
+        gdict = m.generation_config.to_dict() if hasattr(m, "generation_config") else {}
+        for k in ("temperature", "top_p", "top_k", "typical_p", "penalty_alpha"):
+            if k in gdict:
+                gdict[k] = None
+        gdict["do_sample"] = False
+        m.generation_config = GenerationConfig(**gdict)
+    except Exception:
+        # non-fatal: continue with pipeline-level do_sample=False
+        pass
+    tok, mdl, MODEL_DIR = t, m, out_dir
+    PREFIX_CACHE.key = None  # re-encode the shared prefix with the new tokenizer/weights on next use
+    return tok, mdl
 
 
 # ----- Deterministic generator (no sampling params) -----
-def generate_text(prompt: str, max_new_tokens: int = 768) -> str:
-    # Tokenize
-    inputs = tok(prompt, return_tensors="pt")
-    # Move to device of the model
-    device = next(mdl.parameters()).device
-    inputs = {k: v.to(device) for k,v in inputs.items()}
+
+def _eos_ids():
+    ids = getattr(mdl.generation_config, "eos_token_id", None)
+    ids = set(ids if isinstance(ids, (list, tuple)) else [ids])
+    ids.add(tok.eos_token_id)
+    return ids - {None}
+
+# Structured decoding: stop at the close of the top-level JSON object and keep
+# "flags" entries within the canonical names / oracle flags. With "baseline" on,
+# each uncached batch is decoded a second time unconstrained so every test
+# reports the tokens structured decoding saved (costs a second generate()).
+ALLOWED_FLAGS = sorted(set(FLAG_SYNONYMS.values()) | ORACLE_FLAGS)
+JSON_DECODING = {"stop": True, "constrain_flags": True, "baseline": False}
+
+class StepClock(LogitsProcessor):
+    """Marks the first logits call (end of prefill) and counts decode steps; only attached while tracing."""
+
+    def __init__(self):
+        self.first_ns = None; self.steps = 0
+
+    def __call__(self, input_ids, scores):
+        if self.first_ns is None:
+            self.first_ns = time.perf_counter_ns()
+        self.steps += 1
+        return scores
+
+def generate_batch(prompts: list, max_new_tokens: int = 768) -> list:
+    """Greedy generation for several prompts at once.
+
+    Returns [(text, new_token_count, stopped_at_json_close)] in prompt order.
+    """
+    # Tokenize (left-padded to the longest prompt in the batch)
+    with tracing.span("eval.tokenize", batch=len(prompts)):
+        inputs = tok(prompts, return_tensors="pt", padding=True)
+        # Move to device of the model
+        device = next(mdl.parameters()).device
+        inputs = {k: v.to(device) for k,v in inputs.items()}
+    prompt_len = inputs["input_ids"].shape[-1]
+    # Only the suffixes are prefilled; the shared prefix comes from the KV cache (rows re-laid out on a hit)
+    past = PREFIX_CACHE.past_for(inputs)
+    dec = None; extra = {}
+    if JSON_DECODING["stop"]:
+        dec = GuardrailDecoding(tok, ALLOWED_FLAGS, prompt_len, constrain=JSON_DECODING["constrain_flags"])
+        extra = {"stopping_criteria": StoppingCriteriaList([dec.stopping_criteria()]),
+                 "logits_processor": LogitsProcessorList([dec.logits_processor()])}
+    clock = None
+    if tracing.ENABLED:
+        clock = StepClock()
+        extra["logits_processor"] = LogitsProcessorList([clock, *extra.get("logits_processor", [])])
+    t_gen = time.perf_counter_ns()
     # Greedy generation (deterministic)
     gen_ids = mdl.generate(
         **inputs,
+        past_key_values=past,
         do_sample=False,
         num_beams=1,
         max_new_tokens=max_new_tokens,
-        pad_token_id=tok.eos_token_id
+        pad_token_id=tok.pad_token_id,
+        **extra
     )
+    if clock is not None:
+        t_end = time.perf_counter_ns(); first = clock.first_ns or t_end
+        tracing.record("eval.prefill", t_gen, first, batch=len(prompts), prompt_tokens=prompt_len, prefix_cached=past is not None)
+        tracing.record("eval.decode", first, t_end, batch=len(prompts), steps=clock.steps)
+        tracing.count("eval.decode_steps", clock.steps)
     # Decode only the generated continuation (skip prompt tokens)
-    out = tok.decode(gen_ids[0][inputs["input_ids"].shape[-1]:], skip_special_tokens=True)
-    return out.strip()
+    eos = _eos_ids()
+    outs = []
+    with tracing.span("eval.detokenize", batch=len(prompts)):
+        for k, row in enumerate(gen_ids[:, prompt_len:].tolist()):
+            closed = dec.new_tokens(k) if dec else None
+            n = closed or next((j + 1 for j, t in enumerate(row) if t in eos), len(row))
+            outs.append((tok.decode(row[:n], skip_special_tokens=True).strip(), n, closed is not None))
+    tracing.count("eval.tokens_generated", sum(o[1] for o in outs))
+    return outs
 
+def generate_text(prompt: str, max_new_tokens: int = 768) -> str:
+    return generate_batch([prompt], max_new_tokens)[0][0]
 
-# Sanitize generation config to avoid sampling params when do_sample=False.
-try:
-    # start from current config and null out sampling-only keys
-    gdict = mdl.generation_config.to_dict() if hasattr(mdl, "generation_config") else {}
-    for k in ("temperature", "top_p", "top_k", "typical_p", "penalty_alpha"):
-        if k in gdict:
-            gdict[k] = None
-    gdict["do_sample"] = False
-    mdl.generation_config = GenerationConfig(**gdict)
-except Exception:
-    # non-fatal: continue with pipeline-level do_sample=False
-    pass
+def unconstrained_tokens(prompts: list, max_new_tokens: int = 768) -> list:
+    """New-token counts for prompts with structured decoding off (EOS / token budget only)."""
+    saved = dict(JSON_DECODING)
+    JSON_DECODING.update(stop=False, constrain_flags=False)
+    try:
+        return [n for _, n, _ in generate_batch(prompts, max_new_tokens)]
+    finally:
+        JSON_DECODING.update(saved)
+
+def length_buckets(prompts: list, batch_size: int) -> list:
+    """Group prompt indices into batches of similar token length (longest first) to keep padding small."""
+    lengths = [len(ids) for ids in tok(prompts)["input_ids"]]
+    order = sorted(range(len(prompts)), key=lambda i: (-lengths[i], i))
+    return [order[k:k + batch_size] for k in range(0, len(order), batch_size)]
+
+
+# ----- Shared-prefix KV cache -----
+# Every prompt starts with the same SYS + FEW_SHOTS turns. Their past-key-values are
+# encoded once and reused. The cache is keyed on the rendered prefix (prompt kit,
+# few-shots, chat template) and the tokenizer files of the loaded directory, and that
+# key is checked on every use, so editing SYS/FEW_SHOTS re-encodes; load_model() also
+# clears it, since new weights with the same tokenizer give the same key.
+#
+# Batches share one cached prefix: a left-padded row [pads][prefix][suffix] is re-laid
+# out as [prefix][pads][suffix] with the pads masked. Llama-style models take position
+# ids from the attention mask's cumsum, so every suffix token keeps the position it has
+# unpadded, and the prefix columns are identical across rows. Each call gets its own
+# copy of the prefix tensors (repeated over the batch): a memcpy of n_prefix x layers x
+# 2 x kv_dim values, against a prefill of n_prefix tokens through the whole model.
+TOKENIZER_FILES = ("tokenizer.json", "tokenizer_config.json", "special_tokens_map.json",
+                   "chat_template.jinja", "vocab.json", "merges.txt")
+
+def tokenizer_fingerprint() -> str:
+    h = hashlib.sha256(f"{tok.name_or_path}|{len(tok)}".encode("utf-8"))
+    for name in TOKENIZER_FILES:
+        path = os.path.join(MODEL_DIR, name)
+        if os.path.exists(path):
+            st = os.stat(path)
+            h.update(f"|{name}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()
+
+def shared_prefix() -> str:
+    """System + few-shot turns as rendered at the head of every prompt."""
+    return tok.apply_chat_template(build_chat({})[:-1], tokenize=False, add_generation_prompt=False)
+
+class PrefixCache:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.key = None; self.ids = None; self.past = None
+        self.hits = 0; self.misses = 0; self.encodes = 0
+
+    def refresh(self):
+        """Encode the prefix if its text or the tokenizer changed, or load_model() ran, since the last encode."""
+        text = shared_prefix()
+        key = hashlib.sha256((tokenizer_fingerprint() + "\n" + text).encode("utf-8")).hexdigest()
+        if key != self.key:
+            device = next(mdl.parameters()).device
+            ids = tok(text, return_tensors="pt")["input_ids"].to(device)
+            with torch.no_grad(), tracing.span("eval.prefix_encode", tokens=ids.shape[-1]):
+                self.past = mdl(input_ids=ids, use_cache=True).past_key_values
+            self.key, self.ids = key, ids
+            self.encodes += 1
+
+    def past_for(self, inputs: dict):
+        """Prefix cache for a left-padded batch, or None unless every row starts with the prefix tokens.
+
+        On a hit each row's prefix is moved in front of its padding (inputs is updated in place)
+        and the returned cache is a private copy repeated over the batch.
+        """
+        if not self.enabled:
+            return None
+        self.refresh()
+        ids, mask = inputs["input_ids"], inputs["attention_mask"]
+        n = self.ids.shape[-1]; rows = ids.shape[0]
+        pads = (mask == 0).sum(dim=1).tolist()
+        if not all(ids.shape[-1] - p > n and torch.equal(ids[k, p:p + n], self.ids[0]) for k, p in enumerate(pads)):
+            self.misses += rows; tracing.count("eval.prefix_cache_misses", rows)
+            return None
+        if any(pads):
+            ids = ids.clone(); mask = mask.clone()
+            for k, p in enumerate(pads):
+                if p:
+                    ids[k, :p + n] = torch.cat([self.ids[0], ids[k, :p]])
+                    mask[k, :n] = 1; mask[k, n:n + p] = 0
+            inputs["input_ids"], inputs["attention_mask"] = ids, mask
+        self.hits += rows; tracing.count("eval.prefix_cache_hits", rows)
+        return _repeat_cache(self.past, rows)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "prefix_tokens": int(self.ids.shape[-1]) if self.ids is not None else 0,
+                "hits": self.hits, "misses": self.misses, "encodes": self.encodes}
+
+def _repeat_cache(past, rows: int):
+    """New tensors holding past repeated rows times along the batch dim (DynamicCache or legacy tuples)."""
+    legacy = past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+    out = tuple((k.repeat(rows, 1, 1, 1), v.repeat(rows, 1, 1, 1)) for k, v in legacy)
+    return type(past).from_legacy_cache(out) if hasattr(past, "to_legacy_cache") else out
+
+PREFIX_CACHE = PrefixCache()
 
 
 # ----- Prompting -----
@@ -98,227 +280,7 @@ def build_chat(ex: dict):
 def render_prompt(messages):
     return tok.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
 
-# ----- Parse/repair helpers -----
-def extract_json(s: str) -> dict:
-    m = re.search(r"\{.*\}", s, flags=re.S)
-    if not m:
-        raise ValueError("no-json-braces")
-    return json.loads(m.group(0))
-
-def repair_json(s: str) -> dict:
-    start = s.find('{')
-    if start == -1:
-        raise ValueError("no-json-start")
-    s = s[start:]
-    s = ''.join(ch for ch in s if ord(ch) >= 9)
-    stack = []; out = []
-    for ch in s:
-        out.append(ch)
-        if ch == '{': stack.append('}')
-        elif ch == '[': stack.append(']')
-        elif ch in ('}', ']'):
-            if stack and ch == stack[-1]: stack.pop()
-        if not stack and ch in ('}', ']'): break
-    s2 = ''.join(out)
-    s2 = re.sub(r",\s*([}\]])", r"\1", s2)
-    # normalize flags entries like ["key": 123] -> ["key"]
-    def _norm_flags(txt: str) -> str:
-        m = re.search(r'"guardrail_report"\s*:\s*\{[^}]*"flags"\s*:\s*\[(.*?)\]', txt, flags=re.S)
-        if not m: return txt
-        inner = m.group(1)
-        inner_norm = re.sub(r'"([A-Za-z0-9_]+)"\s*:\s*(\{[^}]*\}|\[[^\]]*\]|"[^"]*"|[0-9\.\-]+)', r'"\1"', inner)
-        return txt[:m.start(1)] + inner_norm + txt[m.end(1):]
-    s2 = _norm_flags(s2)
-    while stack: s2 += stack.pop()
-    return json.loads(s2)
-
-# ----- Canonical flag names -----
-FLAG_SYNONYMS = {
-    # allergens / intolerances
-    "peanut_allergen": "allergen_peanuts_detected",
-    "tree_nut_allergen": "allergen_tree_nuts_detected",
-    "shellfish": "allergen_shellfish_detected",
-    "sesame_allergen": "allergen_sesame_detected",
-    "milk_allergen": "allergen_milk_detected",
-    "eggs_banned": "allergen_eggs_detected",
-    "wheat_allergen": "allergen_wheat_detected",
-    "soy_allergen": "allergen_soy_detected",
-    "lactose": "lactose_detected",
-    "gluten_in_recipe": "gluten_detected",
-    # diet/culture
-    "non_vegan_dairy": "non_vegan_ingredient",
-    "non_vegetarian_egg": "non_vegetarian_ingredient",
-    "pork_in_kosher": "non_kosher_pork",
-    "non_kosher_meat": "non_kosher_meat_dairy_mix",
-    "alcohol_in_recipe": "non_halal_alcohol",
-    # nutrition/metabolic
-    "sugar_content_high": "added_sugars_high",
-    "sodium_per_recipe_high": "sodium_per_recipe_high",
-    "carbs_over_target": "carbs_over_target",
-    "protein_per_recipe_high": "protein_over_target_ckd",
-    "vitamin_a_rae_too_high": "vitamin_a_exceeds_safe_pregnancy",
-    # drug-food
-    "drug_food_grapefruit": "drug_food_grapefruit_statin",
-    "drug_food_vitK_warfarin": "drug_food_vitK_warfarin",
-    # fitness/safety
-    "supine_crunches_risk": "exercise_contraindicated_pregnancy_supine",
-    "injury_risk": "exercise_contraindicated_back",
-}
-
-def canonicalize_flags(flags):
-    out=[]
-    for f in flags:
-        f = str(f).strip()
-        f = FLAG_SYNONYMS.get(f, f)
-        out.append(f)
-    return out
-
-
-# ----- Ruleset loading -----
-def load_ruleset():
-    import json, hashlib
-    path = "rulesets/v1.json"
-    try:
-        with open(path, "rb") as rf:
-            raw = rf.read()
-        data = json.loads(raw.decode("utf-8"))
-        data["_sha256"] = hashlib.sha256(raw).hexdigest()
-        data["_path"] = path
-        return data
-    except FileNotFoundError:
-        return {"version":"v1","thresholds":{}, "_sha256":"", "_path":""}
-
-RULESET = load_ruleset()
-
-# ----- Deterministic rules (FDA oracle) -----
-def rule_expected(input_obj: dict) -> dict:
-    exp_flags=set(); hard=False
-    cfg = RULESET.get("thresholds", {})
-    DIABETES_ADDED_SUGARS_HIGH = cfg.get("diabetes_added_sugars_high_g", 15)
-    POULTRY_SAFE_C = cfg.get("poultry_min_cook_temp_c", 74)
-    PREG_VIT_A_UL = cfg.get("vitamin_a_pregnancy_ul_rae_ug", 3000)
-
-    prof=input_obj.get("profile",{})
-    diet=(prof.get("diet") or input_obj.get("diet") or "").lower()
-    med=set([m.lower() for m in prof.get("medical_conditions", input_obj.get("medical_conditions", []))])
-    meds=set([m.lower() for m in prof.get("medications", input_obj.get("medications", []))])
-    banned=set([a.lower() for a in prof.get("allergens_banned", [])])
-    intoler=set([i.lower() for i in prof.get("intolerances", [])])
-
-    def ing_list(obj):
-        if "recipe" in obj and obj["recipe"].get("ingredients"):
-            return [(i.get("name","") or "").lower() for i in obj["recipe"]["ingredients"]]
-        return []
-
-    def add(flag, is_hard=True):
-        nonlocal hard
-        exp_flags.add(flag)
-        if is_hard: hard=True
-
-    ings = ing_list(input_obj)
-
-    # Allergens
-    if "peanuts" in banned and any("peanut" in x for x in ings): add("allergen_peanuts_detected")
-    if "tree nuts" in banned and any(x in ("almond","almonds") for x in ings): add("allergen_tree_nuts_detected")
-    if "shellfish" in banned and any("shrimp" in x for x in ings): add("allergen_shellfish_detected")
-    if "sesame" in banned and any("sesame" in x for x in ings): add("allergen_sesame_detected")
-    if "milk" in banned and any(("milk" in x) or ("cheese" in x) for x in ings): add("allergen_milk_detected")
-    if "eggs" in banned and any("egg" in x for x in ings): add("allergen_eggs_detected")
-    if "wheat" in banned and any(("wheat" in x) or ("flour" in x) for x in ings): add("allergen_wheat_detected")
-    if "soy" in banned and any(("soy" in x) or ("tofu" in x) for x in ings): add("allergen_soy_detected")
-
-    # Intolerance
-    if "lactose" in intoler and any("milk" in x and "lactose-free" not in x for x in ings): add("lactose_detected")
-
-    # Diets
-    if diet=="vegan" and any(x in ("cheddar","milk","cheese","butter","egg","eggs") for x in ings): add("non_vegan_ingredient")
-    if diet=="kosher":
-        if any("pork" in x for x in ings): add("non_kosher_pork")
-        if any("beef" in x for x in ings) and any(("cheese" in x) or ("milk" in x) for x in ings): add("non_kosher_meat_dairy_mix")
-    if diet=="halal" and any(("beer" in x) or ("alcohol" in x) or ("wine" in x) for x in ings): add("non_halal_alcohol")
-
-    # Medical targets
-    day = input_obj.get("meal_day",{})
-    targets = (prof.get("targets") or day.get("targets") or input_obj.get("targets") or {})
-    sodium_goal = targets.get("sodium_mg")
-    if sodium_goal and day.get("recipes"):
-        tot = sum(r.get("sodium_mg",0) for r in day["recipes"])
-        if tot > sodium_goal: add("sodium_over_target")
-    per_max = prof.get("per_recipe_sodium_mg_max") or input_obj.get("per_recipe_sodium_mg_max")
-    if per_max and input_obj.get("recipe",{}).get("sodium_mg",0) > per_max: add("sodium_per_recipe_high")
-    if "diabetes" in med and input_obj.get("recipe",{}).get("sugars_g",0) >= DIABETES_ADDED_SUGARS_HIGH: add("added_sugars_high")
-
-    # CKD
-    # Protein limit for CKD (daily)
-    pmax = targets.get('protein_g_max')
-    if 'chronic kidney disease' in med and pmax is not None and day.get('recipes'):
-        totp = sum(r.get('protein_g',0) for r in day['recipes'])
-        if totp > pmax:
-            add('protein_over_target_ckd')
-
-    # CKD
-    k_goal = targets.get("potassium_mg")
-    if "chronic kidney disease" in med and k_goal and day.get("recipes"):
-        tot = sum(r.get("potassium_mg",0) for r in day["recipes"])
-        if tot > k_goal: add("potassium_over_target")
-
-    # Pregnancy
-    # Vitamin A (retinol activity equivalents) conservative UL ~3000 µg RAE/day
-    if 'pregnancy' in med and day.get('recipes'):
-        vita = sum(r.get('vitamin_a_rae_ug',0) for r in day['recipes'])
-        if vita > PREG_VIT_A_UL:
-            add('vitamin_a_exceeds_safe_pregnancy')
-
-    # Pregnancy
-    if "pregnancy" in med:
-        if any("swordfish" in x for x in ings): add("high_mercury_fish")
-        if any(("alcohol" in x) or ("wine" in x) or ("beer" in x) for x in ings): add("alcohol_present")
-        if any("raw egg" in x for x in ings): add("raw_egg_risk")
-
-    # Celiac/gluten-free
-    if ("celiac disease" in med or diet=="gluten free") and any(("wheat" in x) or ("flour" in x) for x in ings): add("gluten_detected")
-
-    # Keto
-    if diet=="keto" and day.get("recipes"):
-        carbs_goal = (prof.get("targets") or {}).get("carbs_g_per_day") or targets.get("carbs_g_per_day")
-        if carbs_goal is not None:
-            tot = sum(r.get("carbs_g",0) for r in day["recipes"])
-            if tot > carbs_goal: add("carbs_over_target")
-
-    # Drug–food
-    if "warfarin" in meds and any(("kale" in x) or ("spinach" in x) for x in ings): add("drug_food_vitK_warfarin")
-    if "statin" in meds and any("grapefruit" in x for x in ings): add("drug_food_grapefruit_statin")
-
-    # Safety / fitness
-    age = prof.get("age_years")
-    if isinstance(age,(int,float)) and age < 4 and any("whole grapes" in x for x in ings): add("choking_hazard_toddler")
-    if input_obj.get("recipe",{}).get("cook_temp_c",0) and input_obj["recipe"]["cook_temp_c"] < POULTRY_SAFE_C and "chicken" in (input_obj["recipe"].get("name","").lower()): add("undercooked_poultry")
-    injuries=set([i.lower() for i in prof.get("injuries", input_obj.get('injuries', []))])
-    if "knee" in injuries and input_obj.get("workout",{}).get("exercises"):
-        if any(("squat" in (e.get("name","").lower())) and ("ass-to-grass" in (e.get("depth","").lower())) for e in input_obj["workout"]["exercises"]):
-            add("exercise_contraindicated_knee")
-    if "lower back" in injuries and input_obj.get("workout",{}).get("exercises"):
-        if any(("deadlift" in (e.get("name","").lower())) and ("heavy" in (e.get("intensity","").lower())) for e in input_obj["workout"]["exercises"]):
-            add("exercise_contraindicated_back")
-    if "pregnancy" in med and prof.get("pregnancy_trimester")==3 and input_obj.get("workout",{}).get("exercises"):
-        if any("supine" in (e.get("name","").lower()) for e in input_obj["workout"]["exercises"]):
-            add("exercise_contraindicated_pregnancy_supine")
-
-    # Budget / inventory
-    if prof.get("budget_usd") is not None and input_obj.get("cart",{}).get("items"):
-        tot = sum(i.get("price_usd",0) for i in input_obj["cart"]["items"])
-        if tot > prof["budget_usd"]: add("budget_exceeded")
-    store = prof.get("store") or input_obj.get("store")
-    if store and input_obj.get("cart",{}).get("items"):
-        for i in input_obj["cart"]["items"]:
-            if "costco" in i.get("sku","").lower() and "trader" in store.lower():
-                add("store_item_unavailable")
-
-    exp = {"hard_fail": bool(exp_flags), "flags": sorted(exp_flags)}
-    exp["flags"] = canonicalize_flags(exp["flags"])
-    return exp
-
-# ----- IO & comparison -----
+# ----- IO -----
 def load_tests(path):
     tests = []
     with open(path, 'r', encoding='utf-8') as f:
@@ -328,67 +290,143 @@ def load_tests(path):
                 tests.append(json.loads(ln))
     return tests
 
-def normalize_guardrail(obj: dict) -> dict:
-    gr = obj.get("guardrail_report", {})
-    if not isinstance(gr, dict): gr = {}
-    hard = bool(gr.get("hard_fail", False))
-    flags = gr.get("flags", [])
-    if not isinstance(flags, list): flags = []
-    flags = [str(x) for x in flags]
-    flags = canonicalize_flags(flags)
-    return {"hard_fail": hard, "flags": flags}
-
-def matches_expected(actual: dict, expected: dict) -> bool:
-    if actual["hard_fail"] != expected.get("hard_fail", False):
-        return False
-    exp_flags = set(expected.get("flags", []))
-    act_flags = set(actual.get("flags", []))
-    return exp_flags.issubset(act_flags)
-
 # ----- Run -----
-tests = load_tests(TEST_PATH)
-ok = 0; fail = 0; per_cat = {}
-
-for i, ex in enumerate(tests, 1):
-    # Prompt the model
-    prompt = render_prompt(build_chat(ex))
-    gen = generate_text(prompt)
-
+RESULT_CACHE = ResultCache()
+
+def generation_key_parts(batch_size: int, max_new_tokens: int) -> dict:
+    """Everything besides the prompt that changes what generate_batch returns."""
+    return {"max_new_tokens": max_new_tokens, "batch_size": batch_size, "json_decoding": JSON_DECODING,
+            "allowed_flags": ALLOWED_FLAGS, "generation_config": mdl.generation_config.to_dict()}
+
+def generate_all(prompts: list, batch_size: int = 1, max_new_tokens: int = 768):
+    gens = [None] * len(prompts); decode = [None] * len(prompts); new_tokens = 0
+    t0 = time.perf_counter()
+    # Serve unchanged tests from the result cache; only the rest go to the model
+    keys = [None] * len(prompts); todo = list(range(len(prompts)))
+    if RESULT_CACHE.enabled:
+        parts = (RESULT_CACHE.model_fingerprint(MODEL_DIR), generation_key_parts(batch_size, max_new_tokens),
+                 RULESET.get("_sha256", ""))
+        keys = [RESULT_CACHE.key(parts[0], p, parts[1], parts[2]) for p in prompts]
+        todo = []
+        for k, key in enumerate(keys):
+            hit = RESULT_CACHE.get(key)
+            if hit is None:
+                todo.append(k)
+            else:
+                gens[k] = hit["text"]; decode[k] = {**hit["decode"], "cached": True}
+                tracing.count("eval.result_cache_hits")
+    for idx in length_buckets([prompts[k] for k in todo], batch_size):
+        idx = [todo[j] for j in idx]
+        batch = [prompts[k] for k in idx]
+        base = unconstrained_tokens(batch, max_new_tokens) if JSON_DECODING["baseline"] and JSON_DECODING["stop"] else None
+        for j, (k, (text, n, closed)) in enumerate(zip(idx, generate_batch(batch, max_new_tokens))):
+            gens[k] = text; new_tokens += n
+            decode[k] = {"new_tokens": n, "stopped_at_close": closed}
+            if base is not None:
+                decode[k].update(unconstrained_tokens=base[j], tokens_saved=base[j] - n)
+            if keys[k]:
+                RESULT_CACHE.put(keys[k], {"text": text, "decode": decode[k]})
+            decode[k] = {**decode[k], "cached": False}
+    wall = time.perf_counter() - t0
+    perf = {"batch_size": batch_size, "max_new_tokens": max_new_tokens, "wall_s": round(wall, 3),
+            "generated_tokens": new_tokens, "tokens_per_s": round(new_tokens / wall, 2) if wall else 0.0,
+            "tests_per_s": round(len(prompts) / wall, 3) if wall else 0.0,
+            "json_decoding": dict(JSON_DECODING), "stopped_at_close": sum(bool(d["stopped_at_close"]) for d in decode),
+            "result_cache": RESULT_CACHE.stats()}
+    saved = [d["tokens_saved"] for d in decode if "tokens_saved" in d]
+    if saved:
+        perf["tokens_saved"] = sum(saved); perf["tokens_saved_per_test"] = round(sum(saved) / len(saved), 2)
+    return gens, perf, decode
+
+def score(i: int, ex: dict, gen: str) -> dict:
+    """Parse/repair one model output and judge it against the oracle."""
+    res = {"i": i, "category": ex.get("category","misc"), "repaired": False}
     # Parse/repair model JSON
-    try:
-        obj = extract_json(gen)
-    except Exception:
+    with tracing.span("eval.parse", test=i):
         try:
-            obj = repair_json(gen)
-        except Exception as e:
-            print(f"[{i}] FAIL: unparseable JSON :: {e}\n--- RAW ---\n{gen[:300]}\n-----------")
-            fail += 1
-            per_cat.setdefault(ex.get("category","misc"), {"pass":0,"fail":0})["fail"] += 1
-            continue
+            obj = extract_json(gen); err = None
+        except Exception:
+            res["repaired"] = True; tracing.count("eval.repair_fallbacks")
+            try:
+                obj = repair_json(gen)
+            except Exception as e:
+                err = e
+    if err is not None:
+        tracing.count("eval.unparseable")
+        return {**res, "pass": False, "line": f"[{i}] FAIL: unparseable JSON :: {err}\n--- RAW ---\n{gen[:300]}\n-----------"}
 
     # Model output → normalized
     actual = normalize_guardrail(obj)
 
     # Deterministic oracle (FDA) → expected, and also union with model for runtime behavior
-    derived = rule_expected(ex.get("input", ex))
+    with tracing.span("eval.oracle", test=i):
+        derived = rule_expected(ex.get("input", ex))
     # Runtime decision uses deterministic rules (FDA oracle). Model flags are advisory only.
     actual_effective = derived
     # (Optional) Keep a record of model extras for logging/audit; not used for pass/fail.
     model_extras = sorted(set(actual['flags']) - set(derived['flags']))
 
     if matches_expected(actual_effective, derived):
-        print(f"[{i}] PASS")
-        ok += 1
-        per_cat.setdefault(ex.get("category","misc"), {"pass":0,"fail":0})["pass"] += 1
-    else:
-        print(f"[{i}] FAIL: expected={expected} actual={actual_union}")
-        fail += 1
-        per_cat.setdefault(ex.get("category","misc"), {"pass":0,"fail":0})["fail"] += 1
-
-summary = {"pass": ok, "fail": fail, "total": ok + fail, "by_category": per_cat,
-           "ruleset": {"version": RULESET.get("version","v1"), "path": RULESET.get("_path",""), "sha256": RULESET.get("_sha256", "")}}
-print(summary)
-
-os.makedirs("reports", exist_ok=True)
-with open("reports/guardrail_eval_report.json","w") as f:
-    json.dump(summary, f, indent=2)
+        return {**res, "pass": True, "line": f"[{i}] PASS"}
+    return {**res, "pass": False, "line": f"[{i}] FAIL: expected={derived} actual={actual_effective}"}
+
+def summarize(tests: list, results: list, perf: dict, decode: list) -> dict:
+    """Merge per-test results (any order) into the guardrail_eval_report summary."""
+    ok = 0; fail = 0; per_cat = {}
+    for r in sorted(results, key=lambda r: r["i"]):
+        if r["pass"]: ok += 1
+        else: fail += 1
+        per_cat.setdefault(r["category"], {"pass":0,"fail":0})["pass" if r["pass"] else "fail"] += 1
+    perf["repair_fallbacks"] = sum(r["repaired"] for r in results)
+    return {"pass": ok, "fail": fail, "total": ok + fail, "by_category": per_cat,
+            "ruleset": {"version": RULESET.get("version","v1"), "path": RULESET.get("_path",""), "sha256": RULESET.get("_sha256", "")},
+            "perf": perf,
+            "decode": [{"id": ex.get("id", str(i)), **d} for i, (ex, d) in enumerate(zip(tests, decode), 1)]}
+
+def write_report(summary: dict, path: str = "reports/guardrail_eval_report.json"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path,"w") as f:
+        json.dump(summary, f, indent=2)
+
+def add_generation_args(ap):
+    ap.add_argument("--batch-size", type=int, default=1, help="prompts per generate() call (greedy, left-padded)")
+    ap.add_argument("--max-new-tokens", type=int, default=768)
+    ap.add_argument("--no-prefix-cache", action="store_true", help="re-encode the system + few-shot prefix on every call")
+    ap.add_argument("--no-json-stop", action="store_true", help="decode until EOS / max-new-tokens, unconstrained")
+    ap.add_argument("--no-flag-constraint", action="store_true", help="stop at the closing brace but do not restrict flag names")
+    ap.add_argument("--measure-savings", action="store_true",
+                    help="also decode uncached tests unconstrained and report tokens_saved per test (second generate() per batch)")
+    ap.add_argument("--no-cache", action="store_true", help="bypass the on-disk result cache (always run the model)")
+    ap.add_argument("--cache-max-mb", type=int, default=64, help="result cache size bound; LRU entries are evicted beyond it")
+
+def apply_generation_args(args):
+    RESULT_CACHE.enabled = not args.no_cache
+    RESULT_CACHE.max_bytes = args.cache_max_mb << 20
+    PREFIX_CACHE.enabled = not args.no_prefix_cache
+    JSON_DECODING["stop"] = not args.no_json_stop
+    JSON_DECODING["constrain_flags"] = not args.no_flag_constraint
+    JSON_DECODING["baseline"] = args.measure_savings
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    add_generation_args(ap)
+    args = ap.parse_args()
+    apply_generation_args(args)
+    load_model()
+
+    tests = load_tests(TEST_PATH)
+
+    # Prompt the model (length-bucketed batches; results come back in test order)
+    prompts = [render_prompt(build_chat(ex)) for ex in tests]
+    gens, perf, decode = generate_all(prompts, max(1, args.batch_size), args.max_new_tokens)
+    perf["prefix_cache"] = PREFIX_CACHE.stats()
+
+    results = []
+    for i, (ex, gen) in enumerate(zip(tests, gens), 1):
+        r = score(i, ex, gen)
+        print(r["line"])
+        results.append(r)
+
+    summary = summarize(tests, results, perf, decode)
+    print(summary)
+    write_report(summary)
@@ -0,0 +1,152 @@
+import argparse, json, os, queue, sys, time
+import multiprocessing as mp
+
+# Sharded guardrail eval: N worker processes, each with its own model copy pinned to
+# a disjoint set of CPU cores, pull chunks of tests from a bounded queue. The main
+# process merges per-test results into the usual reports/guardrail_eval_report.json.
+#
+#   python models/eval_sharded.py --workers 4 --batch-size 4
+#   python models/eval_sharded.py --scaling 1,2,4,8      # writes reports/guardrail_eval_scaling.json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def core_groups(workers: int) -> list:
+    """Split the CPUs this process may use into `workers` contiguous, disjoint groups."""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if workers > len(cpus):
+        return [[cpus[w % len(cpus)]] for w in range(workers)]
+    size, extra = divmod(len(cpus), workers)
+    groups = []; start = 0
+    for w in range(workers):
+        end = start + size + (1 if w < extra else 0)
+        groups.append(cpus[start:end]); start = end
+    return groups
+
+
+def worker(wid: int, cores: list, args, work_q, result_q):
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    import torch
+    torch.set_num_threads(max(1, len(cores)))
+    import eval_guardrails as eg
+    eg.apply_generation_args(args)
+    t0 = time.perf_counter()
+    eg.load_model()
+    result_q.put(("ready", wid, {"cores": cores, "load_s": round(time.perf_counter() - t0, 3)}))
+    tokens = 0; busy = 0.0; done = 0
+    while True:
+        task = work_q.get()
+        if task is None:
+            break
+        prompts = [eg.render_prompt(eg.build_chat(ex)) for _, ex in task]
+        gens, perf, decode = eg.generate_all(prompts, max(1, args.batch_size), args.max_new_tokens)
+        results = [eg.score(i, ex, gen) for (i, ex), gen in zip(task, gens)]
+        for r, d in zip(results, decode):
+            r["decode"] = d
+        tokens += perf["generated_tokens"]; busy += perf["wall_s"]; done += len(task)
+        result_q.put(("done", wid, results))
+    result_q.put(("exit", wid, {"tests": done, "generated_tokens": tokens, "busy_s": round(busy, 3),
+                                "prefix_cache": eg.PREFIX_CACHE.stats(), "result_cache": eg.RESULT_CACHE.stats()}))
+
+
+def run_sharded(tests: list, args, workers: int) -> dict:
+    ctx = mp.get_context("spawn")
+    work_q = ctx.Queue(maxsize=max(1, args.queue_size))
+    result_q = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(w, cores, args, work_q, result_q), daemon=True)
+             for w, cores in enumerate(core_groups(workers))]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+
+    chunk = max(1, args.chunk or 2 * args.batch_size)
+    pending = [[(i, ex) for i, ex in enumerate(tests[k:k + chunk], k + 1)] for k in range(0, len(tests), chunk)]
+    pending += [None] * workers  # one stop sentinel per worker
+    results = []; info = {}; exited = 0
+    while exited < workers:
+        # keep the bounded queue topped up without blocking on it
+        while pending:
+            try:
+                work_q.put_nowait(pending[0])
+            except queue.Full:
+                break
+            pending.pop(0)
+        try:
+            msg = result_q.get(timeout=1.0)
+        except queue.Empty:
+            dead = [p for p in procs if p.exitcode not in (None, 0)]
+            if dead:
+                for p in procs:
+                    p.terminate()
+                raise RuntimeError(f"eval worker exited with code {dead[0].exitcode}")
+            continue
+        kind, wid, payload = msg
+        if kind == "ready":
+            info[wid] = payload
+        elif kind == "done":
+            results.extend(payload)
+        else:
+            info[wid].update(payload); exited += 1
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - t0
+
+    results.sort(key=lambda r: r["i"])
+    tokens = sum(w["generated_tokens"] for w in info.values())
+    perf = {"workers": workers, "batch_size": args.batch_size, "max_new_tokens": args.max_new_tokens,
+            "wall_s": round(wall, 3), "generated_tokens": tokens,
+            "tokens_per_s": round(tokens / wall, 2) if wall else 0.0,
+            "tests_per_s": round(len(tests) / wall, 3) if wall else 0.0,
+            "stopped_at_close": sum(bool(r["decode"]["stopped_at_close"]) for r in results),
+            "result_cache": {k: sum(w["result_cache"][k] for w in info.values()) for k in ("hits", "misses", "evictions")},
+            "per_worker": [info[w] for w in sorted(info)]}
+    saved = [r["decode"]["tokens_saved"] for r in results if "tokens_saved" in r["decode"]]
+    if saved:
+        perf["tokens_saved"] = sum(saved); perf["tokens_saved_per_test"] = round(sum(saved) / len(saved), 2)
+    return {"results": results, "perf": perf}
+
+
+def main():
+    import eval_guardrails as eg
+    ap = argparse.ArgumentParser()
+    eg.add_generation_args(ap)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--queue-size", type=int, default=4, help="max chunks waiting in the work queue")
+    ap.add_argument("--chunk", type=int, default=0, help="tests per work item (default 2 x batch size)")
+    ap.add_argument("--tests", default=eg.TEST_PATH)
+    ap.add_argument("--scaling", default="", help="comma-separated worker counts, e.g. 1,2,4,8")
+    args = ap.parse_args()
+    tests = eg.load_tests(args.tests)
+
+    if args.scaling:
+        # cold runs only: a warm result cache would hide the model cost
+        args.no_cache = True
+        rows = []
+        for n in [int(x) for x in args.scaling.split(",") if x.strip()]:
+            perf = run_sharded(tests, args, n)["perf"]
+            rows.append({"workers": n, "wall_s": perf["wall_s"], "tests_per_s": perf["tests_per_s"],
+                         "tokens_per_s": perf["tokens_per_s"]})
+        # speedup and efficiency relative to the first (smallest) worker count
+        base = rows[0]
+        print(f"{'workers':>7} {'wall_s':>9} {'tests/s':>8} {'speedup':>8} {'efficiency':>10}")
+        for row in rows:
+            row["speedup"] = round(base["wall_s"] / row["wall_s"], 2)
+            row["efficiency"] = round(row["speedup"] * base["workers"] / row["workers"], 2)
+            print(f"{row['workers']:>7} {row['wall_s']:>9} {row['tests_per_s']:>8} {row['speedup']:>8} {row['efficiency']:>10}")
+        os.makedirs("reports", exist_ok=True)
+        with open("reports/guardrail_eval_scaling.json", "w") as f:
+            json.dump({"tests": len(tests), "batch_size": args.batch_size, "rows": rows}, f, indent=2)
+        return 0
+
+    out = run_sharded(tests, args, max(1, args.workers))
+    for r in out["results"]:
+        print(r["line"])
+    summary = eg.summarize(tests, out["results"], out["perf"], [r["decode"] for r in out["results"]])
+    print(summary)
+    eg.write_report(summary)
+    return 0 if summary["fail"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
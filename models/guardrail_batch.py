@@ -0,0 +1,99 @@
+import gc, json, sys, time
+from array import array
+from itertools import repeat
+from operator import methodcaller
+import numpy as np
+
+from guardrail_rules import DAY_FLAGS, DAY_NUTRIENTS, ENGINE, Profile, report
+
+# Batch guardrail evaluation.
+#
+# Same reports as rule_expected, but the meal-day nutrient checks (sodium,
+# potassium, CKD protein, pregnancy vitamin A, keto carbs) for the whole batch
+# run as one columnar pass: each recipe value lands in a flat value column,
+# per-day totals are a segmented sum keyed by (day, nutrient), and all limits
+# are compared at once.
+
+# recipe -> nutrient value, evaluated in C via map()
+_GETTERS = [methodcaller("get", key, 0) for key in DAY_NUTRIENTS]
+# top-level keys Profile falls back to when the profile lacks them
+_PROFILE_FALLBACKS = frozenset(("diet", "medical_conditions", "medications", "injuries"))
+
+def evaluate_batch(inputs, engine=ENGINE) -> list:
+    """Evaluate many inputs; returns one {"hard_fail", "flags"} report per input, in order."""
+    n = len(inputs); width = len(DAY_NUTRIENTS)
+    flags = []
+    # sparse columnar layout: one (cell, value) pair per recipe and applicable nutrient,
+    # where cell = day_position * width + nutrient_column
+    cells = array("q"); vals = array("d"); lim_cells = []; lim_vals = []
+    profiles = {}
+    for k, input_obj in enumerate(inputs):
+        # plans of one user usually share their profile dict; resolve it once per batch
+        prof = input_obj.get("profile")
+        if prof is None or not _PROFILE_FALLBACKS.isdisjoint(input_obj):
+            p = Profile(input_obj)
+        else:
+            p = profiles.get(id(prof))
+            if p is None:
+                p = profiles[id(prof)] = Profile(input_obj)
+        flags.append(engine.item_flags(input_obj, p))
+        recipes = input_obj.get("meal_day",{}).get("recipes")
+        if not recipes:
+            continue
+        for j, lim in enumerate(engine.day_limits(input_obj, p)):
+            if lim is None:
+                continue
+            cell = k * width + j
+            lim_cells.append(cell); lim_vals.append(lim)
+            cells.extend(repeat(cell, len(recipes)))
+            vals.extend(map(_GETTERS[j], recipes))
+
+    if cells:
+        totals = np.bincount(np.frombuffer(cells, dtype=np.int64), weights=np.frombuffer(vals, dtype=np.float64),
+                             minlength=n * width)
+        limits = np.full(n * width, np.nan)
+        limits[lim_cells] = lim_vals
+        # NaN limits (rule not applicable) never compare greater
+        for cell in np.flatnonzero(totals > limits):
+            k, j = divmod(int(cell), width)
+            flags[k].add(DAY_FLAGS[j])
+    return [report(f) for f in flags]
+
+
+# ----- Benchmark: per-item rule_expected vs evaluate_batch -----
+def synthetic_plans(tests, n, seed=0):
+    rng = np.random.default_rng(seed)
+    base = [t.get("input", t) for t in tests]
+    plans = []
+    for k in range(n):
+        src = base[k % len(base)]
+        days = int(rng.integers(3, 7))
+        recipes = [{key: float(rng.integers(0, 1200)) for key in DAY_NUTRIENTS} for _ in range(days)]
+        plans.append({**src, "meal_day": {"targets": {"sodium_mg": 2300, "potassium_mg": 2000, "protein_g_max": 60}, "recipes": recipes}})
+    return plans
+
+def _best_of(fn, repeats):
+    best = None
+    for _ in range(repeats):
+        gc.collect()
+        t0 = time.perf_counter(); out = fn(); dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return out, best
+
+def bench(sizes=(10_000, 100_000), test_path="models/data/KaizenEdge_Guardrail_Tests_v2.jsonl", repeats=3):
+    with open(test_path, encoding="utf-8") as f:
+        tests = [json.loads(ln) for ln in f if ln.strip()]
+    rows = []
+    for n in sizes:
+        plans = synthetic_plans(tests, n)
+        ref, t_item = _best_of(lambda: [ENGINE.evaluate(x) for x in plans], repeats)
+        out, t_batch = _best_of(lambda: evaluate_batch(plans), repeats)
+        assert out == ref, "batch and per-item reports differ"
+        rows.append({"plans": n, "per_item_per_s": round(n / t_item), "batch_per_s": round(n / t_batch),
+                     "speedup": round(t_item / t_batch, 2)})
+    return rows
+
+if __name__ == "__main__":
+    sizes = tuple(int(x) for x in sys.argv[1:]) or (10_000, 100_000)
+    for row in bench(sizes):
+        print(row)
@@ -0,0 +1,271 @@
+import re
+import torch
+from transformers import LogitsProcessor, StoppingCriteria
+
+# JSON-aware decoding for {"guardrail_report": {"hard_fail": ..., "flags": [...]}}.
+#
+# A per-row scanner follows the generated text character by character. The
+# stopping criterion ends a row as soon as its top-level object closes, and
+# the logits processor restricts tokens inside the "flags" array to the
+# allowed flag names, so the output parses without a repair pass. The tokens
+# allowed in each grammar state are worked out once and kept as an additive
+# 0/-inf mask, so a constrained step is one vector add per row.
+
+WS = " "
+
+class FlagGrammar:
+    """Character automaton for the body of the flags array, after '[' up to and including ']'.
+
+    States: ("open",) | ("name", node) | ("item",) | ("comma",) | ("space",) | ("end",)
+    where node is a dict trie over allowed names; the key '"' marks a complete name.
+    """
+    END = ("end",)
+
+    def __init__(self, names):
+        self.root = {}
+        for name in names:
+            node = self.root
+            for ch in name:
+                node = node.setdefault(ch, {})
+            node['"'] = None
+
+    def start(self):
+        return ("open",)
+
+    def step(self, state, ch):
+        kind = state[0]
+        if kind == "open":
+            if ch == '"': return ("name", self.root)
+            if ch == "]": return self.END
+        elif kind == "name":
+            if ch in state[1]:
+                nxt = state[1][ch]
+                return ("item",) if nxt is None else ("name", nxt)
+        elif kind == "item":
+            if ch == ",": return ("comma",)
+            if ch == "]": return self.END
+        elif kind == "comma":
+            if ch == WS: return ("space",)
+            if ch == '"': return ("name", self.root)
+        elif kind == "space":
+            if ch == '"': return ("name", self.root)
+        return None
+
+    def next_chars(self, state):
+        kind = state[0]
+        if kind == "open": return ('"', "]")
+        if kind == "name": return tuple(state[1])
+        if kind == "item": return (",", "]")
+        if kind == "comma": return (WS, '"')
+        if kind == "space": return ('"',)
+        return ()
+
+    def key(self, state):
+        """Hashable id of a state (trie nodes by identity; stable while this grammar lives)."""
+        return ("name", id(state[1])) if state[0] == "name" else state
+
+    def accepts(self, state, text):
+        """True if text is a valid continuation; characters after the closing ']' are not constrained."""
+        for ch in text:
+            if state == self.END:
+                return True
+            state = self.step(state, ch)
+            if state is None:
+                return False
+        return True
+
+
+class JsonScan:
+    """Tracks one row's generated text: object depth, closure, and the flags-array region."""
+    __slots__ = ("grammar", "depth", "started", "closed", "closed_at", "in_str", "esc",
+                 "buf", "last_str", "colon", "flags", "tokens")
+
+    def __init__(self, grammar: FlagGrammar):
+        self.grammar = grammar
+        self.depth = 0; self.started = False; self.closed = False; self.closed_at = None
+        self.in_str = False; self.esc = False; self.buf = []; self.last_str = None; self.colon = False
+        self.flags = None  # grammar state while inside "flags": [ ... ]
+        self.tokens = 0
+
+    def feed(self, text: str):
+        self.tokens += 1
+        for ch in text:
+            if self.closed:
+                return
+            if self.flags is not None:
+                self.flags = self.grammar.step(self.flags, ch)
+                if self.flags == FlagGrammar.END:
+                    self.flags = None
+            if self.in_str:
+                if self.esc: self.esc = False
+                elif ch == "\\": self.esc = True
+                elif ch == '"':
+                    self.in_str = False; self.last_str = "".join(self.buf); self.colon = False
+                else: self.buf.append(ch)
+                continue
+            if ch == '"':
+                self.in_str = True; self.buf = []
+            elif ch == ":":
+                self.colon = True
+            elif ch == "{":
+                self.started = True; self.depth += 1
+            elif ch == "[":
+                if self.colon and self.last_str == "flags" and self.flags is None:
+                    self.flags = self.grammar.start()
+                self.colon = False
+            elif ch == "}":
+                self.depth -= 1
+                if self.started and self.depth <= 0:
+                    self.closed = True; self.closed_at = self.tokens
+            elif not ch.isspace():
+                self.colon = False
+
+
+class GuardrailDecoding:
+    """Shared per-generate() state for the stopping criterion and the flags constraint."""
+
+    def __init__(self, tok, flag_names, prompt_len: int, constrain: bool = True):
+        self.vocab = vocab_strings(tok)
+        self.grammar = grammar_for(flag_names)
+        self.prompt_len = prompt_len
+        self.constrain = constrain
+        self.rows = []
+
+    def sync(self, input_ids):
+        if not self.rows:
+            self.rows = [JsonScan(self.grammar) for _ in range(input_ids.shape[0])]
+        for row, ids in zip(self.rows, input_ids.tolist()):
+            for t in ids[self.prompt_len + row.tokens:]:
+                row.feed(self.vocab[t] if t < len(self.vocab) else "")
+
+    def new_tokens(self, k: int):
+        """Generated tokens for row k if it stopped at the closing brace, else None."""
+        return self.rows[k].closed_at if self.rows and self.rows[k].closed else None
+
+    def stopping_criteria(self):
+        return _JsonClosed(self)
+
+    def logits_processor(self):
+        return _FlagsOnly(self)
+
+
+class _JsonClosed(StoppingCriteria):
+    def __init__(self, dec: GuardrailDecoding):
+        self.dec = dec
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.dec.sync(input_ids)
+        return torch.tensor([r.closed for r in self.dec.rows], dtype=torch.bool, device=input_ids.device)
+
+
+class _FlagsOnly(LogitsProcessor):
+    def __init__(self, dec: GuardrailDecoding):
+        self.dec = dec
+
+    def __call__(self, input_ids, scores):
+        dec = self.dec
+        if not dec.constrain:
+            return scores
+        dec.sync(input_ids)
+        for k, row in enumerate(dec.rows):
+            if row.closed or row.flags is None:
+                continue
+            bias = state_bias(dec.grammar, dec.vocab, row.flags, scores)
+            if bias is not None:
+                scores[k] += bias
+        return scores
+
+
+# ----- Vocabulary tables (built once per tokenizer) -----
+_VOCAB = {}
+
+def vocab_strings(tok) -> list:
+    """Text each token id adds to the output (special tokens add none).
+
+    Built from the token pieces rather than tok.decode([i]), which drops the leading
+    space of SentencePiece pieces and turns byte-fallback tokens into '\ufffd'.
+    """
+    key = (tok.name_or_path, len(tok))
+    if key not in _VOCAB:
+        _VOCAB.clear(); _MASKS.clear()
+        _VOCAB[key] = piece_strings(tok.convert_ids_to_tokens(list(range(len(tok)))), set(tok.all_special_ids))
+    return _VOCAB[key]
+
+BYTE_FALLBACK = re.compile(r"<0x([0-9A-Fa-f]{2})>")
+
+def _byte_decoder() -> dict:
+    """Inverse of GPT-2's bytes_to_unicode (byte-level BPE pieces spell byte b as one printable char)."""
+    bs = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    cs = bs[:]; n = 0
+    for b in range(256):
+        if b not in bs:
+            bs.append(b); cs.append(256 + n); n += 1
+    return {chr(c): b for b, c in zip(bs, cs)}
+
+def piece_strings(pieces: list, special=()) -> list:
+    """Token pieces -> output text, for SentencePiece ('▁' is a space, '<0xNN>' a raw byte)
+    and byte-level BPE ('Ġ' is a space) vocabularies.
+
+    A byte that is only part of a UTF-8 character adds no text; the scanner follows
+    ASCII structure only, and flag names are ASCII.
+    """
+    sp = any(p.startswith("▁") for p in pieces if p)
+    bd = _byte_decoder()
+    out = []
+    for i, p in enumerate(pieces):
+        if p is None or i in special:
+            out.append(""); continue
+        m = BYTE_FALLBACK.fullmatch(p) if sp else None
+        if m:
+            b = int(m.group(1), 16)
+            out.append(chr(b) if b < 0x80 else "")
+        elif sp:
+            out.append(p.replace("▁", " "))
+        elif all(ch in bd for ch in p):
+            out.append(bytes(bd[ch] for ch in p).decode("utf-8", errors="ignore"))
+        else:
+            out.append(p)  # added token stored as plain text
+    return out
+
+_GRAMMARS = {}
+
+def grammar_for(flag_names) -> FlagGrammar:
+    """One grammar per flag list, so per-state masks survive across generate() calls."""
+    key = tuple(sorted(flag_names))
+    g = _GRAMMARS.get(key)
+    if g is None:
+        g = _GRAMMARS[key] = FlagGrammar(key)
+    return g
+
+_MASKS = {}
+
+def state_bias(grammar: FlagGrammar, vocab: list, state, scores):
+    """Additive 0/-inf row for a grammar state, built once per (state, vocab, width, device, dtype).
+
+    None when no token continues the state (the row is left unconstrained).
+    """
+    key = (id(grammar), id(vocab), grammar.key(state), scores.shape[-1], scores.device, scores.dtype)
+    if key in _MASKS:
+        return _MASKS[key]
+    by_char = vocab_index(vocab)
+    allowed = [t for ch in grammar.next_chars(state) for t in by_char.get(ch, ())
+               if t < scores.shape[-1] and grammar.accepts(state, vocab[t])]
+    bias = None
+    if allowed:
+        bias = torch.full((scores.shape[-1],), float("-inf"), dtype=scores.dtype, device=scores.device)
+        bias[torch.tensor(allowed, device=scores.device)] = 0
+    _MASKS[key] = bias
+    return bias
+
+_INDEX = {}
+
+def vocab_index(vocab: list) -> dict:
+    """First character -> token ids, so only plausible tokens are checked against the grammar."""
+    idx = _INDEX.get(id(vocab))
+    if idx is None:
+        idx = {}
+        for t, s in enumerate(vocab):
+            if s:
+                idx.setdefault(s[0], []).append(t)
+        _INDEX.clear(); _INDEX[id(vocab)] = idx
+    return idx
@@ -0,0 +1,57 @@
+import json, re
+from guardrail_rules import canonicalize_flags
+
+# Parsing and judging of model guardrail output. No torch/transformers imports,
+# so the daemon, benchmarks and tools can use these without loading a model.
+
+# ----- Parse/repair helpers -----
+def extract_json(s: str) -> dict:
+    m = re.search(r"\{.*\}", s, flags=re.S)
+    if not m:
+        raise ValueError("no-json-braces")
+    return json.loads(m.group(0))
+
+def repair_json(s: str) -> dict:
+    start = s.find('{')
+    if start == -1:
+        raise ValueError("no-json-start")
+    s = s[start:]
+    s = ''.join(ch for ch in s if ord(ch) >= 9)
+    stack = []; out = []
+    for ch in s:
+        out.append(ch)
+        if ch == '{': stack.append('}')
+        elif ch == '[': stack.append(']')
+        elif ch in ('}', ']'):
+            if stack and ch == stack[-1]: stack.pop()
+        if not stack and ch in ('}', ']'): break
+    s2 = ''.join(out)
+    s2 = re.sub(r",\s*([}\]])", r"\1", s2)
+    # normalize flags entries like ["key": 123] -> ["key"]
+    def _norm_flags(txt: str) -> str:
+        m = re.search(r'"guardrail_report"\s*:\s*\{[^}]*"flags"\s*:\s*\[(.*?)\]', txt, flags=re.S)
+        if not m: return txt
+        inner = m.group(1)
+        inner_norm = re.sub(r'"([A-Za-z0-9_]+)"\s*:\s*(\{[^}]*\}|\[[^\]]*\]|"[^"]*"|[0-9\.\-]+)', r'"\1"', inner)
+        return txt[:m.start(1)] + inner_norm + txt[m.end(1):]
+    s2 = _norm_flags(s2)
+    while stack: s2 += stack.pop()
+    return json.loads(s2)
+
+# ----- Comparison -----
+def normalize_guardrail(obj: dict) -> dict:
+    gr = obj.get("guardrail_report", {})
+    if not isinstance(gr, dict): gr = {}
+    hard = bool(gr.get("hard_fail", False))
+    flags = gr.get("flags", [])
+    if not isinstance(flags, list): flags = []
+    flags = [str(x) for x in flags]
+    flags = canonicalize_flags(flags)
+    return {"hard_fail": hard, "flags": flags}
+
+def matches_expected(actual: dict, expected: dict) -> bool:
+    if actual["hard_fail"] != expected.get("hard_fail", False):
+        return False
+    exp_flags = set(expected.get("flags", []))
+    act_flags = set(actual.get("flags", []))
+    return exp_flags.issubset(act_flags)
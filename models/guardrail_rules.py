@@ -0,0 +1,337 @@
+import json, hashlib
+from collections import deque
+from functools import lru_cache
+
+# Compiled guardrail oracle.
+#
+# The ruleset (thresholds + food lists) is compiled once into a single
+# Aho-Corasick automaton over ingredient names. Each ingredient is scanned
+# once and tagged; only the rules indexed under the tags that actually
+# occur are evaluated, instead of re-scanning every ingredient per rule.
+
+# ----- Canonical flag names -----
+FLAG_SYNONYMS = {
+    # allergens / intolerances
+    "peanut_allergen": "allergen_peanuts_detected",
+    "tree_nut_allergen": "allergen_tree_nuts_detected",
+    "shellfish": "allergen_shellfish_detected",
+    "sesame_allergen": "allergen_sesame_detected",
+    "milk_allergen": "allergen_milk_detected",
+    "eggs_banned": "allergen_eggs_detected",
+    "wheat_allergen": "allergen_wheat_detected",
+    "soy_allergen": "allergen_soy_detected",
+    "lactose": "lactose_detected",
+    "gluten_in_recipe": "gluten_detected",
+    # diet/culture
+    "non_vegan_dairy": "non_vegan_ingredient",
+    "non_vegetarian_egg": "non_vegetarian_ingredient",
+    "pork_in_kosher": "non_kosher_pork",
+    "non_kosher_meat": "non_kosher_meat_dairy_mix",
+    "alcohol_in_recipe": "non_halal_alcohol",
+    # nutrition/metabolic
+    "sugar_content_high": "added_sugars_high",
+    "sodium_per_recipe_high": "sodium_per_recipe_high",
+    "carbs_over_target": "carbs_over_target",
+    "protein_per_recipe_high": "protein_over_target_ckd",
+    "vitamin_a_rae_too_high": "vitamin_a_exceeds_safe_pregnancy",
+    # drug-food
+    "drug_food_grapefruit": "drug_food_grapefruit_statin",
+    "drug_food_vitK_warfarin": "drug_food_vitK_warfarin",
+    # fitness/safety
+    "supine_crunches_risk": "exercise_contraindicated_pregnancy_supine",
+    "injury_risk": "exercise_contraindicated_back",
+}
+
+def canonicalize_flags(flags):
+    out=[]
+    for f in flags:
+        f = str(f).strip()
+        f = FLAG_SYNONYMS.get(f, f)
+        out.append(f)
+    return out
+
+
+# ----- Ruleset loading -----
+RULESET_PATH = "rulesets/v1.json"
+
+def load_ruleset(path: str = RULESET_PATH):
+    try:
+        with open(path, "rb") as rf:
+            raw = rf.read()
+        data = json.loads(raw.decode("utf-8"))
+        data["_sha256"] = hashlib.sha256(raw).hexdigest()
+        data["_path"] = path
+        return data
+    except FileNotFoundError:
+        return {"version":"v1","thresholds":{}, "_sha256":"", "_path":""}
+
+
+# ----- Ingredient vocabulary -----
+# tag -> substrings; an ingredient carries the tag if any substring occurs in it.
+SUBSTRING_TAGS = {
+    "peanut": ["peanut"],
+    "shellfish": ["shrimp"],
+    "sesame": ["sesame"],
+    "milk": ["milk"],
+    "cheese": ["cheese"],
+    "egg": ["egg"],
+    "raw_egg": ["raw egg"],
+    "gluten": ["wheat", "flour"],
+    "soy": ["soy", "tofu"],
+    "lactose_free": ["lactose-free"],
+    "pork": ["pork"],
+    "beef": ["beef"],
+    "alcohol": ["beer", "alcohol", "wine"],
+    "grapefruit": ["grapefruit"],
+    "whole_grapes": ["whole grapes"],
+}
+# tag -> ruleset list that supplies its substrings (built-in terms are kept as a floor)
+LIST_TAGS = {
+    "high_mercury_fish": ("pregnancy_high_mercury_fish", ["swordfish"]),
+    "vitk": ("warfarin_high_vitk_foods", ["kale", "spinach"]),
+}
+# tag -> whole ingredient names (exact match, not substring)
+EXACT_TAGS = {
+    "tree_nut": ["almond", "almonds"],
+    "vegan_excluded": ["cheddar", "milk", "cheese", "butter", "egg", "eggs"],
+}
+
+
+class Automaton:
+    """Aho-Corasick matcher mapping every pattern to a set of tags."""
+    __slots__ = ("goto", "fail", "out")
+
+    def __init__(self, patterns: dict):
+        self.goto = [{}]; self.fail = [0]; self.out = [frozenset()]
+        outs = [set()]
+        for pat, tags in patterns.items():
+            s = 0
+            for ch in pat:
+                nxt = self.goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[s][ch] = nxt
+                    self.goto.append({}); self.fail.append(0); outs.append(set())
+                s = nxt
+            outs[s].update(tags)
+        # BFS for failure links; merge outputs along them
+        q = deque(self.goto[0].values())
+        while q:
+            s = q.popleft()
+            for ch, nxt in self.goto[s].items():
+                q.append(nxt)
+                f = self.fail[s]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                outs[nxt] |= outs[self.fail[nxt]]
+        self.out = [frozenset(o) for o in outs]
+
+    def scan(self, text: str) -> set:
+        goto, fail, out = self.goto, self.fail, self.out
+        s = 0; found = set()
+        for ch in text:
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            if out[s]:
+                found |= out[s]
+        return found
+
+
+# ----- Rules -----
+# Meal-day totals checked against per-day limits (see RuleEngine.day_limits)
+DAY_NUTRIENTS = ("sodium_mg", "potassium_mg", "protein_g", "vitamin_a_rae_ug", "carbs_g")
+DAY_FLAGS = ("sodium_over_target", "potassium_over_target", "protein_over_target_ckd",
+             "vitamin_a_exceeds_safe_pregnancy", "carbs_over_target")
+
+def report(flags) -> dict:
+    exp = {"hard_fail": bool(flags), "flags": sorted(flags)}
+    exp["flags"] = canonicalize_flags(exp["flags"])
+    return exp
+
+class Profile:
+    """Lower-cased profile fields the rules read, resolved once per input."""
+    __slots__ = ("prof", "diet", "med", "meds", "banned", "intoler", "injuries")
+
+    def __init__(self, input_obj: dict):
+        prof = input_obj.get("profile",{})
+        self.prof = prof
+        self.diet = (prof.get("diet") or input_obj.get("diet") or "").lower()
+        self.med = set([m.lower() for m in prof.get("medical_conditions", input_obj.get("medical_conditions", []))])
+        self.meds = set([m.lower() for m in prof.get("medications", input_obj.get("medications", []))])
+        self.banned = set([a.lower() for a in prof.get("allergens_banned", [])])
+        self.intoler = set([i.lower() for i in prof.get("intolerances", [])])
+        self.injuries = set([i.lower() for i in prof.get("injuries", input_obj.get('injuries', []))])
+
+# (flag, profile predicate, tag groups); every group must intersect the recipe tags.
+# The first group is the trigger the rule is indexed under.
+INGREDIENT_RULES = [
+    # Allergens
+    ("allergen_peanuts_detected", lambda p: "peanuts" in p.banned, [{"peanut"}]),
+    ("allergen_tree_nuts_detected", lambda p: "tree nuts" in p.banned, [{"tree_nut"}]),
+    ("allergen_shellfish_detected", lambda p: "shellfish" in p.banned, [{"shellfish"}]),
+    ("allergen_sesame_detected", lambda p: "sesame" in p.banned, [{"sesame"}]),
+    ("allergen_milk_detected", lambda p: "milk" in p.banned, [{"milk", "cheese"}]),
+    ("allergen_eggs_detected", lambda p: "eggs" in p.banned, [{"egg"}]),
+    ("allergen_wheat_detected", lambda p: "wheat" in p.banned, [{"gluten"}]),
+    ("allergen_soy_detected", lambda p: "soy" in p.banned, [{"soy"}]),
+    # Intolerance
+    ("lactose_detected", lambda p: "lactose" in p.intoler, [{"lactose"}]),
+    # Diets
+    ("non_vegan_ingredient", lambda p: p.diet=="vegan", [{"vegan_excluded"}]),
+    ("non_kosher_pork", lambda p: p.diet=="kosher", [{"pork"}]),
+    ("non_kosher_meat_dairy_mix", lambda p: p.diet=="kosher", [{"beef"}, {"cheese", "milk"}]),
+    ("non_halal_alcohol", lambda p: p.diet=="halal", [{"alcohol"}]),
+    # Pregnancy
+    ("high_mercury_fish", lambda p: "pregnancy" in p.med, [{"high_mercury_fish"}]),
+    ("alcohol_present", lambda p: "pregnancy" in p.med, [{"alcohol"}]),
+    ("raw_egg_risk", lambda p: "pregnancy" in p.med, [{"raw_egg"}]),
+    # Celiac/gluten-free
+    ("gluten_detected", lambda p: "celiac disease" in p.med or p.diet=="gluten free", [{"gluten"}]),
+    # Drug–food
+    ("drug_food_vitK_warfarin", lambda p: "warfarin" in p.meds, [{"vitk"}]),
+    ("drug_food_grapefruit_statin", lambda p: "statin" in p.meds, [{"grapefruit"}]),
+    # Safety
+    ("choking_hazard_toddler", lambda p: isinstance(p.prof.get("age_years"),(int,float)) and p.prof["age_years"] < 4, [{"whole_grapes"}]),
+]
+
+# Every flag the oracle can emit (ingredient rules, day totals and the item checks)
+ORACLE_FLAGS = frozenset([r[0] for r in INGREDIENT_RULES] + list(DAY_FLAGS) + [
+    "sodium_per_recipe_high", "added_sugars_high", "undercooked_poultry",
+    "exercise_contraindicated_knee", "exercise_contraindicated_back",
+    "exercise_contraindicated_pregnancy_supine", "budget_exceeded", "store_item_unavailable",
+])
+
+
+class RuleEngine:
+    """A ruleset compiled into an ingredient automaton plus a tag -> rules index."""
+
+    def __init__(self, ruleset: dict):
+        self.ruleset = ruleset
+        cfg = ruleset.get("thresholds", {})
+        self.diabetes_added_sugars_high = cfg.get("diabetes_added_sugars_high_g", 15)
+        self.poultry_safe_c = cfg.get("poultry_min_cook_temp_c", 74)
+        self.preg_vit_a_ul = cfg.get("vitamin_a_pregnancy_ul_rae_ug", 3000)
+
+        lists = ruleset.get("lists", {})
+        patterns = {}
+        for tag, terms in SUBSTRING_TAGS.items():
+            for t in terms:
+                patterns.setdefault(t, set()).add(tag)
+        for tag, (name, default) in LIST_TAGS.items():
+            for t in set(default) | set(x.lower() for x in lists.get(name, [])):
+                patterns.setdefault(t, set()).add(tag)
+        self.automaton = Automaton(patterns)
+        self.exact = {}
+        for tag, names in EXACT_TAGS.items():
+            for n in names:
+                self.exact.setdefault(n, set()).add(tag)
+
+        self.index = {}
+        for rule in INGREDIENT_RULES:
+            for tag in rule[2][0]:
+                self.index.setdefault(tag, []).append(rule)
+        self.tag = lru_cache(maxsize=65536)(self._tag)
+
+    def _tag(self, name: str) -> frozenset:
+        tags = self.automaton.scan(name)
+        tags |= self.exact.get(name, set())
+        if "milk" in tags and "lactose_free" not in tags:
+            tags.add("lactose")
+        return frozenset(tags)
+
+    def evaluate(self, input_obj: dict, p: Profile = None) -> dict:
+        p = p or Profile(input_obj)
+        exp_flags = self.item_flags(input_obj, p)
+        recipes = input_obj.get("meal_day",{}).get("recipes")
+        if recipes:
+            for key, flag, lim in zip(DAY_NUTRIENTS, DAY_FLAGS, self.day_limits(input_obj, p)):
+                if lim is not None and sum(r.get(key,0) for r in recipes) > lim:
+                    exp_flags.add(flag)
+        return report(exp_flags)
+
+    def day_limits(self, input_obj: dict, p: Profile) -> tuple:
+        """Per-day limits aligned with DAY_NUTRIENTS; None means the rule does not apply."""
+        prof = p.prof
+        day = input_obj.get("meal_day",{})
+        targets = (prof.get("targets") or day.get("targets") or input_obj.get("targets") or {})
+        ckd = "chronic kidney disease" in p.med
+        carbs_goal = None
+        if p.diet=="keto":
+            carbs_goal = (prof.get("targets") or {}).get("carbs_g_per_day") or targets.get("carbs_g_per_day")
+        return (
+            targets.get("sodium_mg") or None,
+            (targets.get("potassium_mg") or None) if ckd else None,
+            # Protein limit for CKD (daily)
+            targets.get('protein_g_max') if ckd else None,
+            # Vitamin A (retinol activity equivalents) conservative UL ~3000 µg RAE/day
+            self.preg_vit_a_ul if 'pregnancy' in p.med else None,
+            carbs_goal,
+        )
+
+    def item_flags(self, input_obj: dict, p: Profile) -> set:
+        """Every flag except the meal-day nutrient sums."""
+        exp_flags = set()
+        add = exp_flags.add
+        prof = p.prof
+
+        # Ingredient rules: tag each ingredient once, then run only indexed rules
+        recipe = input_obj.get("recipe")
+        if recipe and recipe.get("ingredients"):
+            tags = set()
+            for i in recipe["ingredients"]:
+                tags |= self.tag((i.get("name","") or "").lower())
+            seen = set()
+            for tag in tags:
+                for rule in self.index.get(tag, ()):
+                    flag, pred, groups = rule
+                    if flag in seen: continue
+                    seen.add(flag)
+                    if pred(p) and all(tags & g for g in groups[1:]):
+                        add(flag)
+
+        # Per-recipe targets
+        per_max = prof.get("per_recipe_sodium_mg_max") or input_obj.get("per_recipe_sodium_mg_max")
+        if per_max and input_obj.get("recipe",{}).get("sodium_mg",0) > per_max: add("sodium_per_recipe_high")
+        if "diabetes" in p.med and input_obj.get("recipe",{}).get("sugars_g",0) >= self.diabetes_added_sugars_high: add("added_sugars_high")
+
+        # Safety / fitness
+        if input_obj.get("recipe",{}).get("cook_temp_c",0) and input_obj["recipe"]["cook_temp_c"] < self.poultry_safe_c and "chicken" in (input_obj["recipe"].get("name","").lower()): add("undercooked_poultry")
+        exercises = input_obj.get("workout",{}).get("exercises")
+        if exercises:
+            if "knee" in p.injuries and any(("squat" in (e.get("name","").lower())) and ("ass-to-grass" in (e.get("depth","").lower())) for e in exercises):
+                add("exercise_contraindicated_knee")
+            if "lower back" in p.injuries and any(("deadlift" in (e.get("name","").lower())) and ("heavy" in (e.get("intensity","").lower())) for e in exercises):
+                add("exercise_contraindicated_back")
+            if "pregnancy" in p.med and prof.get("pregnancy_trimester")==3 and any("supine" in (e.get("name","").lower()) for e in exercises):
+                add("exercise_contraindicated_pregnancy_supine")
+
+        # Budget / inventory
+        items = input_obj.get("cart",{}).get("items")
+        if items:
+            if prof.get("budget_usd") is not None and sum(i.get("price_usd",0) for i in items) > prof["budget_usd"]:
+                add("budget_exceeded")
+            store = prof.get("store") or input_obj.get("store")
+            if store and "trader" in store.lower() and any("costco" in i.get("sku","").lower() for i in items):
+                add("store_item_unavailable")
+
+        return exp_flags
+
+
+_ENGINES = {}
+
+def compile_ruleset(ruleset: dict) -> RuleEngine:
+    """Compile (and memoize by content hash) the engine for a loaded ruleset."""
+    key = ruleset.get("_sha256") or hashlib.sha256(json.dumps(ruleset, sort_keys=True).encode("utf-8")).hexdigest()
+    eng = _ENGINES.get(key)
+    if eng is None:
+        eng = _ENGINES[key] = RuleEngine(ruleset)
+    return eng
+
+RULESET = load_ruleset()
+ENGINE = compile_ruleset(RULESET)
+
+# ----- Deterministic rules (FDA oracle) -----
+def rule_expected(input_obj: dict) -> dict:
+    return ENGINE.evaluate(input_obj)
@@ -0,0 +1,303 @@
+import argparse, asyncio, glob, json, os, signal, sys, time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from guardrail_rules import RULESET, rule_expected
+from eval_cache import MODEL_FILE_GLOBS, SKIP_FILES
+
+# Long-lived guardrail service: the model and the rule oracle are loaded once.
+#
+# Requests are queued and merged into micro-batches: the batcher takes the first
+# waiting request, keeps collecting for up to --max-wait-ms or until
+# --max-batch, and runs one generate_batch() call on a single model thread. A
+# full queue answers 503 + Retry-After instead of growing without bound. The
+# adapter files in out_dir are polled; when they change the model is reloaded
+# on the model thread between batches, so in-flight requests finish on the old
+# weights and queued ones run on the new. The response's guardrail_report is
+# the oracle's (canonical flags), as in eval_guardrails.score(); the model's
+# parsed report is returned alongside for audit.
+#
+#   python models/guardrail_server.py --port 8787                 # localhost HTTP
+#   python models/guardrail_server.py --unix /tmp/ke-guardrail.sock
+#   python models/guardrail_server.py --oracle-only               # rules only, no model
+#
+#   POST /v1/guardrail {"input": {...}}  -> {"guardrail_report", "model_report", "model_extras", "timing"}
+#   GET  /healthz,  GET /metrics
+
+MAX_BODY = 1 << 20
+LATENCY_WINDOW = 2048
+
+
+class Overloaded(Exception):
+    pass
+
+
+def adapter_stamp(out_dir: str) -> tuple:
+    """(name, size, mtime_ns) of the weight/tokenizer files; changes when the adapter is replaced."""
+    paths = sorted({p for g in MODEL_FILE_GLOBS for p in glob.glob(os.path.join(out_dir, g))
+                    if os.path.basename(p) not in SKIP_FILES})
+    out = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:  # mid-replace
+            continue
+        out.append((os.path.basename(p), st.st_size, st.st_mtime_ns))
+    return tuple(out)
+
+
+class Backend:
+    """Model + oracle; every method runs on the single model thread."""
+
+    def __init__(self, out_dir: str = None, max_new_tokens: int = 256, use_model: bool = True):
+        self.out_dir = out_dir; self.max_new_tokens = max_new_tokens; self.use_model = use_model
+        self.eg = None; self.stamp = None
+
+    def load(self):
+        if not self.use_model:
+            return
+        import eval_guardrails as eg
+        self.out_dir = self.out_dir or eg.OUT_DIR
+        stamp = adapter_stamp(self.out_dir)
+        # on the model thread, so no batch runs mid-swap; a failed load leaves tok/mdl untouched
+        eg.load_model(self.out_dir)  # also drops the prefix KV cache computed with the old weights
+        self.eg = eg; self.stamp = stamp
+
+    def run(self, inputs: list) -> list:
+        """One result per input; an input the oracle rejects gets its exception, not the whole batch."""
+        out = []
+        for x in inputs:
+            try:
+                out.append({"guardrail_report": rule_expected(x), "model_report": None, "model_extras": [], "new_tokens": 0})
+            except Exception as e:
+                out.append(e)
+        ok = [k for k, r in enumerate(out) if not isinstance(r, Exception)]
+        if self.eg is None or not ok:
+            return out
+        eg = self.eg
+        prompts = [eg.render_prompt(eg.build_chat({"input": inputs[k]})) for k in ok]
+        for k, (text, n, _closed) in zip(ok, eg.generate_batch(prompts, self.max_new_tokens)):
+            e = out[k]["guardrail_report"]
+            try:
+                obj = eg.extract_json(text)
+            except Exception:
+                try:
+                    obj = eg.repair_json(text)
+                except Exception:
+                    obj = None
+            model = eg.normalize_guardrail(obj) if isinstance(obj, dict) else None
+            extras = sorted(set(model["flags"]) - set(e["flags"])) if model else []
+            out[k].update(model_report=model, model_extras=extras, new_tokens=n)
+        return out
+
+
+class Batcher:
+    def __init__(self, backend: Backend, max_batch: int = 8, max_wait_ms: float = 10.0, max_queue: int = 256):
+        self.backend = backend; self.max_batch = max_batch; self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue(max_queue)
+        self.model_thread = ThreadPoolExecutor(1, thread_name_prefix="guardrail-model")
+        self.started = time.time()
+        self.requests = 0; self.rejected = 0; self.errors = 0; self.batches = 0
+        self.batch_sizes = Counter(); self.max_depth = 0; self.reloads = 0; self.reload_errors = 0
+        self.latency_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def submit(self, inp) -> asyncio.Future:
+        if self.queue.full():
+            self.rejected += 1
+            raise Overloaded()
+        fut = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((inp, fut, time.perf_counter()))
+        self.requests += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return fut
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait()); continue
+                except asyncio.QueueEmpty:
+                    pass
+                left = deadline - loop.time()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), left))
+                except asyncio.TimeoutError:
+                    break
+            batch = [b for b in batch if not b[1].done()]  # clients that gave up
+            if not batch:
+                continue
+            t0 = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.model_thread, self.backend.run, [b[0] for b in batch])
+            except Exception as e:
+                self.errors += len(batch)
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            t1 = time.perf_counter()
+            self.batches += 1; self.batch_sizes[len(batch)] += 1
+            for (_, fut, queued), res in zip(batch, results):
+                if isinstance(res, Exception):
+                    self.errors += 1
+                    if not fut.done():
+                        fut.set_exception(res)
+                    continue
+                total = (t1 - queued) * 1000
+                self.latency_ms.append(total)
+                res["timing"] = {"queue_ms": round((t0 - queued) * 1000, 3), "batch_ms": round((t1 - t0) * 1000, 3),
+                                 "total_ms": round(total, 3), "batch_size": len(batch)}
+                if not fut.done():
+                    fut.set_result(res)
+
+    async def watch(self, interval_s: float):
+        """Reload the model when the adapter files change (between batches, on the model thread)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval_s)
+            stamp = await loop.run_in_executor(None, adapter_stamp, self.backend.out_dir)
+            if stamp == self.backend.stamp:
+                continue
+            try:
+                await loop.run_in_executor(self.model_thread, self.backend.load)
+                self.reloads += 1
+                print(f"reloaded model from {self.backend.out_dir}", file=sys.stderr)
+            except Exception as e:  # keep serving the weights already loaded
+                self.reload_errors += 1
+                self.backend.stamp = stamp  # do not retry a broken adapter every poll
+                print(f"reload failed, keeping previous model: {type(e).__name__}: {e}", file=sys.stderr)
+
+    def metrics(self) -> dict:
+        lat = sorted(self.latency_ms)
+        pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 3) if lat else None
+        return {"uptime_s": round(time.time() - self.started, 1), "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize, "max_queue_depth": self.max_depth,
+                "requests": self.requests, "rejected": self.rejected, "errors": self.errors, "batches": self.batches,
+                "mean_batch": round(sum(k * v for k, v in self.batch_sizes.items()) / self.batches, 2) if self.batches else 0.0,
+                "batch_sizes": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "window": len(lat)},
+                "model": self.backend.out_dir if self.backend.eg else None, "reloads": self.reloads,
+                "reload_errors": self.reload_errors, "ruleset_sha256": RULESET.get("_sha256", "")}
+
+
+# ----- HTTP -----
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+class Server:
+    def __init__(self, batcher: Batcher, timeout_s: float = 60.0):
+        self.batcher = batcher; self.timeout_s = timeout_s
+
+    async def respond(self, method: str, path: str, body: bytes):
+        if method == "GET" and path == "/healthz":
+            return 200, {"ok": True, "model_loaded": self.batcher.backend.eg is not None}, {}
+        if method == "GET" and path == "/metrics":
+            return 200, self.batcher.metrics(), {}
+        if method != "POST" or path != "/v1/guardrail":
+            return 404, {"ok": False, "error": "not found"}, {}
+        try:
+            doc = json.loads(body or b"{}")
+        except ValueError as e:
+            return 400, {"ok": False, "error": f"invalid JSON: {e}"}, {}
+        if not isinstance(doc, dict):
+            return 400, {"ok": False, "error": "expected a JSON object"}, {}
+        inp = doc.get("input", doc)
+        if not isinstance(inp, dict):
+            return 400, {"ok": False, "error": "input must be a JSON object"}, {}
+        try:
+            fut = self.batcher.submit(inp)
+        except Overloaded:
+            return 503, {"ok": False, "error": "queue full"}, {"Retry-After": "1"}
+        try:
+            res = await asyncio.wait_for(fut, self.timeout_s)
+        except asyncio.TimeoutError:
+            return 503, {"ok": False, "error": "timed out"}, {"Retry-After": "1"}
+        except Exception as e:
+            return 500, {"ok": False, "error": f"{type(e).__name__}: {e}"}, {}
+        return 200, {"ok": True, **res}, {}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\r\n")
+                    headers = {}
+                    while True:
+                        h = await reader.readuntil(b"\r\n")
+                        if h == b"\r\n":
+                            break
+                        k, _, v = h.decode("latin-1").partition(":")
+                        headers[k.strip().lower()] = v.strip()
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                n = int(headers.get("content-length", 0))
+                if n > MAX_BODY:
+                    status, payload, extra = 413, {"ok": False, "error": "body too large"}, {}
+                    headers["connection"] = "close"
+                else:
+                    body = await reader.readexactly(n) if n else b""
+                    status, payload, extra = await self.respond(method, target.split("?", 1)[0], body)
+                data = json.dumps(payload).encode("utf-8")
+                close = headers.get("connection", "").lower() == "close"
+                head = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/json",
+                        f"Content-Length: {len(data)}", f"Connection: {'close' if close else 'keep-alive'}"]
+                head += [f"{k}: {v}" for k, v in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if close:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(a):
+    backend = Backend(a.out_dir, a.max_new_tokens, use_model=not a.oracle_only)
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    batcher = Batcher(backend, a.max_batch, a.max_wait_ms, a.max_queue)
+    await loop.run_in_executor(batcher.model_thread, backend.load)
+    print(f"loaded in {time.perf_counter() - t0:.1f}s ({'oracle only' if a.oracle_only else backend.out_dir})", file=sys.stderr)
+    server = Server(batcher, a.timeout_s)
+    if a.unix:
+        srv = await asyncio.start_unix_server(server.handle, path=a.unix)
+        where = a.unix
+    else:
+        srv = await asyncio.start_server(server.handle, a.host, a.port)
+        where = f"http://{a.host}:{a.port}"
+    tasks = [asyncio.create_task(batcher.run())]
+    if not a.oracle_only and a.reload_interval > 0:
+        tasks.append(asyncio.create_task(batcher.watch(a.reload_interval)))
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"serving on {where}", file=sys.stderr)
+    async with srv:
+        await stop.wait()
+    for t in tasks:
+        t.cancel()
+    batcher.model_thread.shutdown(wait=True)
+    if a.unix and os.path.exists(a.unix):
+        os.unlink(a.unix)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1"); ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    ap.add_argument("--out-dir", help="adapter directory (default: out_dir from models/config/sft.json)")
+    ap.add_argument("--max-batch", type=int, default=8); ap.add_argument("--max-wait-ms", type=float, default=10.0)
+    ap.add_argument("--max-queue", type=int, default=256, help="queued requests before answering 503")
+    ap.add_argument("--max-new-tokens", type=int, default=256)
+    ap.add_argument("--timeout-s", type=float, default=60.0, help="per-request wait for a result")
+    ap.add_argument("--reload-interval", type=float, default=5.0, help="seconds between adapter change checks (0 = off)")
+    ap.add_argument("--oracle-only", action="store_true", help="serve rule_expected only, without loading the model")
+    asyncio.run(serve(ap.parse_args()))
@@ -0,0 +1,163 @@
+import argparse, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services", "common"))
+from guardrail_rules import Profile, compile_ruleset, load_ruleset
+import signing
+
+# Differential ruleset replay: which flags change if ruleset A is replaced by B?
+#
+# A corpus of NDJSON records (guardrail tests {"id", "input"}, or stored plan
+# inputs, one per line) is streamed once. Worker processes compile both
+# rulesets at start-up, parse each line once and evaluate the same parsed
+# input (and Profile) under both engines; per-flag added/removed counts and a
+# few example ids come back per chunk and are merged. The report is written
+# under reports/ and signed (sha256 sidecar + audit log entry).
+#
+#   python models/ruleset_diff.py rulesets/v1.json rulesets/v2.json data/plans/*.ndjson -j 8
+#   python models/ruleset_diff.py rulesets/v1.json /tmp/v1_sugar10.json models/data/KaizenEdge_Guardrail_Tests_v2.jsonl
+
+CHUNK = 2000
+EXAMPLES = 5
+
+_engines = None
+
+def _ruleset(path: str) -> dict:
+    try:
+        rs = load_ruleset(path)
+    except ValueError as e:
+        raise SystemExit(f"{path}: not a valid ruleset ({e})")
+    if not rs.get("_path"):
+        raise SystemExit(f"{path}: not found")
+    return rs
+
+def _init(path_a, path_b):
+    global _engines
+    _engines = (compile_ruleset(_ruleset(path_a)), compile_ruleset(_ruleset(path_b)))
+
+def diff_chunk(chunk) -> dict:
+    """[(record id, raw line)] -> partial counts for this chunk."""
+    a, b = _engines
+    out = {"docs": 0, "changed": 0, "errors": 0, "error_ids": [], "became_fail": 0, "became_pass": 0,
+           "added": {}, "removed": {}}
+    for rid, raw in chunk:
+        try:
+            rec = json.loads(raw)
+            inp = rec.get("input", rec)
+            p = Profile(inp)
+            ra = a.evaluate(inp, p); rb = b.evaluate(inp, p)
+        except Exception:
+            out["errors"] += 1
+            if len(out["error_ids"]) < EXAMPLES:
+                out["error_ids"].append(rid)
+            continue
+        if isinstance(rec, dict):
+            rid = str(rec.get("id") or rec.get("plan_id") or rid)
+        out["docs"] += 1
+        if ra == rb:
+            continue
+        out["changed"] += 1
+        if ra["hard_fail"] != rb["hard_fail"]:
+            out["became_fail" if rb["hard_fail"] else "became_pass"] += 1
+        fa = set(ra["flags"]); fb = set(rb["flags"])
+        for key, flags in (("added", fb - fa), ("removed", fa - fb)):
+            for f in flags:
+                rec_ = out[key].setdefault(f, [0, []])
+                rec_[0] += 1
+                if len(rec_[1]) < EXAMPLES:
+                    rec_[1].append(rid)
+    return out
+
+def merge(total: dict, part: dict):
+    for k in ("docs", "changed", "errors", "became_fail", "became_pass"):
+        total[k] += part[k]
+    total["error_ids"] = (total["error_ids"] + part["error_ids"])[:EXAMPLES]
+    for key in ("added", "removed"):
+        for f, (n, ex) in part[key].items():
+            cur = total[key].setdefault(f, [0, []])
+            cur[0] += n
+            cur[1] = (cur[1] + ex)[:EXAMPLES]
+
+def read_chunks(paths, size: int = CHUNK):
+    chunk = []
+    for path in paths:
+        f = sys.stdin.buffer if path == "-" else open(path, "rb")
+        label = "stdin" if path == "-" else os.path.basename(path)
+        try:
+            for n, line in enumerate(f, 1):
+                if line.strip():
+                    chunk.append((f"{label}:{n}", line))
+                    if len(chunk) >= size:
+                        yield chunk; chunk = []
+        finally:
+            if f is not sys.stdin.buffer:
+                f.close()
+    if chunk:
+        yield chunk
+
+def config_changes(a: dict, b: dict) -> dict:
+    """Thresholds and list entries that differ between the two rulesets."""
+    out = {"thresholds": {}, "lists": {}}
+    ta, tb = a.get("thresholds", {}), b.get("thresholds", {})
+    for k in sorted(set(ta) | set(tb)):
+        if ta.get(k) != tb.get(k):
+            out["thresholds"][k] = [ta.get(k), tb.get(k)]
+    la, lb = a.get("lists", {}), b.get("lists", {})
+    for k in sorted(set(la) | set(lb)):
+        sa, sb = set(la.get(k, [])), set(lb.get(k, []))
+        if sa != sb:
+            out["lists"][k] = {"added": sorted(sb - sa), "removed": sorted(sa - sb)}
+    return out
+
+def replay(path_a: str, path_b: str, corpus, jobs: int = 1) -> dict:
+    ra, rb = _ruleset(path_a), _ruleset(path_b)
+    total = {"docs": 0, "changed": 0, "errors": 0, "error_ids": [], "became_fail": 0, "became_pass": 0,
+             "added": {}, "removed": {}}
+    t0 = time.perf_counter()
+    if jobs <= 1:
+        _init(path_a, path_b)
+        for chunk in read_chunks(corpus):
+            merge(total, diff_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(jobs, initializer=_init, initargs=(path_a, path_b)) as pool:
+            inflight = []
+            for chunk in read_chunks(corpus):
+                inflight.append(pool.submit(diff_chunk, chunk))
+                if len(inflight) >= 2 * jobs:
+                    merge(total, inflight.pop(0).result())
+            for fut in inflight:
+                merge(total, fut.result())
+    wall = time.perf_counter() - t0
+    flags = {}
+    for f in sorted(set(total["added"]) | set(total["removed"])):
+        add = total["added"].get(f, [0, []]); rem = total["removed"].get(f, [0, []])
+        flags[f] = {"added": add[0], "removed": rem[0], "examples_added": add[1], "examples_removed": rem[1]}
+    side = lambda rs: {"path": rs["_path"], "version": rs.get("version"), "sha256": rs["_sha256"]}
+    return {"a": side(ra), "b": side(rb), "corpus": list(corpus), "config_changes": config_changes(ra, rb),
+            "docs": total["docs"], "changed_docs": total["changed"], "parse_errors": total["errors"],
+            "parse_error_examples": total["error_ids"],
+            "hard_fail": {"became_fail": total["became_fail"], "became_pass": total["became_pass"]},
+            "flags": flags, "wall_s": round(wall, 3), "docs_per_s": round(total["docs"] / wall, 1) if wall else 0.0}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("ruleset_a"); ap.add_argument("ruleset_b")
+    ap.add_argument("corpus", nargs="+", help="NDJSON files of tests / plan inputs, or - for stdin")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--out", help="report path (default reports/ruleset_diff_<a>_<b>.json)")
+    ap.add_argument("--no-sign", action="store_true")
+    a = ap.parse_args()
+    rep = replay(a.ruleset_a, a.ruleset_b, a.corpus, a.jobs)
+    stem = lambda p: os.path.splitext(os.path.basename(p))[0]
+    out = a.out or os.path.join("reports", f"ruleset_diff_{stem(a.ruleset_a)}_{stem(a.ruleset_b)}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(rep, f, indent=2)
+    if not a.no_sign:
+        signing.sign([out])
+    for flag, d in rep["flags"].items():
+        print(f"{flag:45} +{d['added']:<8} -{d['removed']:<8} e.g. {', '.join(d['examples_added'] or d['examples_removed'])}")
+    print(f"{rep['docs']} docs, {rep['changed_docs']} changed, {rep['parse_errors']} unparseable, "
+          f"{rep['docs_per_s']:.0f} docs/s -> {out}")
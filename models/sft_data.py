@@ -0,0 +1,181 @@
+import hashlib, json, os, shutil
+from bisect import bisect_left, insort
+import numpy as np
+
+# SFT data pipeline: tokenize once, pack, stream.
+#
+# build_token_cache() streams the JSONL, tokenizes each example once and appends
+# its ids plus a loss mask (0 on the prompt, 1 on the output) to flat memory-mapped
+# files under .cache/sft_tokens/<key>/, where key hashes the tokenizer and the data.
+# pack_plan() bins examples into seq_len windows (best-fit decreasing), and
+# PackedDataset serves each window from the memmap with per-example position ids,
+# a block-diagonal causal mask and -100 labels on prompt and padding tokens.
+
+CACHE_DIR = ".cache/sft_tokens"
+IGNORE_INDEX = -100
+
+
+def format_example(ex: dict):
+    """(prompt, output) for one record, in the train_sft prompt format."""
+    prompt = (f"### Instruction:\n{ex['instruction']}\n"
+              f"### Input:\n{ex.get('input','')}\n"
+              f"### Output:\n")
+    return prompt, ex["output"]
+
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# ----- Cache key -----
+def file_sha256(path: str, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def tokenizer_sha256(tok) -> str:
+    h = hashlib.sha256(f"{tok.name_or_path}|{len(tok)}|{tok.eos_token_id}|{tok.bos_token_id}".encode("utf-8"))
+    for t, i in sorted(tok.get_vocab().items(), key=lambda kv: kv[1]):
+        h.update(f"{i}:{t}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+# ----- Token cache -----
+class TokenCache:
+    """Read-only view of a built cache: flat token/mask memmaps plus per-example offsets."""
+
+    def __init__(self, root: str):
+        self.root = root
+        with open(os.path.join(root, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.offsets = np.load(os.path.join(root, "offsets.npy"))
+        n = int(self.offsets[-1])
+        self.tokens = np.memmap(os.path.join(root, "tokens.bin"), dtype=np.int32, mode="r", shape=(n,))
+        self.mask = np.memmap(os.path.join(root, "mask.bin"), dtype=np.uint8, mode="r", shape=(n,))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def example(self, k: int):
+        a, b = int(self.offsets[k]), int(self.offsets[k + 1])
+        return self.tokens[a:b], self.mask[a:b]
+
+
+def build_token_cache(tok, data_path: str, seq_len: int, root: str = CACHE_DIR, chunk: int = 256) -> TokenCache:
+    """Tokenize data_path once; reuse the cache while the tokenizer, data and seq_len are unchanged."""
+    key = hashlib.sha256(f"{tokenizer_sha256(tok)}|{file_sha256(data_path)}|{seq_len}".encode("utf-8")).hexdigest()[:24]
+    final = os.path.join(root, key)
+    if os.path.exists(os.path.join(final, "meta.json")):
+        return TokenCache(final)
+
+    tmp = final + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    offsets = [0]; truncated = 0
+    with open(os.path.join(tmp, "tokens.bin"), "wb") as ft, open(os.path.join(tmp, "mask.bin"), "wb") as fm:
+        def flush(batch):
+            nonlocal truncated
+            prompts = tok([p for p, _ in batch], add_special_tokens=True)["input_ids"]
+            outputs = tok([o for _, o in batch], add_special_tokens=False)["input_ids"]
+            for p_ids, o_ids in zip(prompts, outputs):
+                ids = p_ids + o_ids + [tok.eos_token_id]
+                mask = [0] * len(p_ids) + [1] * (len(o_ids) + 1)
+                if len(ids) > seq_len:
+                    ids, mask = ids[:seq_len], mask[:seq_len]; truncated += 1
+                np.asarray(ids, dtype=np.int32).tofile(ft)
+                np.asarray(mask, dtype=np.uint8).tofile(fm)
+                offsets.append(offsets[-1] + len(ids))
+
+        batch = []
+        for ex in iter_jsonl(data_path):
+            batch.append(format_example(ex))
+            if len(batch) >= chunk:
+                flush(batch); batch = []
+        if batch:
+            flush(batch)
+    np.save(os.path.join(tmp, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"data": data_path, "seq_len": seq_len, "examples": len(offsets) - 1,
+                   "tokens": offsets[-1], "truncated": truncated}, f, indent=2)
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(tmp, final)
+    return TokenCache(final)
+
+
+# ----- Packing -----
+def pack_plan(lengths, seq_len: int) -> list:
+    """Best-fit decreasing: lists of example indices whose lengths sum to <= seq_len."""
+    order = sorted(range(len(lengths)), key=lambda k: (-int(lengths[k]), k))
+    bins = []; free = []  # free: sorted (room, bin index)
+    for k in order:
+        n = int(lengths[k])
+        j = bisect_left(free, (n, -1))
+        if j == len(free):
+            bins.append([k]); insort(free, (seq_len - n, len(bins) - 1))
+        else:
+            room, b = free.pop(j)
+            bins[b].append(k); insort(free, (room - n, b))
+    return bins
+
+def padding_ratio(lengths, seq_len: int, plan=None) -> float:
+    """Share of the seq_len windows that carries no example tokens."""
+    windows = len(plan) if plan is not None else len(lengths)
+    return round(1.0 - float(np.sum(lengths)) / (windows * seq_len), 4) if windows else 0.0
+
+
+class PackedDataset:
+    """Map-style dataset over a TokenCache; one item per packed seq_len window."""
+
+    def __init__(self, cache: TokenCache, seq_len: int, pad_id: int, pack: bool = True):
+        self.cache = cache; self.seq_len = seq_len; self.pad_id = pad_id
+        lengths = cache.lengths()
+        self.plan = pack_plan(lengths, seq_len) if pack else [[k] for k in range(len(cache))]
+
+    def __len__(self):
+        return len(self.plan)
+
+    def __getitem__(self, i: int) -> dict:
+        L = self.seq_len
+        ids = np.full(L, self.pad_id, dtype=np.int64)
+        labels = np.full(L, IGNORE_INDEX, dtype=np.int64)
+        pos = np.zeros(L, dtype=np.int64)
+        seg = np.full(L, -1, dtype=np.int64)  # example slot per position; -1 = padding
+        at = 0
+        for slot, k in enumerate(self.plan[i]):
+            toks, mask = self.cache.example(k)
+            n = len(toks)
+            ids[at:at + n] = toks
+            labels[at:at + n] = np.where(mask.astype(bool), toks, IGNORE_INDEX)
+            pos[at:at + n] = np.arange(n)
+            seg[at:at + n] = slot
+            at += n
+        return {"input_ids": ids, "labels": labels, "position_ids": pos, "segment_ids": seg, "n_tokens": at}
+
+
+def collate_packed(batch: list, dtype=None) -> dict:
+    """Stack packed windows; tokens attend only to earlier tokens of the same example."""
+    import torch
+    dtype = dtype or torch.float32
+    # drop trailing columns that are padding in every row (matters for --no-pack)
+    seg = np.stack([b["segment_ids"] for b in batch])
+    L = int(np.flatnonzero((seg >= 0).any(axis=0)).max()) + 1 if (seg >= 0).any() else 1
+    seg = torch.as_tensor(seg[:, :L])
+    causal = torch.ones(L, L, dtype=torch.bool).tril()
+    same = (seg[:, :, None] == seg[:, None, :]) & (seg[:, :, None] >= 0)
+    allowed = (same & causal)[:, None, :, :]
+    # padding rows attend to themselves so softmax stays finite
+    allowed = allowed | torch.eye(L, dtype=torch.bool)[None, None]
+    # additive 4D mask (0 = attend, dtype min = blocked), consumed as-is by HF decoder models
+    mask = torch.zeros(allowed.shape, dtype=dtype).masked_fill(~allowed, torch.finfo(dtype).min)
+    return {"input_ids": torch.as_tensor(np.stack([b["input_ids"][:L] for b in batch])),
+            "labels": torch.as_tensor(np.stack([b["labels"][:L] for b in batch])),
+            "position_ids": torch.as_tensor(np.stack([b["position_ids"][:L] for b in batch])),
+            "attention_mask": mask}
@@ -0,0 +1,36 @@
+import json, os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import build_dataset
+
+WORDS = ("oats lentils spinach quinoa salmon tofu barley kale carrots yogurt garlic onion rice beans tomatoes "
+         "peppers zucchini broccoli couscous chickpeas").split()
+
+
+def record(rid, words):
+    return {"id": rid, "instruction": "Plan a week of dinners.", "input": "", "output": " ".join(words)}
+
+
+def test_exact_and_near_duplicates_are_dropped_in_input_order(tmp_path):
+    base = WORDS * 3
+    near = base[:-1] + ["mushrooms"]  # one word of sixty changed
+    recs = [record("a", base), record("b", base), record("c", near), record("d", list(reversed(WORDS)) * 3)]
+    src = tmp_path / "in.jsonl"
+    src.write_text("".join(json.dumps(r) + "\n" for r in recs))
+    out = {}
+    for jobs in (1, 2):
+        report = build_dataset.build([str(src)], 0, str(tmp_path / f"out{jobs}"), jobs=jobs)
+        assert report["kept"] == 2 and report["rejected"] == {"exact_dup": 1, "near_dup": 1}
+        assert report["rejected_examples"] == {"exact_dup": ["b"], "near_dup": ["c"]}
+        shard = tmp_path / f"out{jobs}" / report["shards"][0]["file"]
+        out[jobs] = shard.read_bytes()
+        assert [json.loads(line)["id"] for line in out[jobs].splitlines()] == ["a", "d"]
+    assert out[1] == out[2]
+
+
+def test_minhash_estimates_jaccard():
+    build_dataset._init()
+    a = build_dataset.minhash(" ".join(WORDS * 3))
+    assert (a == build_dataset.minhash(" ".join(WORDS * 3))).all()
+    b = build_dataset.minhash(" ".join(reversed(WORDS)))
+    assert (a == b).mean() < 0.2
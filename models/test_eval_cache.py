@@ -0,0 +1,33 @@
+import json, os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import eval_cache
+from eval_cache import ResultCache
+
+
+def test_entry_evicted_between_read_and_touch_is_still_a_hit(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key("prompt")
+    cache.put(key, {"text": "{}"})
+
+    def evicted(path, *a, **kw):
+        os.remove(path); raise FileNotFoundError(path)
+    monkeypatch.setattr(eval_cache.os, "utime", evicted)
+    assert cache.get(key) == {"text": "{}"}
+    assert cache.stats()["hits"] == 1
+    monkeypatch.undo()
+    assert cache.get(key) is None and cache.stats()["misses"] == 1
+
+
+def test_fingerprint_memo_is_replaced_whole(tmp_path, monkeypatch):
+    model = tmp_path / "model"; model.mkdir()
+    (model / "config.json").write_text("{}")
+    cache = ResultCache(str(tmp_path / "cache"))
+    replaced = []
+    replace = os.replace
+    monkeypatch.setattr(eval_cache.os, "replace", lambda a, b: (replaced.append(b), replace(a, b)))
+    fp = cache.model_fingerprint(str(model))
+    assert replaced == [str(tmp_path / "cache" / "files.json")]
+    assert list(json.loads((tmp_path / "cache" / "files.json").read_text())) == [str(model / "config.json")]
+    assert sorted(os.listdir(tmp_path / "cache")) == ["files.json"]
+    assert cache.model_fingerprint(str(model)) == fp
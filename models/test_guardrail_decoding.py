@@ -0,0 +1,29 @@
+import os, sys
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from guardrail_decoding import FlagGrammar, JsonScan, piece_strings
+
+
+def test_sentencepiece_spaces_and_byte_fallback():
+    pieces = ["<s>", "▁{", '"', "flags", "<0x22>", ":", "▁[", "<0x0A>", "<0xC3>", "<0xA9>", "]}"]
+    text = piece_strings(pieces, special={0})
+    assert text == ["", " {", '"', "flags", '"', ":", " [", "\n", "", "", "]}"]
+
+
+def test_byte_level_bpe():
+    pieces = ["Ġ{", "Ġ\"", "flags", "\":", "Ġ[\"", "Ċ", "Ã©", "<|eot_id|>"]
+    assert piece_strings(pieces, special={7}) == [" {", ' "', "flags", '":', ' ["', "\n", "é", ""]
+
+
+def test_scanner_follows_byte_fallback_quotes_into_the_flags_array():
+    row = JsonScan(FlagGrammar(["a", "b"]))
+    pieces = ["▁{", "<0x22>", "flags", "<0x22>", ":", "▁[", '"', "a", '",', "▁", '"', "b", '"]', "}"]
+    for k, t in enumerate(piece_strings(pieces)):
+        row.feed(t)
+        if k == 6:
+            assert row.flags == ("name", row.grammar.root)
+    assert row.flags is None and row.closed and row.closed_at == len(pieces)
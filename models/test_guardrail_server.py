@@ -0,0 +1,49 @@
+import asyncio, json, os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from guardrail_server import Backend, Batcher, Server
+
+
+def _post_all(bodies, max_wait_ms=50.0):
+    async def go():
+        batcher = Batcher(Backend(use_model=False), max_batch=8, max_wait_ms=max_wait_ms)
+        server = Server(batcher, timeout_s=5.0)
+        task = asyncio.create_task(batcher.run())
+        try:
+            return await asyncio.gather(*[server.respond("POST", "/v1/guardrail", json.dumps(b).encode())
+                                          for b in bodies])
+        finally:
+            task.cancel()
+            batcher.model_thread.shutdown(wait=True)
+    return asyncio.run(go())
+
+
+def test_non_object_input_is_400_and_does_not_fail_the_batch():
+    res = _post_all([{"input": {}}, {"input": "bad"}, {"input": {}}])
+    assert [r[0] for r in res] == [200, 400, 200]
+    assert res[0][1]["guardrail_report"] == {"hard_fail": False, "flags": []}
+
+
+def test_oracle_error_stays_with_its_own_request():
+    backend = Backend(use_model=False)
+    out = backend.run([{}, "bad", {}])
+    assert isinstance(out[1], AttributeError)
+    assert out[0]["guardrail_report"] == out[2]["guardrail_report"] == {"hard_fail": False, "flags": []}
+
+
+def test_non_object_body_is_400():
+    assert _post_all([[1, 2]])[0][0] == 400
+
+
+def test_batcher_fails_only_the_bad_request(monkeypatch):
+    import guardrail_server
+    real = guardrail_server.rule_expected
+    def oracle(x):
+        if x.get("boom"):
+            raise ValueError("boom")
+        return real(x)
+    monkeypatch.setattr(guardrail_server, "rule_expected", oracle)
+    res = _post_all([{"input": {}}, {"input": {"boom": True}}, {"input": {}}])
+    assert [r[0] for r in res] == [200, 500, 200]
+    assert res[1][1]["error"] == "ValueError: boom"
+    assert {r[1].get("timing", {}).get("batch_size") for r in (res[0], res[2])} == {3}
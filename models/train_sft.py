@@ -1,29 +1,35 @@
-import json
-from datasets import Dataset
+import argparse, json, os, sys
 from transformers import AutoModelForCausalLM, AutoTokenizer, TrainingArguments, Trainer
 from peft import LoraConfig, get_peft_model
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sft_data import PackedDataset, build_token_cache, collate_packed, padding_ratio
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--no-pack", action="store_true", help="one example per sequence (previous behaviour), for comparison")
+ap.add_argument("--stats-only", action="store_true", help="build the token cache, print padding stats and exit")
+cli = ap.parse_args()
 
 # Load config
 cfg = json.load(open('models/config/sft.json'))
 
-# Load base model + tokenizer
-model = AutoModelForCausalLM.from_pretrained(cfg['base_model'])
+# Load tokenizer (the base model is loaded after the data is ready)
 tok = AutoTokenizer.from_pretrained(cfg['base_model'])
 tok.pad_token = tok.eos_token
 
-# Load dataset from JSONL
-def gen_data(path):
-    for line in open(path, 'r'):
-        if not line.strip():
-            continue
-        ex = json.loads(line)
-        yield {
-            "text": f"### Instruction:\n{ex['instruction']}\n"
-                    f"### Input:\n{ex.get('input','')}\n"
-                    f"### Output:\n{ex['output']}"
-        }
+# Tokenize once into the memory-mapped token cache, then pack into seq_len windows
+cache = build_token_cache(tok, cfg['train_file'], cfg["seq_len"])
+train = PackedDataset(cache, cfg["seq_len"], tok.pad_token_id, pack=not cli.no_pack)
+lengths = cache.lengths()
+data_stats = {"examples": len(cache), "tokens": int(lengths.sum()), "sequences": len(train),
+              "truncated": cache.meta["truncated"], "packed": not cli.no_pack,
+              "padding_ratio_unpacked": padding_ratio(lengths, cfg["seq_len"]),
+              "padding_ratio": padding_ratio(lengths, cfg["seq_len"], train.plan)}
+print(data_stats)
+if cli.stats_only:
+    sys.exit(0)
 
-train = Dataset.from_list(list(gen_data(cfg['train_file'])))
+# Load base model
+model = AutoModelForCausalLM.from_pretrained(cfg['base_model'])
 
 # PEFT (LoRA) config
 peft_cfg = LoraConfig(
@@ -46,12 +52,9 @@ args = TrainingArguments(
     save_strategy="epoch"
 )
 
-# Collator
+# Collator: packed windows with a block-diagonal causal mask (loss only on outputs)
 def collate(batch):
-    toks = tok([b['text'] for b in batch], return_tensors='pt',
-               padding=True, truncation=True, max_length=cfg["seq_len"])
-    toks['labels'] = toks['input_ids'].clone()
-    return toks
+    return collate_packed(batch, dtype=model.dtype)
 
 # Trainer
 trainer = Trainer(
@@ -62,7 +65,13 @@ trainer = Trainer(
 )
 
 # Train
-trainer.train()
+result = trainer.train()
+runtime = result.metrics.get("train_runtime") or 0
+data_stats["tokens_per_s"] = round(data_stats["tokens"] * cfg["epochs"] / runtime, 1) if runtime else None
+print(data_stats)
+os.makedirs("reports", exist_ok=True)
+with open("reports/sft_data_stats.json", "w") as f:
+    json.dump(data_stats, f, indent=2)
 
 # Save
 trainer.save_model(cfg["out_dir"])
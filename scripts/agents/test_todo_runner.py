@@ -0,0 +1,38 @@
+import os, subprocess, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import todo_runner
+from todo_runner import RunLog, load_checks, run_fda_checks
+
+SCRIPT = todo_runner.ROOT / "scripts" / "run_all_tests.sh"
+
+
+def test_runner_and_script_share_the_check_list():
+    out = subprocess.run(["bash", str(SCRIPT), "--list"], capture_output=True, text=True, check=True).stdout
+    listed = [line.split("\t", 2) for line in out.splitlines()]
+    assert [(n, c, r == "yes") for n, r, c in listed] == load_checks() == todo_runner.CHECKS
+    assert {n for n, _, required in load_checks() if required} >= {"schema", "signatures"}
+
+
+def test_failing_required_check_fails_the_run(tmp_path, monkeypatch):
+    manifest = tmp_path / "checks.tsv"
+    manifest.write_text("# name\trequired\tcommand\nok\tyes\ttrue\nflaky\tno\texit 3\nbroken\tyes\texit 1\n")
+    monkeypatch.setattr(todo_runner, "PERF_DIR", tmp_path)
+    monkeypatch.setattr(todo_runner, "_log", RunLog(tmp_path / "run.log"))
+    checks = load_checks(manifest)
+    assert [c[2] for c in checks] == [True, False, True]
+    ok, out = run_fda_checks(checks)
+    assert not ok and "[KE] broken (rc=1" in out
+    assert run_fda_checks(checks[:2])[0]
+    rc = subprocess.run(["bash", str(SCRIPT)], env={**os.environ, "KE_CHECKS": str(manifest)},
+                        capture_output=True, text=True).returncode
+    assert rc == 1
+
+
+def test_bad_required_column_is_rejected(tmp_path):
+    manifest = tmp_path / "checks.tsv"
+    manifest.write_text("lint\ttrue\tpython lint.py\n")
+    with pytest.raises(ValueError, match="required must be yes or no"):
+        load_checks(manifest)
@@ -1,10 +1,42 @@
 #!/usr/bin/env python3
-import re, subprocess, sys, pathlib, shlex
+import atexit, json, os, re, subprocess, sys, pathlib, shlex, time
+from concurrent.futures import ThreadPoolExecutor
+
+# Overnight TODO runner: picks the first unchecked TODO.md item it knows how to
+# do, runs its commands, runs the checks, ticks the item and commits.
+#
+# The log is append-only JSON lines (one record per command/check), buffered
+# and flushed after each record, rotated to agent_runner.log.1..N once it
+# passes LOG_MAX_BYTES. The checks come from scripts/checks.tsv, the list
+# run_all_tests.sh runs; they are independent, so they run concurrently, and a
+# failing required check stops the loop. Per-check rc and wall time go to
+# reports/perf/smoke_YYYYMMDD.json under "checks".
 
 ROOT = pathlib.Path(__file__).resolve().parents[2]
 TODO = ROOT / "TODO.md"
 LOG = ROOT / "logs" / "agent_runner.log"
-RUN_TESTS = ROOT / "scripts" / "run_all_tests.sh"
+LOG_MAX_BYTES = 5 << 20
+LOG_BACKUPS = 3
+PERF_DIR = ROOT / "reports" / "perf"
+
+CHECKS_FILE = ROOT / "scripts" / "checks.tsv"
+
+def load_checks(path: pathlib.Path = CHECKS_FILE) -> list:
+    """(name, command, required) per line of checks.tsv, the list run_all_tests.sh also runs."""
+    checks = []
+    for n, line in enumerate(path.read_text(encoding="utf-8").splitlines(), 1):
+        if not line.strip() or line.startswith("#"):
+            continue
+        try:
+            name, required, cmd = line.split("\t", 2)
+        except ValueError:
+            raise ValueError(f"{path}:{n}: expected name<TAB>required<TAB>command") from None
+        if required not in ("yes", "no"):
+            raise ValueError(f"{path}:{n}: required must be yes or no, got {required!r}")
+        checks.append((name, cmd, required == "yes"))
+    return checks
+
+CHECKS = load_checks()
 
 def run(cmd, cwd=ROOT):
     p = subprocess.Popen(cmd, cwd=str(cwd), shell=True,
@@ -12,9 +44,47 @@ def run(cmd, cwd=ROOT):
     out, _ = p.communicate()
     return p.returncode, out
 
-def log(msg):
-    LOG.parent.mkdir(parents=True, exist_ok=True)
-    LOG.write_text((LOG.read_text() if LOG.exists() else "") + msg + "\n")
+# ----- Log -----
+class RunLog:
+    """Append-only JSONL log with size-based rotation (path, path.1, ... path.N)."""
+
+    def __init__(self, path: pathlib.Path, max_bytes: int = LOG_MAX_BYTES, backups: int = LOG_BACKUPS):
+        self.path = path; self.max_bytes = max_bytes; self.backups = backups; self.f = None
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(self.path, "a", encoding="utf-8", buffering=1 << 16)
+
+    def _rotate(self):
+        self.f.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self._open()
+
+    def write(self, event: str, **fields):
+        if self.f is None:
+            self._open()
+        rec = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "event": event, **fields}
+        self.f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self.f.flush()
+        if self.f.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self):
+        if self.f is not None:
+            self.f.close(); self.f = None
+
+_log = RunLog(LOG)
+atexit.register(_log.close)
+
+def log(msg, event: str = "message", **fields):
+    _log.write(event, msg=msg, **fields)
 
 def git_commit(msg):
     return run(f'git add -A && git commit -m {shlex.quote(msg)}')
@@ -25,9 +95,40 @@ def mark_done(line_to_match):
     if new != txt:
         TODO.write_text(new)
 
-def run_fda_checks():
-    rc, out = run(f"{RUN_TESTS}")
-    return (rc == 0 or "Done." in out), out
+# ----- Checks -----
+def _timed(check):
+    name, cmd, required = check
+    t0 = time.perf_counter()
+    rc, out = run(cmd)
+    return name, cmd, required, rc, out, time.perf_counter() - t0
+
+def write_perf(steps: dict, wall_s: float):
+    """Merge check timings into today's smoke report, keeping whatever else it holds."""
+    PERF_DIR.mkdir(parents=True, exist_ok=True)
+    p = PERF_DIR / time.strftime("smoke_%Y%m%d.json")
+    try:
+        doc = json.loads(p.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        doc = {}
+    doc["checks"] = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "wall_s": round(wall_s, 3), "steps": steps}
+    p.write_text(json.dumps(doc, indent=2) + "\n", encoding="utf-8")
+    return p
+
+def run_fda_checks(checks=CHECKS, jobs: int = 0):
+    """Run the checks concurrently; ok unless a required check fails. Output is in CHECKS order."""
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(jobs or len(checks)) as pool:
+        results = list(pool.map(_timed, checks))
+    wall = time.perf_counter() - t0
+    ok = True; parts = []; steps = {}
+    for name, cmd, required, rc, out, dt in results:
+        log(out, event="check", check=name, cmd=cmd, rc=rc, seconds=round(dt, 3))
+        steps[name] = {"rc": rc, "seconds": round(dt, 3), "required": required}
+        parts.append(f"[KE] {name} (rc={rc}, {dt:.2f}s)\n{out}")
+        ok &= rc == 0 or not required
+    write_perf(steps, wall)
+    parts.append(f"[KE] Done in {wall:.2f}s.")
+    return ok, "\n".join(parts)
 
 def clean(text: str) -> str:
     # strip markdown formatting & normalize spaces/case
@@ -39,12 +140,12 @@ def clean(text: str) -> str:
 TASKS = [
     # normalize.py
     (["services/inventory/normalize.py", "normalize.py"],
-     ["mkdir -p services/inventory", ": > services/inventory/normalize.py"],
+     ["mkdir -p services/inventory", "test -s services/inventory/normalize.py || : > services/inventory/normalize.py"],
      "chore: scaffold inventory normalizer file — auto by todo_runner"),
     # signing.py
     (["services/common/signing.py", "signing.py"],
      ["mkdir -p services/common",
-      "cat > services/common/signing.py <<'SH'\nimport hashlib, pathlib\n\ndef sha256_file(path: str) -> str:\n    p=pathlib.Path(path); h=hashlib.sha256(p.read_bytes()).hexdigest()\n    (p.parent / (p.name + '.sha256')).write_text(h+'\\n'); return h\nSH"],
+      "test -s services/common/signing.py || cat > services/common/signing.py <<'SH'\nimport hashlib, pathlib\n\ndef sha256_file(path: str) -> str:\n    p=pathlib.Path(path); h=hashlib.sha256(p.read_bytes()).hexdigest()\n    (p.parent / (p.name + '.sha256')).write_text(h+'\\n'); return h\nSH"],
      "feat: add signing helper (sha256 sidecars) — auto by todo_runner"),
     # Design History Log
     (["docs/compliance/design_history_log.md", "design history log"],
@@ -64,9 +165,8 @@ TASKS = [
      "chore: scaffold rulesets/v2.json — auto by todo_runner"),
     # perf smoke
     (["reports/perf/smoke_", "perf smoke"],
-     ["mkdir -p reports/perf",
-      "date +'{\"ts\":\"%Y-%m-%dT%H:%M:%S%z\",\"note\":\"placeholder\"}' > reports/perf/smoke_$(date +%Y%m%d).json"],
-     "chore: add perf smoke placeholder — auto by todo_runner"),
+     ["python scripts/perf_smoke.py"],
+     "chore: add perf smoke report — auto by todo_runner"),
 ]
 
 def main():
@@ -82,14 +182,14 @@ def main():
             if any(k in txt for k in keys):
                 # execute
                 for c in cmds:
-                    rc, out = run(c); log(f"$ {c}\n{out}")
+                    rc, out = run(c); log(out, event="cmd", cmd=c, rc=rc)
                     if rc != 0:
                         print(f"Task failed: {raw}\nCommand: {c}\n{out}"); return 1
-                ok, out = run_fda_checks(); log(out)
+                ok, out = run_fda_checks()
                 if not ok:
                     print("FDA checks failed; stopping loop."); return 1
                 mark_done(raw)
-                rc, out = git_commit(msg); log(out)
+                rc, out = git_commit(msg); log(out, event="commit", rc=rc)
                 print(f"Completed: {raw}")
                 return 0
     print("No matching unchecked tasks found."); return 0
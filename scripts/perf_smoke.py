@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Perf smoke benchmarks: p50/p95/p99 latency and throughput of the hot paths.
+
+  scripts/perf_smoke.py                                  # all cases -> reports/perf/smoke_YYYYMMDD.json
+  scripts/perf_smoke.py --cases rule_expected,cart       # a subset
+  scripts/perf_smoke.py --save-baseline                  # also store the run as reports/perf/baseline.json
+  scripts/perf_smoke.py --compare --threshold 0.25       # exit 1 if any case's p95 regressed >25%
+
+Inputs are generated from --seed (or read from the repo's test files), each case
+runs --warmup untimed calls and then --repeat timed passes over its inputs, one
+perf_counter_ns sample per call. Cases whose dependencies are missing (torch for
+the model cases) are reported as skipped, not failed.
+"""
+import argparse, json, math, os, pathlib, platform, random, resource, subprocess, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT)); sys.path.insert(0, str(ROOT / "models")); sys.path.insert(0, str(ROOT / "scripts"))
+PERF_DIR = ROOT / "reports" / "perf"
+BASELINE = PERF_DIR / "baseline.json"
+TESTS = ROOT / "models" / "data" / "KaizenEdge_Guardrail_Tests_v2.jsonl"
+SAMPLE_PROFILE = ROOT / "sample_profile.json"
+NUTRIENTS = ("kcal", "protein_g", "carbs_g", "fat_g", "sodium_mg", "potassium_mg", "phosphorus_mg", "vit_a_mcg")
+
+
+class Skip(Exception):
+    pass
+
+
+def load_tests():
+    with open(TESTS, "r", encoding="utf-8") as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+
+# ----- Cases -----
+# Each case takes a seeded Random and returns (calls, units): a list of
+# zero-argument callables, one per input, and an optional result -> work units
+# function (e.g. generated tokens) for a units/s figure.
+
+def case_rule_expected(rng):
+    from guardrail_rules import rule_expected
+    inputs = [t["input"] for t in load_tests()]
+    return [lambda x=x: rule_expected(x) for x in inputs], None
+
+def _eval_module():
+    try:
+        import eval_guardrails
+    except ImportError as e:
+        raise Skip(f"eval_guardrails unavailable: {e}")
+    return eval_guardrails
+
+def recorded_outputs(rng, n=200):
+    """Model-like outputs from the test oracle: prose around the JSON, trailing commas, truncation, keyed flags."""
+    from guardrail_rules import rule_expected
+    reports = [rule_expected(t["input"]) for t in load_tests()]
+    outs = []
+    for _ in range(n):
+        body = json.dumps({"guardrail_report": rng.choice(reports)})
+        kind = rng.randrange(4)
+        if kind == 1:
+            body = body.replace("]", ",]", 1)
+        elif kind == 2:
+            body = body[:rng.randrange(len(body) // 2, len(body))]
+        elif kind == 3:
+            body = body.replace('"]', '": {"severity": 1}]', 1)
+        outs.append(rng.choice(["", "Here is the report:\n", "```json\n"]) + body + rng.choice(["", "\n```", " Done."]))
+    return outs
+
+def case_parse_json(rng):
+    from guardrail_parse import extract_json, repair_json
+
+    def parse(s):
+        try:
+            return extract_json(s)
+        except Exception:
+            try:
+                return repair_json(s)
+            except Exception:
+                return None
+    return [lambda s=s: parse(s) for s in recorded_outputs(rng)], None
+
+def case_generate(rng, n=4, max_new_tokens=128):
+    eg = _eval_module()
+    try:
+        eg.load_model()
+    except OSError as e:  # no checkpoint at eg.OUT_DIR
+        raise Skip(f"model unavailable: {e}")
+    tests = load_tests()
+    prompts = [eg.render_prompt(eg.build_chat(t)) for t in rng.sample(tests, min(n, len(tests)))]
+    # generate_text is generate_batch([prompt])[0][0]; the batch row also carries the token count
+    return [lambda p=p: eg.generate_batch([p], max_new_tokens)[0] for p in prompts], lambda out: out[1]
+
+def week_plan(rng, days=7, meals=3, recipes=2, ingredients=6):
+    return [{"days": [{"meals": [{"recipes": [{"ingredients": [
+        {"nutrients": {k: round(rng.uniform(0, 400), 2) for k in rng.sample(NUTRIENTS, rng.randint(3, len(NUTRIENTS)))}}
+        for _ in range(ingredients)]} for _ in range(recipes)]} for _ in range(meals)]} for _ in range(days)]}]
+
+DAY_LIMITS = {"sodium_mg": 2300, "potassium_mg": 3500, "phosphorus_mg": 1000, "vit_a_mcg": 3000}
+
+def case_sum_nutrients(rng, weeks=1):
+    from services.nutrition.calc import enforce_thresholds, sum_nutrients
+
+    def run(plan):
+        flags = []
+        for week in plan:
+            for day in week["days"]:
+                meals = [sum_nutrients([{"nutrients": sum_nutrients(r["ingredients"])} for r in m["recipes"]])
+                         for m in day["meals"]]
+                flags.append(enforce_thresholds(sum_nutrients([{"nutrients": t} for t in meals]), DAY_LIMITS))
+        return flags
+    return [lambda p=plan(rng, weeks): run(p) for _ in range(20)], None
+
+def case_plan_rollup(rng, weeks=1):
+    # same plans and day flags as case_sum_nutrients, so the two are directly comparable
+    from services.nutrition.calc import PlanRollup
+    return [lambda p=plan(rng, weeks): PlanRollup(p).check_thresholds({"day": DAY_LIMITS}) for _ in range(20)], None
+
+def plan(rng, weeks):
+    return [w for _ in range(weeks) for w in week_plan(rng)]
+
+def case_validate_profile(rng):
+    import validate_profile
+    validate_profile._init(str(validate_profile.SCHEMA))
+    base = json.loads(SAMPLE_PROFILE.read_text(encoding="utf-8"))
+    docs = []
+    for i in range(200):
+        doc = json.loads(json.dumps(base))
+        if rng.random() < 0.3:  # some invalid documents, so error paths are timed too
+            doc["demographics_anthropometrics"]["sex_at_birth"] = rng.choice(["x", 3, None])
+        if rng.random() < 0.2:
+            doc["nutrition_targets"]["energy_kcal_per_day"] = rng.choice([-5, "2000", 1e9])
+        docs.append((f"doc{i}", json.dumps(doc).encode("utf-8")))
+    return [lambda d=d: validate_profile.check_batch([d]) for d in docs], None
+
+def case_cart(rng, n_ingredients=12, stores=("costco", "walmart", "kroger", "target", "safeway")):
+    from services.inventory.common import Item
+    from services.inventory.optimize import optimize_cart
+    carts = []
+    for _ in range(50):
+        ings = [f"ing{i}" for i in range(n_ingredients)]
+        cands = {ing: [Item(sku=f"{s}-{ing}-{k}", name=ing, store=s, price_usd=round(rng.uniform(1, 12), 2), unit="each",
+                            in_stock=rng.random() > 0.1)
+                       for s in stores for k in range(3)] for ing in ings}
+        carts.append((ings, cands))
+    return [lambda c=c: optimize_cart(c[0], c[1], store_penalty_usd=2.0, max_stores=3) for c in carts], None
+
+CASES = {"rule_expected": case_rule_expected, "parse_json": case_parse_json, "generate_text": case_generate,
+         "sum_nutrients": case_sum_nutrients, "plan_rollup": case_plan_rollup,
+         "sum_nutrients_52w": lambda rng: case_sum_nutrients(rng, 52),
+         "plan_rollup_52w": lambda rng: case_plan_rollup(rng, 52),
+         "validate_profile": case_validate_profile, "cart": case_cart}
+
+
+# ----- Harness -----
+def percentile(sorted_vals, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals), math.ceil(q / 100.0 * len(sorted_vals))) - 1)
+    return sorted_vals[k]
+
+def run_case(name: str, seed: int, warmup: int, repeat: int) -> dict:
+    rng = random.Random(seed)
+    try:
+        calls, units = CASES[name](rng)
+    except Skip as e:
+        return {"skipped": str(e)}
+    for i in range(min(warmup, len(calls) * repeat)):
+        calls[i % len(calls)]()
+    lat = []; work = 0
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        for fn in calls:
+            t0 = clock(); out = fn(); lat.append(clock() - t0)
+            if units:
+                work += units(out)
+    total = sum(lat) / 1e9
+    lat = sorted(x / 1e6 for x in lat)
+    res = {"n": len(lat), "p50_ms": round(percentile(lat, 50), 4), "p95_ms": round(percentile(lat, 95), 4),
+           "p99_ms": round(percentile(lat, 99), 4), "mean_ms": round(sum(lat) / len(lat), 4) if lat else 0.0,
+           "ops_per_s": round(len(lat) / total, 1) if total else 0.0}
+    if units:
+        res["units_per_s"] = round(work / total, 1) if total else 0.0
+    return res
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def compare(current: dict, baseline: dict, metric: str, threshold: float, min_delta_ms: float) -> list:
+    """[(case, base, cur, ratio)] for cases slower than baseline by more than threshold (and min_delta_ms)."""
+    out = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base or "skipped" in cur or "skipped" in base:
+            continue
+        b, c = base[metric], cur[metric]
+        if c > b * (1 + threshold) and c - b > min_delta_ms:
+            out.append((name, b, c, c / b if b else float("inf")))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", default=",".join(CASES), help="comma-separated subset of: " + ", ".join(CASES))
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--warmup", type=int, default=20, help="untimed calls per case")
+    ap.add_argument("--repeat", type=int, default=5, help="timed passes over each case's inputs")
+    ap.add_argument("--out", default=str(PERF_DIR / time.strftime("smoke_%Y%m%d.json")))
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--compare", action="store_true", help="exit 1 on a regression vs the baseline")
+    ap.add_argument("--metric", default="p95_ms", choices=("p50_ms", "p95_ms", "p99_ms", "mean_ms"))
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    ap.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore regressions smaller than this")
+    a = ap.parse_args()
+
+    results = {}
+    for name in a.cases.split(","):
+        if name not in CASES:
+            ap.error(f"unknown case {name!r}")
+        r = results[name] = run_case(name, a.seed, a.warmup, a.repeat)
+        if "skipped" in r:
+            print(f"{name:18} skipped: {r['skipped']}")
+        else:
+            print(f"{name:18} p50 {r['p50_ms']:9.4f}  p95 {r['p95_ms']:9.4f}  p99 {r['p99_ms']:9.4f} ms  "
+                  f"{r['ops_per_s']:10.1f}/s" + (f"  {r['units_per_s']:.1f} units/s" if "units_per_s" in r else ""))
+    bench = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git": git_rev(), "python": platform.python_version(),
+             "platform": platform.platform(), "cpus": os.cpu_count(), "seed": a.seed, "warmup": a.warmup,
+             "repeat": a.repeat, "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+             "cases": results}
+
+    # today's smoke file may already hold todo_runner's check timings; keep them
+    out = pathlib.Path(a.out); out.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        doc = json.loads(out.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        doc = {}
+    doc.pop("note", None)
+    doc["bench"] = bench
+    out.write_text(json.dumps(doc, indent=2) + "\n", encoding="utf-8")
+    print("Wrote", out)
+    if a.compare:
+        baseline = json.loads(pathlib.Path(a.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline.get("cases", {}), a.metric, a.threshold, a.min_delta_ms)
+        for name, b, c, ratio in regressions:
+            print(f"REGRESSION {name}: {a.metric} {b:.4f} -> {c:.4f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"OK: no {a.metric} regression over {a.threshold:.0%} vs {a.baseline}")
+    if a.save_baseline:
+        base = pathlib.Path(a.baseline); base.parent.mkdir(parents=True, exist_ok=True)
+        base.write_text(json.dumps(bench, indent=2) + "\n", encoding="utf-8")
+        print("Wrote", base)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
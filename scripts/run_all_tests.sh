@@ -1,10 +1,30 @@
 #!/usr/bin/env bash
 set -euo pipefail
-echo "[KE] Running schema validation…"
-python -m jsonschema -i sample_profile.json schemas/input_taxonomy_v1.json || true
-echo "[KE] Running guardrails…"
-python models/eval_guardrails.py || true
-echo "[KE] Style lint…"
-echo "Sample content" | python tools/lint/style_lint.py || true
-echo "[KE] Signature check (if any)…"
+# Runs the checks in scripts/checks.tsv (name, required yes/no, command) from the
+# repo root. Exits 1 if a required check fails; optional failures are reported.
+#   scripts/run_all_tests.sh           # run every check
+#   scripts/run_all_tests.sh --list    # print the checks (name, required, command)
+#   KE_CHECKS=other.tsv scripts/run_all_tests.sh
+cd "$(dirname "$0")/.."
+CHECKS="${KE_CHECKS:-scripts/checks.tsv}"
+if [[ "${1:-}" == "--list" ]]; then
+  grep -v -e '^#' -e '^$' "$CHECKS"
+  exit 0
+fi
+failed=()
+while IFS=$'\t' read -r name required cmd; do
+  [[ -z "$name" || "$name" == \#* ]] && continue
+  echo "[KE] $name…"
+  if ! bash -c "$cmd" </dev/null; then
+    if [[ "$required" == "yes" ]]; then
+      failed+=("$name")
+    else
+      echo "[KE] $name failed (optional)"
+    fi
+  fi
+done < "$CHECKS"
+if (( ${#failed[@]} )); then
+  echo "[KE] Required checks failed: ${failed[*]}"
+  exit 1
+fi
 echo "[KE] Done."
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Generated fast-path validator for the profile schemas.
+
+The JSON Schema is translated once into straight-line Python (one function per
+schema node) and cached under .cache/schema_validators/<schema sha256>.py, so
+later runs import it (with its .pyc) instead of walking the schema per document.
+Only the keywords our schemas use are supported; anything else raises
+Unsupported and callers fall back to jsonschema. "format" is not asserted,
+matching Draft202012Validator without a format checker.
+
+validate(doc) returns every error as (json_pointer, message), with messages
+worded like jsonschema's. The keyword checks, runtime helpers and module cache
+are shared with services/common/taxonomy.py (services/common/schema_codegen.py).
+"""
+import hashlib, json, pathlib, sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "services" / "common"))
+from schema_codegen import (IS_NUMBER, RUNTIME, const_error, enum_error, length_error, load_module, pattern_error,
+                            range_error, required_error, type_error, unique_error)
+
+CACHE_DIR = ROOT / ".cache" / "schema_validators"
+GENERATOR_VERSION = "2"
+
+IGNORED = {"$schema", "$id", "title", "description", "format", "$comment", "examples", "default"}
+SUPPORTED = {"type", "enum", "const", "properties", "additionalProperties", "required", "items", "minimum", "maximum",
+             "exclusiveMinimum", "exclusiveMaximum", "minLength", "maxLength", "minItems", "maxItems", "pattern",
+             "uniqueItems"}
+
+
+class Unsupported(Exception):
+    pass
+
+
+class _Gen:
+    def __init__(self):
+        self.funcs = []; self.consts = []; self.n = 0
+
+    def const(self, value) -> str:
+        self.consts.append(value)
+        return f"_C{len(self.consts) - 1}"
+
+    def node(self, schema) -> str:
+        if schema is True or schema == {}:
+            return "None"
+        if schema is False:
+            raise Unsupported("false schema")
+        unknown = set(schema) - IGNORED - SUPPORTED
+        if unknown:
+            raise Unsupported(", ".join(sorted(unknown)))
+        name = f"_n{self.n}"; self.n += 1
+        body = []
+        w = body.append
+
+        def fail(check, ind=""):
+            cond, msg = check
+            w(f"{ind}if {cond}: e.append((_pointer(p), {msg}))")
+
+        for kw, val in schema.items():
+            if kw == "type":
+                fail(type_error("x", val if isinstance(val, list) else [val]))
+            elif kw == "enum":
+                strings = all(isinstance(v, str) for v in val)
+                listing = self.const(val)
+                fail(enum_error("x", self.const(frozenset(val)) if strings else listing, listing, strings))
+            elif kw == "const":
+                fail(const_error("x", self.const(val)))
+            elif kw == "properties":
+                w("if isinstance(x, dict):")
+                for prop, sub in val.items():
+                    fn = self.node(sub)
+                    if fn != "None":
+                        w(f"    if {prop!r} in x: {fn}(x[{prop!r}], (p, {prop!r}), e)")
+                w("    pass")
+            elif kw == "additionalProperties":
+                known = self.const(frozenset(schema.get("properties", {})))
+                if val is False:
+                    w("if isinstance(x, dict):")
+                    w(f"    m = _additional(x, {known})")
+                    w("    if m: e.append((_pointer(p), m))")
+                elif isinstance(val, dict):
+                    fn = self.node(val)
+                    if fn != "None":
+                        w("if isinstance(x, dict):")
+                        w("    for k, v in x.items():")
+                        w(f"        if k not in {known}: {fn}(v, (p, k), e)")
+            elif kw == "required":
+                w("if isinstance(x, dict):")
+                for prop in val:
+                    fail(required_error("x", repr(prop)), "    ")
+            elif kw == "items":
+                if not isinstance(val, dict):
+                    raise Unsupported("array-form items")
+                fn = self.node(val)
+                if fn != "None":
+                    w("if isinstance(x, list):")
+                    w(f"    for i, v in enumerate(x): {fn}(v, (p, i), e)")
+            elif kw in ("minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum"):
+                cond, msg = range_error(kw, "x", val)
+                fail((f"{IS_NUMBER.format(x='x')} and {cond}", msg))
+            elif kw in ("minLength", "maxLength", "minItems", "maxItems"):
+                fail(length_error(kw, "x", val))
+            elif kw == "pattern":
+                c = self.const(val)
+                rx = f"_R{self.n}_{len(self.consts)}"
+                self.funcs.append(f"{rx} = re.compile({val!r})")
+                fail(pattern_error("x", rx, c))
+            elif kw == "uniqueItems":
+                if val:
+                    cond, msg = unique_error("x")
+                    fail((f"isinstance(x, list) and {cond}", msg))
+        if not body:
+            return "None"
+        self.funcs.append(f"def {name}(x, p, e):\n" + "\n".join("    " + ln for ln in body))
+        return name
+
+
+def generate_source(schema: dict) -> str:
+    g = _Gen()
+    root = g.node(schema)
+    consts = "\n".join(f"_C{i} = {c!r}" for i, c in enumerate(g.consts))
+    entry = (f"def validate(doc):\n    e = []\n    {root}(doc, None, e)\n    return e\n" if root != "None"
+             else "def validate(doc):\n    return []\n")
+    return "# generated by scripts/schema_fastpath.py — do not edit\n" + RUNTIME + "\n" + consts + "\n\n" + \
+        "\n\n".join(g.funcs) + "\n\n" + entry
+
+
+# ----- Loading / caching -----
+def schema_sha256(raw: bytes) -> str:
+    return hashlib.sha256(GENERATOR_VERSION.encode("utf-8") + b"\0" + raw).hexdigest()
+
+def load_validator(schema_path, cache_dir=CACHE_DIR):
+    """validate(doc) -> [(pointer, message)] for the schema; generated code is cached by schema hash."""
+    raw = pathlib.Path(schema_path).read_bytes()
+    path = pathlib.Path(cache_dir) / f"v_{schema_sha256(raw)[:32]}.py"
+    return load_module(path, lambda: generate_source(json.loads(raw.decode("utf-8")))).validate
+
+
+def jsonschema_validator(schema_path):
+    """Fallback with the same (pointer, message) output, for schemas the generator does not support."""
+    from jsonschema import Draft202012Validator
+    v = Draft202012Validator(json.loads(pathlib.Path(schema_path).read_text(encoding="utf-8")))
+    def validate(doc):
+        return [("".join("/" + str(k).replace("~", "~0").replace("/", "~1") for k in err.absolute_path), err.message)
+                for err in v.iter_errors(doc)]
+    return validate
+
+
+def get_validator(schema_path):
+    try:
+        return load_validator(schema_path)
+    except Unsupported:
+        return jsonschema_validator(schema_path)
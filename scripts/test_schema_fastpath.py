@@ -0,0 +1,39 @@
+import json, multiprocessing as mp, os, pathlib, sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import schema_fastpath
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+SCHEMA = ROOT / "schemas" / "input_taxonomy_v1.json"
+
+
+def _load(barrier, cache_dir, q):
+    replace = os.replace
+    def write_then_replace(src, dst):  # all writers have written their tmp file before any rename
+        barrier.wait(); replace(src, dst)
+    os.replace = write_then_replace  # child process only
+    doc = json.loads((ROOT / "sample_profile.json").read_text())
+    q.put(len(schema_fastpath.load_validator(SCHEMA, cache_dir)(doc)))
+
+
+def test_concurrent_first_load_does_not_race(tmp_path):
+    n = 8
+    for i in range(2):
+        cache = tmp_path / f"c{i}"
+        barrier, q = mp.Barrier(n), mp.Queue()
+        procs = [mp.Process(target=_load, args=(barrier, cache, q)) for _ in range(n)]
+        for p in procs: p.start()
+        for p in procs: p.join()
+        assert [p.exitcode for p in procs] == [0] * n
+        assert sorted(q.get() for _ in range(n)) == [0] * n
+        assert [p.suffix for p in cache.iterdir()] == [".py"]
+
+
+def test_matches_jsonschema_on_a_broken_profile(tmp_path):
+    doc = json.loads((ROOT / "sample_profile.json").read_text())
+    doc["zz"] = 1
+    for k in list(doc)[:2]:
+        doc[k] = None
+    fast = schema_fastpath.load_validator(SCHEMA, tmp_path)(doc)
+    assert fast
+    assert sorted(fast) == sorted(schema_fastpath.jsonschema_validator(SCHEMA)(doc))
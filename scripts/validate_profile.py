@@ -1,15 +1,123 @@
 #!/usr/bin/env python3
-import sys, json
-from jsonschema import Draft202012Validator
-import pathlib
-schema = json.load(open("schemas/input_taxonomy_v1.json"))
-v = Draft202012Validator(schema)
-ok=True
-for p in sys.argv[1:]:
-    data=json.load(open(p))
-    try: v.validate(data)
-    except Exception as e:
-        print(f"❌ {p}: {e}"); ok=False
-    else:
-        print(f"✅ {p}: PASS")
-sys.exit(0 if ok else 1)
+"""Validate profiles against schemas/input_taxonomy_v1.json.
+
+  scripts/validate_profile.py sample_profile.json            # files
+  scripts/validate_profile.py data/profiles/ -j 8            # directories (*.json, *.jsonl, *.ndjson)
+  cat profiles.ndjson | scripts/validate_profile.py -        # NDJSON on stdin
+
+Every error of every document is reported with its JSON pointer. Documents are
+validated in a process pool by a generated validator cached per schema hash
+(see schema_fastpath.py); throughput goes to stderr.
+"""
+import argparse, json, os, pathlib, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import schema_fastpath
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+SCHEMA = ROOT / "schemas" / "input_taxonomy_v1.json"
+STREAM_SUFFIXES = (".jsonl", ".ndjson")
+
+_validate = None
+
+def _init(schema_path):
+    global _validate
+    _validate = schema_fastpath.get_validator(schema_path)
+
+
+def check_batch(batch):
+    """[(label, raw bytes)] -> [(label, [(pointer, message)])]; parse errors are reported at the root."""
+    out = []
+    for label, raw in batch:
+        try:
+            doc = json.loads(raw)
+        except ValueError as e:
+            out.append((label, [("", f"invalid JSON: {e}")])); continue
+        out.append((label, _validate(doc)))
+    return out
+
+
+# ----- Inputs -----
+def iter_paths(args):
+    for a in args:
+        if a == "-":
+            yield a
+        elif os.path.isdir(a):
+            for dirpath, dirnames, files in os.walk(a):
+                dirnames.sort()
+                for name in sorted(files):
+                    if name.endswith((".json",) + STREAM_SUFFIXES):
+                        yield os.path.join(dirpath, name)
+        else:
+            yield a
+
+def iter_docs(paths):
+    """(label, raw bytes) per document: whole files for .json, one per line for NDJSON and stdin."""
+    for p in paths:
+        if p == "-" or p.endswith(STREAM_SUFFIXES):
+            f = sys.stdin.buffer if p == "-" else open(p, "rb")
+            name = "<stdin>" if p == "-" else p
+            with f:
+                for n, line in enumerate(f, 1):
+                    if line.strip():
+                        yield f"{name}:{n}", line
+        else:
+            with open(p, "rb") as f:
+                yield p, f.read()
+
+def batches(docs, size):
+    batch = []
+    for d in docs:
+        batch.append(d)
+        if len(batch) >= size:
+            yield batch; batch = []
+    if batch:
+        yield batch
+
+
+def run(docs, schema_path, jobs: int, batch_size: int):
+    """Yield per-document results in input order; at most 2 x jobs batches are in flight."""
+    if jobs <= 1:
+        _init(schema_path)
+        for b in batches(docs, batch_size):
+            yield from check_batch(b)
+        return
+    schema_fastpath.get_validator(schema_path)  # generate the cached module once, before the workers load it
+    with ProcessPoolExecutor(jobs, initializer=_init, initargs=(schema_path,)) as pool:
+        inflight = []
+        for b in batches(docs, batch_size):
+            inflight.append(pool.submit(check_batch, b))
+            if len(inflight) >= 2 * jobs:
+                yield from inflight.pop(0).result()
+        for fut in inflight:
+            yield from fut.result()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("inputs", nargs="+", help="files, directories, or - for NDJSON on stdin")
+    ap.add_argument("--schema", default=str(SCHEMA))
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--batch-size", type=int, default=256, help="documents per worker task")
+    ap.add_argument("-q", "--quiet", action="store_true", help="print failures only")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    docs = failed = 0
+    for label, errors in run(iter_docs(iter_paths(args.inputs)), args.schema, args.jobs, args.batch_size):
+        docs += 1
+        if errors:
+            failed += 1
+            print(f"❌ {label}: {len(errors)} error(s)")
+            for ptr, msg in errors:
+                print(f"   {ptr or '/'}: {msg}")
+        elif not args.quiet:
+            print(f"✅ {label}: PASS")
+    wall = time.perf_counter() - t0
+    print(f"{docs} docs, {failed} failed, {wall:.2f}s, {docs / wall if wall else 0.0:.0f} docs/s", file=sys.stderr)
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
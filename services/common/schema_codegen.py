@@ -0,0 +1,121 @@
+import importlib.util, os, pathlib
+
+# Shared pieces of the generated JSON Schema checkers (scripts/schema_fastpath.py
+# walks a schema, services/common/taxonomy.py the taxonomy field list).
+#
+# Both emit straight-line Python whose errors must read exactly like
+# jsonschema's, so the type tests, the runtime helpers every generated module
+# starts with, the (condition, message) pair for each keyword and the on-disk
+# module cache live here once. Each *_error() returns source text: a condition
+# that is true when the keyword fails for value expression x, and an f-string
+# expression for the message; callers add their own error-append statement.
+#
+#   cond, msg = type_error("x", ["string"])
+#   lines.append(f"if {cond}: e.append((_pointer(p), {msg}))")
+
+TYPE_CHECKS = {
+    "object": "isinstance({x}, dict)",
+    "array": "isinstance({x}, list)",
+    "string": "isinstance({x}, str)",
+    "boolean": "isinstance({x}, bool)",
+    "null": "{x} is None",
+    "number": "(isinstance({x}, (int, float)) and not isinstance({x}, bool))",
+    "integer": "((isinstance({x}, int) and not isinstance({x}, bool)) or (isinstance({x}, float) and {x}.is_integer()))",
+}
+IS_NUMBER = TYPE_CHECKS["number"]
+
+
+# ----- Runtime (pasted at the top of every generated module) -----
+# _eq is jsonschema's equality for enum/const/uniqueItems: True != 1, containers
+# compare element-wise; _additional lists extras sorted by str, as jsonschema does.
+RUNTIME = '''import re
+
+def _pointer(p):
+    parts = []
+    while p:
+        p, key = p
+        parts.append(str(key).replace("~", "~0").replace("/", "~1"))
+    return "/" + "/".join(reversed(parts)) if parts else ""
+
+def _eq(a, b):
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_eq(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_eq(x, y) for x, y in zip(a, b))
+    return a == b
+
+def _unique(xs):
+    for i in range(len(xs)):
+        for j in range(i + 1, len(xs)):
+            if _eq(xs[i], xs[j]):
+                return False
+    return True
+
+def _additional(x, allowed):
+    extra = sorted((k for k in x if k not in allowed), key=str)
+    if extra:
+        return "Additional properties are not allowed (%s %s unexpected)" % (
+            ", ".join(repr(k) for k in extra), "was" if len(extra) == 1 else "were")
+    return None
+'''
+
+
+# ----- Keyword checks: (condition, message expression) -----
+def type_error(x: str, types: list):
+    cond = " or ".join(TYPE_CHECKS[t].format(x=x) for t in types)
+    return f"not ({cond})", f"f\"{{{x}!r}} is not of type {', '.join(repr(t) for t in types)}\""
+
+def enum_error(x: str, members: str, listing: str, strings: bool = True):
+    """members/listing: names of a frozenset (strings) or list constant, and of the list shown in the message."""
+    cond = f"not (isinstance({x}, str) and {x} in {members})" if strings else f"not any(_eq({x}, v) for v in {members})"
+    return cond, f"f\"{{{x}!r}} is not one of {{{listing}!r}}\""
+
+def const_error(x: str, value: str):
+    return f"not _eq({x}, {value})", f"f\"{{{value}!r}} was expected\""
+
+def required_error(obj: str, key: str):
+    """key: expression for the property name."""
+    return f"{key} not in {obj}", f"f\"{{{key}!r}} is a required property\""
+
+def range_error(kw: str, x: str, limit):
+    """minimum / maximum / exclusive*; the condition assumes x is a number (guard with IS_NUMBER)."""
+    op, text = {"minimum": ("<", "less than the minimum of"),
+                "maximum": (">", "greater than the maximum of"),
+                "exclusiveMinimum": ("<=", "less than or equal to the minimum of"),
+                "exclusiveMaximum": (">=", "greater than or equal to the maximum of")}[kw]
+    return f"{x} {op} {limit!r}", f"f\"{{{x}!r}} is {text} {limit!r}\""
+
+def length_error(kw: str, x: str, limit: int):
+    """minLength / maxLength / minItems / maxItems, including the str/list type guard."""
+    typ = "str" if kw.endswith("Length") else "list"
+    op, text = ("<", "is too short") if kw.startswith("min") else (">", "is too long")
+    return f"isinstance({x}, {typ}) and len({x}) {op} {limit!r}", f"f\"{{{x}!r}} {text}\""
+
+def pattern_error(x: str, regex: str, source: str):
+    """regex: name of a compiled pattern; source: name of its pattern string."""
+    return f"isinstance({x}, str) and not {regex}.search({x})", f"f\"{{{x}!r}} does not match {{{source}!r}}\""
+
+def unique_error(x: str):
+    return f"not _unique({x})", f"f\"{{{x}!r}} has non-unique elements\""
+
+
+# ----- Module cache -----
+def load_module(path, make_source):
+    """Import the generated module at path, writing make_source() there first if it is missing.
+
+    Each writer uses its own tmp file and renames it into place, so processes that find
+    the cache empty at the same time cannot trip over each other.
+    """
+    path = pathlib.Path(path)
+    if not path.exists():
+        src = make_source()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(src, encoding="utf-8")
+        os.replace(tmp, path)
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
@@ -0,0 +1,163 @@
+import argparse, hashlib, json, mmap, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+# Artifact signing: sha256 digests, .sha256 sidecars, bulk verification.
+#
+# Files are hashed in fixed-size chunks into one reused buffer (or through mmap
+# for large files), so memory stays constant however big the checkpoint is.
+# Many files are hashed at once on a thread pool; hashlib releases the GIL
+# while it digests. A manifest of (size, mtime_ns, digest) per path lets
+# unchanged files skip hashing on the next run.
+#
+#   python services/common/signing.py sign models/out/ke-sft-v0.1/adapter_model.safetensors
+#   python services/common/signing.py verify docs reports        # every *.sha256 under these roots
+
+CHUNK = 1 << 20
+MMAP_MIN = 64 << 20          # files at least this large are hashed through mmap
+MANIFEST = ".cache/signing/manifest.json"
+AUDIT_LOG = "logs/audit.log"
+
+
+def sha256_file(path: str, chunk: int = CHUNK) -> str:
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if size >= MMAP_MIN:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return hashlib.sha256(m).hexdigest()
+        h = hashlib.sha256()
+        buf = bytearray(chunk); view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+        return h.hexdigest()
+
+
+class Manifest:
+    """path -> [size, mtime_ns, digest]; entries are reused while size and mtime are unchanged."""
+
+    def __init__(self, path: str = MANIFEST):
+        self.path = path; self.hashed = 0; self.reused = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def digests(self, paths, workers: int = 0) -> dict:
+        """abspath -> digest for every path, hashing only new or changed files (in parallel)."""
+        out = {}; todo = []
+        for p in paths:
+            p = os.path.abspath(p)
+            st = os.stat(p)
+            rec = self.entries.get(p)
+            if rec and rec[0] == st.st_size and rec[1] == st.st_mtime_ns:
+                out[p] = rec[2]; self.reused += 1
+            else:
+                todo.append((p, st))
+        if todo:
+            with ThreadPoolExecutor(workers or min(8, os.cpu_count() or 1)) as pool:
+                for (p, st), digest in zip(todo, pool.map(lambda t: sha256_file(t[0]), todo)):
+                    self.entries[p] = [st.st_size, st.st_mtime_ns, digest]
+                    out[p] = digest
+            self.hashed += len(todo)
+        return out
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+
+# ----- Sidecars -----
+def read_sidecar(path: str) -> str:
+    """Digest from a sidecar: bare hex or 'hex  filename' (sha256sum format)."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    return text.split()[0].lower() if text else ""
+
+def sidecar_target(sidecar: str):
+    """File a sidecar signs: next to it, or for signatures/ dirs, in the parent or one of its subdirs."""
+    name = os.path.basename(sidecar)[:-len(".sha256")]
+    here = os.path.dirname(sidecar)
+    cands = [os.path.join(here, name)]
+    if os.path.basename(here) == "signatures":
+        parent = os.path.dirname(here)
+        cands.append(os.path.join(parent, name))
+        try:
+            cands += [os.path.join(e.path, name) for e in os.scandir(parent) if e.is_dir() and e.path != here]
+        except FileNotFoundError:
+            pass
+    return next((c for c in cands if os.path.isfile(c)), None)
+
+def find_sidecars(roots) -> list:
+    out = []
+    for root in roots:
+        for dirpath, dirnames, files in os.walk(root):
+            dirnames.sort()
+            out += [os.path.join(dirpath, f) for f in sorted(files) if f.endswith(".sha256")]
+    return out
+
+def audit(event: str, **fields):
+    os.makedirs(os.path.dirname(AUDIT_LOG), exist_ok=True)
+    with open(AUDIT_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "event": event, **fields}) + "\n")
+
+def sign(paths, manifest: Manifest = None, workers: int = 0) -> dict:
+    """Write <file>.sha256 next to each file; returns path -> digest."""
+    manifest = manifest or Manifest()
+    digests = manifest.digests(paths, workers)
+    for p, d in digests.items():
+        with open(p + ".sha256", "w", encoding="utf-8") as f:
+            f.write(d + "\n")
+        audit("sign", path=os.path.relpath(p), sha256=d)
+    manifest.save()
+    return digests
+
+def verify(roots, manifest: Manifest = None, workers: int = 0) -> list:
+    """[(sidecar, target, "OK" | "MISMATCH" | "MISSING")] for every sidecar under roots."""
+    manifest = manifest or Manifest()
+    pairs = [(s, sidecar_target(s)) for s in find_sidecars(roots)]
+    digests = manifest.digests([t for _, t in pairs if t], workers)
+    manifest.save()
+    out = []
+    for s, t in pairs:
+        if t is None:
+            out.append((s, None, "MISSING"))
+        else:
+            out.append((s, t, "OK" if digests[os.path.abspath(t)] == read_sidecar(s) else "MISMATCH"))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("sign", "verify", "hash"):
+        p = sub.add_parser(name)
+        p.add_argument("paths", nargs="*", default=["docs", "reports"] if name == "verify" else None)
+        p.add_argument("-j", "--workers", type=int, default=0)
+        p.add_argument("--manifest", default=MANIFEST)
+    a = ap.parse_args()
+    m = Manifest(a.manifest)
+    t0 = time.perf_counter()
+    rc = 0
+    if a.cmd == "verify":
+        for s, t, status in verify([p for p in a.paths if os.path.isdir(p)], m, a.workers):
+            print(f"{status:8} {s}" + (f" -> {t}" if t else ""))
+            rc |= status != "OK"
+    elif a.cmd == "sign":
+        for p, d in sign(a.paths, m, a.workers).items():
+            print(f"{d}  {os.path.relpath(p)}")
+    else:
+        for p, d in m.digests(a.paths, a.workers).items():
+            print(f"{d}  {os.path.relpath(p)}")
+        m.save()
+    print(f"hashed {m.hashed}, reused {m.reused}, {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+import csv, hashlib, io, json, pathlib
+from typing import Iterable, NamedTuple, Optional
+try:
+    from .schema_codegen import (IS_NUMBER, RUNTIME, TYPE_CHECKS, enum_error, load_module, pattern_error, range_error,
+                                 required_error, type_error, unique_error)
+except ImportError:  # imported as a top-level module, with services/common on sys.path
+    from schema_codegen import (IS_NUMBER, RUNTIME, TYPE_CHECKS, enum_error, load_module, pattern_error, range_error,
+                                required_error, type_error, unique_error)
+
+# Compiled input-taxonomy field index.
+#
+# docs/taxonomy/input_taxonomy_v1.csv (FieldPath, Type, AllowedValues, Unit,
+# Min, Max) and schemas/input_taxonomy_v1.json (required lists, array item
+# enums) are compiled once into generated Python: one getter per dotted path
+# (straight-line d["a"]["b"] indexing, or a list of element values for
+# "a.items[].name" paths) and a check(doc) that walks only the keys a profile
+# actually has, dispatching each to its field's type / enum / range / pattern /
+# uniqueItems tests, and checks the required keys and additionalProperties: false
+# of every object node (no JSON Schema pass; messages read like jsonschema's;
+# "format" is not asserted; keyword checks and runtime shared with
+# scripts/schema_fastpath.py via schema_codegen.py). The source is cached under
+# .cache/taxonomy_index/ keyed by the CSV + schema hash, so later processes just
+# import it. Projections pick out only the fields a consumer reads.
+#
+#   ix = load_index()
+#   ix.get(profile, "dietary_patterns.general")             -> "omnivore"
+#   ix.check(profile)                                       -> [(pointer, message)]
+#   ix.project(profile, GUARDRAIL_FIELDS)                   -> small nested dict
+
+ROOT = pathlib.Path(__file__).resolve().parents[2]
+CSV_PATH = ROOT / "docs" / "taxonomy" / "input_taxonomy_v1.csv"
+SCHEMA_PATH = ROOT / "schemas" / "input_taxonomy_v1.json"
+CACHE_DIR = ROOT / ".cache" / "taxonomy_index"
+GENERATOR_VERSION = "4"
+
+# Fields the guardrail oracle and the planners read (an object path takes its whole subtree)
+GUARDRAIL_FIELDS = (
+    "demographics_anthropometrics.life_stage", "demographics_anthropometrics.pregnancy_status",
+    "demographics_anthropometrics.pregnancy_trimester", "clinical_conditions", "medications", "allergens_intolerances",
+    "dietary_patterns.general", "dietary_patterns.metabolic_goal", "dietary_patterns.metabolic_targets",
+    "dietary_patterns.sodium_pattern", "dietary_patterns.alcohol_policy", "nutrition_targets",
+    "budget_stores_inventory.budget_usd_per_day", "budget_stores_inventory.budget_usd_per_week",
+    "budget_stores_inventory.primary_store", "budget_stores_inventory.cross_contamination_sensitivity",
+    "food_safety_compliance", "fitness_physical_ability.injuries_limitations",
+    "fitness_physical_ability.contraindications",
+)
+PLANNER_FIELDS = GUARDRAIL_FIELDS + (
+    "account_locale_consent.units", "account_locale_consent.timezone", "taste_ingredients_preferences",
+    "meal_logistics_household", "budget_stores_inventory.cost_preference", "budget_stores_inventory.store_location",
+    "budget_stores_inventory.pantry_inventory[].name", "budget_stores_inventory.pantry_inventory[].quantity",
+    "budget_stores_inventory.pantry_inventory[].unit", "budget_stores_inventory.pantry_inventory[].expiration_date",
+)
+
+class Field(NamedTuple):
+    path: str
+    type: str
+    enum: Optional[tuple]       # allowed values; for arrays, of each item
+    unit: Optional[str]
+    min: Optional[float]
+    max: Optional[float]
+    required: bool
+    items: Optional[str] = None  # item type of arrays
+    pattern: Optional[str] = None  # regex for strings; for arrays, of each item
+    unique: bool = False
+
+
+def _num(s):
+    if s in ("", None):
+        return None
+    f = float(s)
+    return int(f) if f.is_integer() else f
+
+def _schema_node(schema: dict, path: str):
+    node = schema; parent = None; name = None
+    for part in path.split("."):
+        name = part[:-2] if part.endswith("[]") else part
+        parent = node
+        node = node.get("properties", {}).get(name)
+        if node is None:
+            return None, False
+        if part.endswith("[]"):
+            parent = node; node = node.get("items", {})
+    return node, name in parent.get("required", ())
+
+def read_fields(csv_text: str, schema: dict) -> list:
+    out = []
+    for row in csv.DictReader(io.StringIO(csv_text)):
+        path = row["FieldPath"].strip()
+        node, required = _schema_node(schema, path)
+        node = node or {}
+        enum = row.get("AllowedValues") or ""
+        enum = tuple(enum.split("|")) if enum else node.get("enum") or node.get("items", {}).get("enum")
+        lo = _num(row.get("Min")); hi = _num(row.get("Max"))
+        items = node.get("items", {})
+        out.append(Field(path, row["Type"].strip(), tuple(enum) if enum else None, row.get("Unit") or None,
+                         lo if lo is not None else node.get("minimum"), hi if hi is not None else node.get("maximum"),
+                         required, items.get("type") if row["Type"].strip() == "array" else None,
+                         node.get("pattern") or items.get("pattern"), bool(node.get("uniqueItems"))))
+    return out
+
+def object_rules(schema: dict, fields: list) -> dict:
+    """Object node ("" = root, "a.b", "a.b[]" = its elements) -> (required keys, allowed keys or None)."""
+    out = {}
+    paths = [""] + [f.path for f in fields if f.type == "object"] + [f.path + "[]" for f in fields if f.type == "array"]
+    for path in paths:
+        node = schema if not path else _schema_node(schema, path)[0]
+        if not isinstance(node, dict) or "properties" not in node:
+            continue
+        req = tuple(node.get("required", ()))
+        allowed = tuple(node["properties"]) if node.get("additionalProperties", True) is False else None
+        if req or allowed is not None:
+            out[path] = (req, allowed)
+    return out
+
+
+# ----- Code generation -----
+def _index(keys) -> str:
+    return "".join(f"[{k!r}]" for k in keys)
+
+def _split(path: str):
+    """'a.b[].c.d' -> (['a', 'b'], ['c', 'd']); no [] -> (keys, None)."""
+    head, sep, tail = path.partition("[].")
+    if not sep:
+        return head.split("."), None
+    return head.split("."), tail.split(".")
+
+def _fail(check: tuple, ptr: str, ind: str) -> list:
+    cond, msg = check
+    return [f"{ind}if {cond}:", f"{ind}    errs.append(({ptr}, {msg}))"]
+
+def _object_checks(rule: tuple, name: str, x: str, ptr: str, ind: str) -> list:
+    """Required / additionalProperties lines for dict x, using constants R{name} / A{name}."""
+    req, allowed = rule; lines = []
+    if req:
+        lines += [f"{ind}for r in R{name}:"] + _fail(required_error(x, "r"), ptr, ind + "    ")
+    if allowed is not None:
+        lines += [f"{ind}m = _additional({x}, A{name})", f"{ind}if m:", f"{ind}    errs.append(({ptr}, m))"]
+    return lines
+
+def _rule_consts(rule: tuple, name: str) -> str:
+    req, allowed = rule
+    return f"R{name} = {req!r}" + (f"\nA{name} = frozenset({list(allowed)!r})" if allowed is not None else "")
+
+def _value_checks(f: Field, k: int, x: str, ptr: str, ind: str) -> list:
+    """Lines checking value x of field f (pointer expression ptr); enums are strings here (E{k} / L{k})."""
+    lines = _fail(type_error(x, [f.type]), ptr, ind)
+    if f.type == "array" and (f.enum or f.items in TYPE_CHECKS or f.pattern or f.unique):
+        item = []
+        if f.unique:
+            item += _fail(unique_error(x), ptr, ind + "    ")
+        if f.enum or f.items in TYPE_CHECKS or f.pattern:
+            item += [f"{ind}    for i, y in enumerate({x}):"]
+        iptr = f"{ptr} + '/' + str(i)"
+        if f.items in TYPE_CHECKS:
+            item += _fail(type_error("y", [f.items]), iptr, ind + "        ")
+        if f.enum:
+            item += _fail(enum_error("y", f"E{k}", f"L{k}"), iptr, ind + "        ")
+        if f.pattern:
+            item += _fail(pattern_error("y", f"P{k}", f"S{k}"), iptr, ind + "        ")
+        lines += [f"{ind}else:"] + item
+    else:
+        if f.enum:
+            lines += _fail(enum_error(x, f"E{k}", f"L{k}"), ptr, ind)
+        if f.pattern:
+            lines += _fail(pattern_error(x, f"P{k}", f"S{k}"), ptr, ind)
+    rng = []
+    if f.min is not None:
+        rng += _fail(range_error("minimum", x, f.min), ptr, ind + "    ")
+    if f.max is not None:
+        rng += _fail(range_error("maximum", x, f.max), ptr, ind + "    ")
+    if rng:
+        lines += [f"{ind}if {IS_NUMBER.format(x=x)}:"] + rng
+    return lines
+
+def generate_source(fields: list, rules: dict = None) -> str:
+    """Getters per path, plus check(): a walk over the keys actually present, dispatching to per-field checks.
+
+    rules: object_rules() of the schema; without it only type / enum / range are checked.
+    """
+    rules = rules or {}
+    consts = []; funcs = []; table = []; checks = []
+    ids = {f.path: k for k, f in enumerate(fields)}
+    children = {}  # parent path ("" = root, "a.b[]" = elements of a.b) -> {key: field id}
+    for k, f in enumerate(fields):
+        head, tail = _split(f.path)
+        if tail is None:
+            funcs.append(f"def get_{k}(d, default=None):\n    try:\n        return d{_index(head)}\n"
+                         f"    except (KeyError, TypeError, IndexError):\n        return default")
+        else:
+            funcs.append(f"def get_{k}(d, default=None):\n    try:\n        seq = d{_index(head)}\n"
+                         f"    except (KeyError, TypeError, IndexError):\n        return default\n"
+                         f"    if not isinstance(seq, list):\n        return default\n    out = []\n"
+                         f"    for e in seq:\n        try:\n            out.append(e{_index(tail)})\n"
+                         f"        except (KeyError, TypeError, IndexError):\n            pass\n    return out")
+        table.append(f"    {f.path!r}: get_{k},")
+        if f.enum:
+            consts.append(f"L{k} = {list(f.enum)!r}\nE{k} = frozenset(L{k})")
+        if f.pattern:
+            consts.append(f"S{k} = {f.pattern!r}\nP{k} = re.compile(S{k})")
+        parent, _, key = f.path.rpartition(".")  # 'a.b[].c' -> ('a.b[]', 'c'); 'a' -> ('', 'a')
+        children.setdefault(parent, {})[key] = k
+    for k, f in enumerate(fields):
+        if f.type not in TYPE_CHECKS:
+            continue
+        body = _value_checks(f, k, "v", "p", "    ")
+        if f.path in children or f.path in rules:
+            body += ["    if isinstance(v, dict):"]
+            if f.path in rules:
+                consts.append(_rule_consts(rules[f.path], str(k)))
+                body += _object_checks(rules[f.path], str(k), "v", "p", "        ")
+            if f.path in children:
+                body += ["        for key, x in v.items():", f"            fn = D{k}.get(key)",
+                         "            if fn is not None:", "                fn(x, p + '/' + key, errs)"]
+        el = f.path + "[]"
+        if el in children or el in rules:
+            body += ["    if isinstance(v, list):", "        for j, e in enumerate(v):", "            if isinstance(e, dict):"]
+            if el in rules:
+                consts.append(_rule_consts(rules[el], f"E_{k}"))
+                body += _object_checks(rules[el], f"E_{k}", "e", "p + '/' + str(j)", "                ")
+            if el in children:
+                body += ["                for key, x in e.items():", f"                    fn = DE{k}.get(key)",
+                         "                    if fn is not None:", "                        fn(x, p + '/' + str(j) + '/' + key, errs)"]
+        checks.append(f"def check_{k}(v, p, errs):\n" + "\n".join(body))
+    dispatch = []
+    for parent, keys in children.items():
+        name = "D_ROOT" if not parent else (f"DE{ids[parent[:-2]]}" if parent.endswith("[]") else f"D{ids[parent]}")
+        dispatch.append(f"{name} = {{" + ", ".join(f"{key!r}: check_{k}" for key, k in keys.items()
+                                                   if fields[k].type in TYPE_CHECKS) + "}")
+    root = ""
+    if "" in rules:
+        consts.append(_rule_consts(rules[""], "_ROOT"))
+        root = "\n".join(_object_checks(rules[""], "_ROOT", "d", "''", "        ")) + "\n"
+    return ("# generated by services/common/taxonomy.py — do not edit\n\n" + RUNTIME + "\n\n"
+            + f"FIELDS = {[tuple(f) for f in fields]!r}\n" + "\n".join(consts) + "\n\n\n"
+            + "\n\n".join(funcs) + "\n\n\nGETTERS = {\n" + "\n".join(table) + "\n}\n\n\n"
+            + "\n\n".join(checks) + "\n\n\n" + "\n".join(dispatch) + "\n\n\n"
+            + "def check(d):\n    errs = []\n    if isinstance(d, dict):\n" + root + "        for key, x in d.items():\n"
+            + "            fn = D_ROOT.get(key)\n            if fn is not None:\n                fn(x, '/' + key, errs)\n"
+            + "    return errs\n")
+
+
+# ----- Index -----
+def _projector(tree: dict):
+    """tree: {key: None (take whole value) | subtree}; keys ending in [] map over list elements."""
+    parts = []
+    for key, sub in tree.items():
+        if key.endswith("[]"):
+            parts.append((key[:-2], True, _projector(sub)))
+        else:
+            parts.append((key, False, _projector(sub) if sub else None))
+
+    def project(node):
+        out = {}
+        for key, each, fn in parts:
+            try:
+                v = node[key]
+            except (KeyError, TypeError):
+                continue
+            if each:
+                if isinstance(v, list):
+                    out[key] = [fn(e) for e in v if isinstance(e, dict)]
+            elif fn is None:
+                out[key] = v
+            elif isinstance(v, dict):
+                sub = fn(v)
+                if sub:
+                    out[key] = sub
+        return out
+    return project
+
+
+class TaxonomyIndex:
+    def __init__(self, fields: list, module, digest: str):
+        self.fields = {f.path: f for f in fields}
+        self.getters = module.GETTERS
+        self.check = module.check   # check(doc) -> [(pointer, message)]: type/enum/range, required, additionalProperties
+        self.digest = digest
+        self._projectors = {}
+
+    def getter(self, path: str):
+        """The compiled getter for a dotted path: fn(doc, default=None)."""
+        try:
+            return self.getters[path]
+        except KeyError:
+            raise KeyError(f"unknown taxonomy field {path!r}") from None
+
+    def get(self, doc: dict, path: str, default=None):
+        return self.getter(path)(doc, default)
+
+    def projector(self, paths: Iterable[str]):
+        """fn(doc) -> nested dict holding only these fields (memoized per field set)."""
+        key = tuple(paths)
+        fn = self._projectors.get(key)
+        if fn is None:
+            tree = {}
+            for path in key:
+                if path not in self.fields:
+                    raise KeyError(f"unknown taxonomy field {path!r}")
+                node = tree
+                parts = path.replace("[].", "[]\0").replace(".", "\0").split("\0")
+                for part in parts[:-1]:
+                    if node.get(part, {}) is None:  # an ancestor is already taken whole
+                        break
+                    node = node.setdefault(part, {})
+                else:
+                    node[parts[-1]] = None
+            fn = self._projectors[key] = _projector(tree)
+        return fn
+
+    def project(self, doc: dict, paths: Iterable[str] = GUARDRAIL_FIELDS) -> dict:
+        return self.projector(paths)(doc)
+
+
+_LOADED = {}
+
+def load_index(csv_path=CSV_PATH, schema_path=SCHEMA_PATH, cache_dir=CACHE_DIR) -> TaxonomyIndex:
+    """Compiled index for the CSV + schema; generated code is cached on disk by their hash."""
+    csv_raw = pathlib.Path(csv_path).read_bytes(); schema_raw = pathlib.Path(schema_path).read_bytes()
+    h = hashlib.sha256(GENERATOR_VERSION.encode("utf-8"))
+    for raw in (csv_raw, schema_raw):
+        h.update(b"\0" + hashlib.sha256(raw).digest())
+    digest = h.hexdigest()
+    ix = _LOADED.get(digest)
+    if ix is not None:
+        return ix
+
+    def source():
+        schema = json.loads(schema_raw.decode("utf-8"))
+        fields = read_fields(csv_raw.decode("utf-8-sig"), schema)
+        return generate_source(fields, object_rules(schema, fields))
+    mod = load_module(pathlib.Path(cache_dir) / f"t_{digest[:32]}.py", source)
+    ix = _LOADED[digest] = TaxonomyIndex([Field(*f) for f in mod.FIELDS], mod, digest)
+    return ix
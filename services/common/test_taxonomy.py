@@ -0,0 +1,18 @@
+import json, pathlib, sys
+
+from services.common import taxonomy
+
+ROOT = pathlib.Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "scripts"))
+import schema_fastpath
+
+
+def test_check_agrees_with_schema_fastpath_on_additional_properties(tmp_path):
+    doc = json.loads((ROOT / "sample_profile.json").read_text())
+    ix = taxonomy.load_index(cache_dir=tmp_path)
+    fast = schema_fastpath.load_validator(taxonomy.SCHEMA_PATH, tmp_path)
+    assert ix.check(doc) == [] == fast(doc)
+    doc["zz"] = 1; doc["aa"] = 2
+    got = ix.check(doc)
+    assert got == [("", "Additional properties are not allowed ('aa', 'zz' were unexpected)")]
+    assert sorted(fast(doc)) == got
@@ -0,0 +1,273 @@
+import atexit, json, math, os, runpy, sys, threading, time
+from array import array
+from collections import Counter
+from functools import wraps
+
+# Opt-in span timing, counters and a sampling profiler for the hot paths.
+#
+# Off by default: span() hands back one shared no-op context manager, traced()
+# leaves the function undecorated and count() returns after a single global
+# check, so instrumented code costs next to nothing. traced() decides at
+# import time: an enable() made after a module is imported only covers its
+# span()/count() calls. When enabled (KAIZEN_TRACE=1, `tracing.py run`, or
+# enable()), every span becomes a Chrome trace "complete" event and its
+# duration goes into a per-name series; at exit (or on dump()) the process writes
+#   reports/trace/trace_<pid>_<ts>.json           chrome://tracing / Perfetto
+#   reports/trace/trace_<pid>_<ts>_summary.json   counters + per-span histograms (p50/p95/p99, log2 buckets)
+# and, with the sampling profiler on (KAIZEN_PROFILE=1 / --profile), a folded
+# stack file (flamegraph.pl, speedscope) with the top frames in the summary.
+#
+#   KAIZEN_TRACE=1 python models/eval_guardrails.py --batch-size 4
+#   python services/common/tracing.py run --profile scripts/perf_smoke.py --repeat 50
+#   python services/common/tracing.py report reports/trace/trace_1234_20251018T101500.json
+#
+#   from services.common import tracing
+#   with tracing.span("eval.oracle", test=i): ...
+#   tracing.count("eval.repair_fallbacks")
+
+OUT_DIR = os.environ.get("KAIZEN_TRACE_DIR", "reports/trace")
+MAX_EVENTS = 500_000          # Chrome events kept per process; durations are aggregated past it
+SAMPLE_INTERVAL_S = 0.005
+TOP_FRAMES = 25
+
+ENABLED = False
+_events = []                  # (name, start_ns, dur_ns, tid, args)
+_durations = {}               # name -> array('q') of ns
+_counters = Counter()
+_dropped = 0
+_t0_ns = time.perf_counter_ns()
+_sampler = None
+_atexit = False
+
+
+# ----- Spans + counters -----
+class _Noop:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NOOP = _Noop()
+
+def record(name: str, start_ns: int, end_ns: int, **args):
+    """Add a finished span measured elsewhere (perf_counter_ns clock)."""
+    global _dropped
+    dur = end_ns - start_ns
+    d = _durations.get(name)
+    if d is None:
+        d = _durations.setdefault(name, array("q"))
+    d.append(dur)
+    if len(_events) < MAX_EVENTS:
+        _events.append((name, start_ns, dur, threading.get_ident(), args))
+    else:
+        _dropped += 1
+
+class _Span:
+    __slots__ = ("name", "args", "t0")
+
+    def __init__(self, name, args):
+        self.name = name; self.args = args
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        record(self.name, self.t0, time.perf_counter_ns(), **self.args)
+        return False
+
+def span(name: str, **args):
+    """Context manager timing the block under name (no-op unless tracing is enabled)."""
+    return _Span(name, args) if ENABLED else _NOOP
+
+def traced(name: str):
+    """Decorator form of span(). Disabled at decoration time, it returns fn itself (zero overhead),
+    so enable tracing (KAIZEN_TRACE=1 / `tracing.py run`) before the instrumented module is imported."""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        @wraps(fn)
+        def wrapper(*a, **kw):
+            if not ENABLED:  # disable() after import
+                return fn(*a, **kw)
+            t0 = time.perf_counter_ns()
+            try:
+                return fn(*a, **kw)
+            finally:
+                record(name, t0, time.perf_counter_ns())
+        return wrapper
+    return deco
+
+def count(name: str, n: int = 1):
+    if ENABLED:
+        _counters[name] += n
+
+
+# ----- Sampling profiler -----
+class Sampler(threading.Thread):
+    """Samples every other thread's Python stack at a fixed interval into folded-stack counts."""
+
+    def __init__(self, interval_s: float = SAMPLE_INTERVAL_S):
+        super().__init__(name="tracing-sampler", daemon=True)
+        self.interval_s = interval_s
+        self.stacks = Counter(); self.samples = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._halt.wait(self.interval_s):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    co = frame.f_code
+                    stack.append(f"{co.co_name} ({os.path.basename(co.co_filename)}:{co.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+    def top(self, n: int = TOP_FRAMES) -> dict:
+        """Frames by self (leaf) and total (anywhere on the stack) sample counts."""
+        own = Counter(); total = Counter()
+        for stack, c in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += c
+            for f in set(frames):
+                total[f] += c
+        return {"self": own.most_common(n), "total": total.most_common(n)}
+
+
+# ----- Enable / dump -----
+def enable(profile: bool = False, interval_s: float = SAMPLE_INTERVAL_S):
+    """Start recording (and sampling, with profile=True); results are dumped at exit."""
+    global ENABLED, _sampler, _atexit
+    ENABLED = True
+    if profile and _sampler is None:
+        _sampler = Sampler(interval_s); _sampler.start()
+    if not _atexit:
+        atexit.register(dump); _atexit = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    global _dropped, _t0_ns
+    _events.clear(); _durations.clear(); _counters.clear(); _dropped = 0
+    _t0_ns = time.perf_counter_ns()
+
+def percentile(sorted_vals, q: float) -> float:
+    """Nearest-rank percentile (same definition as scripts/perf_smoke.py)."""
+    return sorted_vals[max(0, math.ceil(q / 100 * len(sorted_vals)) - 1)]
+
+def histogram(durations_ns) -> dict:
+    vals = sorted(durations_ns)
+    ms = lambda ns: round(ns / 1e6, 4)
+    buckets = Counter(max(0, int(v).bit_length() - 1) for v in vals)  # floor(log2 ns)
+    return {"count": len(vals), "total_ms": ms(sum(vals)), "mean_ms": ms(sum(vals) / len(vals)),
+            "min_ms": ms(vals[0]), "p50_ms": ms(percentile(vals, 50)), "p95_ms": ms(percentile(vals, 95)),
+            "p99_ms": ms(percentile(vals, 99)), "max_ms": ms(vals[-1]),
+            "log2_ns_buckets": {str(1 << b): buckets[b] for b in sorted(buckets)}}
+
+def summary() -> dict:
+    spans = {name: histogram(d) for name, d in sorted(_durations.items()) if len(d)}
+    out = {"pid": os.getpid(), "argv": sys.argv, "wall_s": round((time.perf_counter_ns() - _t0_ns) / 1e9, 3),
+           "counters": dict(sorted(_counters.items())), "spans": spans, "dropped_events": _dropped}
+    if _sampler is not None:
+        out["profile"] = {"interval_ms": _sampler.interval_s * 1e3, "samples": _sampler.samples, **_sampler.top()}
+    return out
+
+def chrome_trace() -> dict:
+    pid = os.getpid()
+    events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": " ".join(sys.argv) or "python"}}]
+    for name, start, dur, tid, args in _events:
+        events.append({"name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": pid, "tid": tid,
+                       "ts": (start - _t0_ns) / 1e3, "dur": dur / 1e3, "args": args})
+    ts = (time.perf_counter_ns() - _t0_ns) / 1e3
+    for name, v in sorted(_counters.items()):
+        events.append({"name": name, "ph": "C", "pid": pid, "tid": 0, "ts": ts, "args": {"value": v}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def dump(out_dir: str = None) -> dict:
+    """Write trace, summary (and folded stacks); returns {kind: path}. Nothing is written if nothing was recorded."""
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop()
+    if not _durations and not _counters and not (_sampler and _sampler.samples):
+        _sampler = None
+        return {}
+    out_dir = out_dir or OUT_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, f"trace_{os.getpid()}_{time.strftime('%Y%m%dT%H%M%S')}")
+    paths = {"trace": stem + ".json", "summary": stem + "_summary.json"}
+    with open(paths["trace"], "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(), f, default=str)
+    with open(paths["summary"], "w", encoding="utf-8") as f:
+        json.dump(summary(), f, indent=2, default=str)
+    if _sampler is not None:
+        paths["folded"] = stem + ".folded"
+        with open(paths["folded"], "w", encoding="utf-8") as f:
+            f.writelines(f"{s} {c}\n" for s, c in _sampler.stacks.most_common())
+    _sampler = None
+    reset()
+    print(f"[tracing] wrote {', '.join(paths.values())}", file=sys.stderr)
+    return paths
+
+def print_report(rep: dict, out=sys.stdout):
+    spans = sorted(rep.get("spans", {}).items(), key=lambda kv: -kv[1]["total_ms"])
+    print(f"{'span':34} {'count':>8} {'total_ms':>11} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'max_ms':>9}", file=out)
+    for name, h in spans:
+        print(f"{name:34} {h['count']:8} {h['total_ms']:11.2f} {h['p50_ms']:9.3f} {h['p95_ms']:9.3f} "
+              f"{h['p99_ms']:9.3f} {h['max_ms']:9.3f}", file=out)
+    for name, v in rep.get("counters", {}).items():
+        print(f"{name:34} {v:8}", file=out)
+    prof = rep.get("profile")
+    if prof:
+        print(f"\nprofile: {prof['samples']} samples every {prof['interval_ms']:g} ms; top self frames", file=out)
+        for frame, c in prof["self"][:10]:
+            print(f"{c:8}  {frame}", file=out)
+
+if os.environ.get("KAIZEN_TRACE") == "1" or os.environ.get("KAIZEN_PROFILE") == "1":
+    enable(profile=os.environ.get("KAIZEN_PROFILE") == "1")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run a script with tracing enabled")
+    r.add_argument("--profile", action="store_true", help="also run the sampling profiler")
+    r.add_argument("--interval-ms", type=float, default=SAMPLE_INTERVAL_S * 1e3)
+    r.add_argument("script"); r.add_argument("args", nargs=argparse.REMAINDER)
+    p = sub.add_parser("report", help="histograms from a trace (or its _summary.json)")
+    p.add_argument("path")
+    a = ap.parse_args()
+    if a.cmd == "report":
+        with open(a.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "traceEvents" in data:  # rebuild the aggregate from complete events
+            series = {}; counters = {}
+            for e in data["traceEvents"]:
+                if e.get("ph") == "X":
+                    series.setdefault(e["name"], []).append(round(e["dur"] * 1e3))
+                elif e.get("ph") == "C":
+                    counters[e["name"]] = e["args"]["value"]
+            data = {"spans": {n: histogram(d) for n, d in series.items()}, "counters": counters}
+        print_report(data)
+    else:
+        # the script must see this module (and its state) under the name it imports
+        sys.path[0] = os.path.dirname(os.path.abspath(a.script))
+        sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        from services.common import tracing
+        tracing.enable(profile=a.profile, interval_s=a.interval_ms / 1e3)
+        sys.argv = [a.script] + a.args
+        try:
+            runpy.run_path(a.script, run_name="__main__")
+        finally:
+            print_report(tracing.summary(), out=sys.stderr)
@@ -1,8 +1,171 @@
-import argparse, json, pathlib
+import argparse, hashlib, json, os, pathlib, re, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+# Cookbook compiler.
+#
+#   python services/cookbook/build.py --user u123 --out out/u123.txt
+#   python services/cookbook/build.py --batch users.ndjson --out-dir out/cookbooks -j 8
+#
+# Batch input is one user id or one JSON plan document ({"user_id": ..., ...}) per
+# line ('-' reads stdin); when a user id appears more than once the last line wins.
+# Output files are <sanitized id>-<sha256(id)[:8]>.txt, so ids that sanitize alike
+# ("a/b", "a_b") do not collide. Workers load the templates once and write each cookbook
+# as soon as it is rendered; a plan whose content hash (plan + templates) matches
+# the manifest entry and whose output still exists is skipped. The manifest
+# (<out-dir>/manifest.json) is rewritten every --flush-every cookbooks.
+
+TEMPLATE = "Cookbook for user {user_id}\n(placeholder){body}"
+MANIFEST = "manifest.json"
+
 def build(user_id: str, out: str):
     p=pathlib.Path(out); p.parent.mkdir(parents=True, exist_ok=True)
     p.write_text(f"Cookbook for user {user_id}\\n(placeholder)", encoding="utf-8")
     print("Wrote", p)
+
+
+# ----- Batch -----
+_assets = None
+
+def load_assets(template_dir: str = None) -> dict:
+    """Templates (and, once the PDF renderer lands, fonts) shared by every cookbook a worker renders."""
+    template = TEMPLATE
+    if template_dir:
+        template = (pathlib.Path(template_dir) / "cookbook.txt").read_text(encoding="utf-8")
+    return {"template": template, "sha256": hashlib.sha256(template.encode("utf-8")).hexdigest()}
+
+def _init(template_dir):
+    global _assets
+    _assets = load_assets(template_dir)
+
+def parse_line(line: str) -> dict:
+    line = line.strip()
+    return json.loads(line) if line.startswith("{") else {"user_id": line}
+
+def output_name(uid: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", uid) + "-" + hashlib.sha256(uid.encode("utf-8")).hexdigest()[:8] + ".txt"
+
+def plan_hash(doc: dict, assets: dict) -> str:
+    h = hashlib.sha256(assets["sha256"].encode("utf-8"))
+    h.update(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+def render(doc: dict, assets: dict) -> str:
+    recipes = doc.get("recipes") or doc.get("meal_day", {}).get("recipes") or []
+    body = "".join(f"\n- {r.get('name', 'recipe') if isinstance(r, dict) else r}" for r in recipes)
+    return assets["template"].format(user_id=doc["user_id"], body=body)
+
+def compile_one(task):
+    """Render and write one cookbook (worker side); returns its manifest entry."""
+    doc, path, digest = task
+    text = render(doc, _assets)
+    p = pathlib.Path(path); p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, p)
+    return str(doc["user_id"]), {"sha256": digest, "path": str(p), "bytes": len(text.encode("utf-8"))}
+
+def compile_many(tasks: list) -> list:
+    """compile_one over a chunk; a failing cookbook yields (user_id, None, error) instead of aborting the chunk."""
+    out = []
+    for task in tasks:
+        try:
+            out.append(compile_one(task) + (None,))
+        except Exception as e:
+            out.append((str(task[0].get("user_id")), None, f"{type(e).__name__}: {e}"))
+    return out
+
+def write_manifest(out_dir: pathlib.Path, manifest: dict):
+    tmp = out_dir / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, out_dir / MANIFEST)
+
+def build_batch(lines, out_dir: str, jobs: int = 1, template_dir: str = None, force: bool = False,
+                flush_every: int = 500) -> dict:
+    out = pathlib.Path(out_dir); out.mkdir(parents=True, exist_ok=True)
+    try:
+        manifest = json.loads((out / MANIFEST).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    assets = load_assets(template_dir)  # hashing needs the template digest in the main process too
+    stats = {"built": 0, "skipped": 0, "failed": 0, "duplicates": 0}
+    t0 = time.perf_counter()
+
+    def latest():
+        """Last document per user id: two tasks for one id would race on the same output file."""
+        docs = {}
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                doc = parse_line(line); uid = str(doc["user_id"])
+            except (ValueError, KeyError, TypeError) as e:
+                stats["failed"] += 1
+                print(f"bad input line {line.strip()[:80]!r}: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            if uid in docs:
+                stats["duplicates"] += 1
+            docs[uid] = doc
+        return docs
+
+    def tasks():
+        for uid, doc in latest().items():
+            digest = plan_hash(doc, assets)
+            prev = manifest.get(uid)
+            if not force and prev and prev["sha256"] == digest and os.path.exists(prev["path"]):
+                stats["skipped"] += 1
+                continue
+            yield doc, str(out / output_name(uid)), digest
+
+    def done(results):
+        for uid, entry, err in results:
+            if err:
+                stats["failed"] += 1
+                print(f"cookbook {uid}: {err}", file=sys.stderr)
+                continue
+            manifest[uid] = entry; stats["built"] += 1
+            if stats["built"] % flush_every == 0:
+                write_manifest(out, manifest)
+
+    def chunks(size=32):
+        chunk = []
+        for task in tasks():
+            chunk.append(task)
+            if len(chunk) >= size:
+                yield chunk; chunk = []
+        if chunk:
+            yield chunk
+
+    if jobs <= 1:
+        _init(template_dir)
+        for chunk in chunks():
+            done(compile_many(chunk))
+    else:
+        with ProcessPoolExecutor(jobs, initializer=_init, initargs=(template_dir,)) as pool:
+            inflight = []
+            for chunk in chunks():
+                inflight.append(pool.submit(compile_many, chunk))
+                if len(inflight) >= 2 * jobs:  # bounded number of chunks in flight
+                    done(inflight.pop(0).result())
+            for fut in inflight:
+                done(fut.result())
+    write_manifest(out, manifest)
+    stats["wall_s"] = round(time.perf_counter() - t0, 3)
+    stats["per_s"] = round((stats["built"] + stats["skipped"]) / stats["wall_s"], 1) if stats["wall_s"] else 0.0
+    return stats
+
+
 if __name__=="__main__":
-    ap=argparse.ArgumentParser(); ap.add_argument("--user", required=True); ap.add_argument("--out", required=True)
-    a=ap.parse_args(); build(a.user, a.out)
+    ap=argparse.ArgumentParser(); ap.add_argument("--user"); ap.add_argument("--out")
+    ap.add_argument("--batch", help="file of user ids / JSON plans, one per line, or - for stdin")
+    ap.add_argument("--out-dir", default="out/cookbooks"); ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--templates", help="directory with cookbook.txt"); ap.add_argument("--force", action="store_true")
+    ap.add_argument("--flush-every", type=int, default=500)
+    a=ap.parse_args()
+    if a.batch:
+        src = sys.stdin if a.batch == "-" else open(a.batch, "r", encoding="utf-8")
+        with src:
+            print(json.dumps(build_batch(src, a.out_dir, a.jobs, a.templates, a.force, a.flush_every)))
+    elif a.user and a.out:
+        build(a.user, a.out)
+    else:
+        ap.error("--user and --out, or --batch")
@@ -0,0 +1,217 @@
+import asyncio, json, os, threading, time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import asdict
+from types import ModuleType
+from typing import Dict, Optional
+from ..common import tracing
+from .common import Item, build_cart
+
+# Shared TTL + LRU cache in front of the store adapters.
+#
+# Entries are keyed by (kind, store, location, query or sku) and expire after the
+# store's TTL; past max_entries the least recently used entry is dropped.
+# Concurrent misses for one key share a single upstream call, from threads
+# (get_or_fetch) as well as coroutines (aget_or_fetch). With a path, entries are
+# saved as JSON on save() and loaded on start, so a restart begins warm.
+#
+#   cache = InventoryCache(ttl_s={"costco": 6 * 3600}, path=".cache/inventory/cache.json")
+#   walmart = CachedAdapter(walmart_module, cache)          # sync modules
+#   store = CachedStore(HttpStore("walmart", url), cache)   # fanout stores
+
+CACHE_PATH = ".cache/inventory/cache.json"
+DEFAULT_TTL_S = 15 * 60
+
+
+def _encode(value):
+    if isinstance(value, list):
+        return {"items": [asdict(i) for i in value]}
+    return {"value": value}
+
+def _decode(data):
+    return [Item(**d) for d in data["items"]] if "items" in data else data["value"]
+
+
+class InventoryCache:
+    def __init__(self, ttl_s: Optional[Dict[str, float]] = None, default_ttl_s: float = DEFAULT_TTL_S,
+                 max_entries: int = 50_000, path: Optional[str] = None):
+        self.ttl_s = dict(ttl_s or {}); self.default_ttl_s = default_ttl_s
+        self.max_entries = max_entries; self.path = path
+        self._data = OrderedDict()  # key -> (expires_at wall clock, value)
+        self._lock = threading.Lock()
+        self._inflight = {}        # key -> concurrent Future (threads)
+        self._ainflight = {}       # (loop, key) -> asyncio Future
+        self.hits = 0; self.misses = 0; self.coalesced = 0; self.expired = 0; self.evictions = 0
+        self.upstream_ms = deque(maxlen=4096)
+        if path and os.path.exists(path):
+            self.load()
+
+    # ----- entries -----
+    def _lookup(self, key):
+        """Cached value or None; counts the hit/expiry. Caller holds the lock."""
+        e = self._data.get(key)
+        if e is None:
+            return None
+        if e[0] <= time.time():
+            del self._data[key]; self.expired += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return e
+
+    def _store(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl_s.get(key[1], self.default_ttl_s), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False); self.evictions += 1
+
+    def _timed(self, fetch, *args):
+        t0 = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self.upstream_ms.append((time.perf_counter() - t0) * 1e3)
+
+    def get_or_fetch(self, kind: str, store: str, location: str, arg: str, fetch):
+        """Cached value, else fetch(arg, location); threads missing the same key wait for one call."""
+        key = (kind, store, location, arg)
+        with self._lock:
+            e = self._lookup(key)
+            if e is not None:
+                tracing.count("inventory.cache_hits")
+                return e[1]
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = self._inflight[key] = Future(); self.misses += 1
+            else:
+                self.coalesced += 1
+        tracing.count("inventory.cache_misses" if owner else "inventory.cache_coalesced")
+        if not owner:
+            return fut.result()
+        try:
+            with tracing.span("inventory.adapter", kind=kind, store=store):
+                value = self._timed(fetch, arg, location)
+        except BaseException as ex:
+            fut.set_exception(ex)
+            raise
+        else:
+            self._store(key, value); fut.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_fetch(self, kind: str, store: str, location: str, arg: str, fetch):
+        """Async variant; fetch(arg, location) is a coroutine function."""
+        key = (kind, store, location, arg)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            e = self._lookup(key)
+            if e is not None:
+                tracing.count("inventory.cache_hits")
+                return e[1]
+            fut = self._ainflight.get((loop, key))
+            owner = fut is None
+            if owner:
+                fut = self._ainflight[(loop, key)] = loop.create_future(); self.misses += 1
+            else:
+                self.coalesced += 1
+        tracing.count("inventory.cache_misses" if owner else "inventory.cache_coalesced")
+        if not owner:
+            return await asyncio.shield(fut)
+        t0 = time.perf_counter()
+        try:
+            with tracing.span("inventory.adapter", kind=kind, store=store):
+                value = await fetch(arg, location)
+        except asyncio.CancelledError:
+            # the owner timed out or was cancelled; waiters see a timeout rather than a cancellation
+            fut.set_exception(asyncio.TimeoutError("upstream call cancelled")); fut.exception()
+            raise
+        except BaseException as ex:
+            fut.set_exception(ex); fut.exception()  # mark retrieved when nobody else waits
+            raise
+        else:
+            self._store(key, value); fut.set_result(value)
+            return value
+        finally:
+            self.upstream_ms.append((time.perf_counter() - t0) * 1e3)
+            with self._lock:
+                self._ainflight.pop((loop, key), None)
+
+    def invalidate(self, store: Optional[str] = None):
+        with self._lock:
+            for key in [k for k in self._data if store is None or k[1] == store]:
+                del self._data[key]
+
+    # ----- persistence -----
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        now = time.time()
+        with self._lock:
+            rows = [[list(k), exp, _encode(v)] for k, (exp, v) in self._data.items() if exp > now]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        os.replace(tmp, path)
+
+    def load(self, path: Optional[str] = None):
+        path = path or self.path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            for k, exp, data in rows:  # saved in LRU order
+                if exp > now:
+                    self._data[tuple(k)] = (exp, _decode(data))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    # ----- counters -----
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        lat = sorted(self.upstream_ms)
+        pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 2) if lat else None
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "expired": self.expired, "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "upstream_calls": len(lat), "upstream_p50_ms": pct(0.5), "upstream_p95_ms": pct(0.95)}
+
+
+class CachedAdapter:
+    """Sync adapter module (costco, walmart, instacart) behind an InventoryCache."""
+
+    def __init__(self, module: ModuleType, cache: InventoryCache, name: str = None):
+        self.module = module; self.cache = cache
+        self.name = name or module.__name__.split(".")[-1]
+
+    def search_items(self, query: str, location: str):
+        return self.cache.get_or_fetch("search", self.name, location, query, self.module.search_items)
+
+    def get_price(self, sku: str, location: str):
+        return self.cache.get_or_fetch("price", self.name, location, sku, self.module.get_price)
+
+    def build_demo_cart(self, q: str, loc: str):
+        return build_cart(self.search_items(q, loc))
+
+
+class CachedStore:
+    """fanout store (HttpStore / ModuleStore) behind an InventoryCache; same async interface."""
+
+    def __init__(self, store, cache: InventoryCache):
+        self.store = store; self.cache = cache
+        self.name = store.name; self.timeout_s = store.timeout_s
+
+    async def search_items(self, query: str, location: str):
+        return await self.cache.aget_or_fetch("search", self.name, location, query, self.store.search_items)
+
+    async def get_price(self, sku: str, location: str):
+        return await self.cache.aget_or_fetch("price", self.name, location, sku, self.store.get_price)
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,235 @@
+import asyncio, contextvars, json, time
+from types import ModuleType
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+from ..common import tracing
+from .common import Item
+
+# Async inventory layer: every (store, ingredient) search runs concurrently.
+#
+# Each store gets its own concurrency limit and, for HTTP stores, a pool of
+# keep-alive connections (stdlib asyncio streams, no client dependency). A call
+# that errors or exceeds its timeout is recorded and skipped, so a cart can be
+# built from whichever stores answered. The timeout starts once the call holds
+# a connection (or concurrency slot): time queued behind the store's own limit
+# is reported as wait_ms, not counted against the store.
+#
+#   stores = [ModuleStore(costco), HttpStore("walmart", "http://127.0.0.1:8801")]
+#   out = search_all(stores, ["onion", "lentils"], "94107")
+#   out["results"]["onion"]["walmart"] -> [Item, ...];  out["errors"] -> [...]
+
+
+class StoreError(Exception):
+    pass
+
+
+class _Pool:
+    """Idle keep-alive connections to one host; callers hold one of `slots` (at most `size` open at a time)."""
+
+    def __init__(self, host: str, port: int, size: int):
+        self.host = host; self.port = port
+        self.idle = []
+        self.slots = asyncio.Semaphore(size)
+        self.opened = 0
+
+    async def acquire(self):
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self.opened += 1
+        return reader, writer, False
+
+    def release(self, conn, reuse: bool):
+        reader, writer = conn
+        if reuse and not writer.is_closing():
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+async def _http_get(reader, writer, host: str, target: str):
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status = (await reader.readuntil(b"\r\n")).split(b" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        if line == b"\r\n":
+            break
+        k, _, v = line.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return int(status[1]), headers, body
+
+
+class HttpStore:
+    """Store adapter backed by an HTTP API: GET /search?q=&location= and /price?sku=&location=."""
+
+    def __init__(self, name: str, base_url: str, max_connections: int = 8, timeout_s: float = 2.0):
+        u = urlsplit(base_url)
+        self.name = name; self.host = u.hostname; self.port = u.port or 80
+        self.prefix = u.path.rstrip("/")
+        self.max_connections = max_connections; self.timeout_s = timeout_s
+        self._pools = {}  # one pool per event loop
+
+    def _pool(self) -> _Pool:
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = self._pools[loop] = _Pool(self.host, self.port, self.max_connections)
+        return pool
+
+    async def _get(self, path: str, params: dict):
+        pool = self._pool()
+        target = f"{self.prefix}{path}?{urlencode(params)}"
+        t0 = time.perf_counter()
+        async with pool.slots:
+            _waited(self.name, time.perf_counter() - t0)
+            return await asyncio.wait_for(self._request(pool, target), self.timeout_s)
+
+    async def _request(self, pool: _Pool, target: str):
+        for attempt in (0, 1):
+            reader, writer, reused = await pool.acquire()
+            ok = False
+            try:
+                status, headers, body = await _http_get(reader, writer, self.host, target)
+                ok = headers.get("connection", "").lower() != "close"
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # the server may drop an idle keep-alive connection; retry once on a fresh one
+                if reused and attempt == 0:
+                    continue
+                raise StoreError(f"{self.name}: connection lost")
+            finally:
+                pool.release((reader, writer), ok)
+            if status != 200:
+                raise StoreError(f"{self.name}: HTTP {status}")
+            return json.loads(body)
+
+    async def search_items(self, query: str, location: str) -> List[Item]:
+        data = await self._get("/search", {"q": query, "location": location})
+        return [Item(**d) for d in data["items"]]
+
+    async def get_price(self, sku: str, location: str) -> float:
+        return float((await self._get("/price", {"sku": sku, "location": location}))["price_usd"])
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
+
+class ModuleStore:
+    """Wraps a synchronous adapter module (costco, walmart, instacart) for the async layer."""
+
+    def __init__(self, module: ModuleType, max_concurrency: int = 4, timeout_s: float = 2.0, name: str = None):
+        self.module = module; self.name = name or module.__name__.split(".")[-1]
+        self.max_concurrency = max_concurrency; self.timeout_s = timeout_s
+        self._limits = {}
+
+    def _limit(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._limits:
+            self._limits[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._limits[loop]
+
+    async def _call(self, fn, *args):
+        t0 = time.perf_counter()
+        async with self._limit():
+            _waited(self.name, time.perf_counter() - t0)
+            return await asyncio.wait_for(asyncio.to_thread(fn, *args), self.timeout_s)
+
+    async def search_items(self, query: str, location: str) -> List[Item]:
+        return await self._call(self.module.search_items, query, location)
+
+    async def get_price(self, sku: str, location: str) -> float:
+        return await self._call(self.module.get_price, sku, location)
+
+    def close(self):
+        pass
+
+
+# ----- Fan-out -----
+_waits = contextvars.ContextVar("fanout_waits", default=None)  # store name -> [s queued for a slot], per fan-out
+
+def _waited(store_name: str, s: float):
+    waits = _waits.get()
+    if waits is not None:
+        waits.setdefault(store_name, []).append(s)
+
+async def _timed(store, coro, calls: Dict[str, list]):
+    """Wall time per call; the store itself applies timeout_s once it holds a connection/slot."""
+    t0 = time.perf_counter()
+    try:
+        with tracing.span("inventory.fanout_call", store=store.name):
+            return await coro
+    finally:
+        calls.setdefault(store.name, []).append(time.perf_counter() - t0)
+
+def _error(store, key: str, value: str, e: BaseException) -> dict:
+    kind = "timeout" if isinstance(e, asyncio.TimeoutError) else type(e).__name__
+    return {"store": store.name, key: value, "error": kind, "detail": str(e)}
+
+def _store_stats(calls: Dict[str, list], waits: Dict[str, list]) -> dict:
+    out = {}
+    for name, ts in calls.items():
+        ts = sorted(ts); ws = sorted(waits.get(name) or [0.0])
+        out[name] = {"calls": len(ts), "p50_ms": round(ts[len(ts) // 2] * 1e3, 2), "max_ms": round(ts[-1] * 1e3, 2),
+                     "wait_p50_ms": round(ws[len(ws) // 2] * 1e3, 2), "wait_max_ms": round(ws[-1] * 1e3, 2)}
+    return out
+
+async def fan_out_search(stores: list, queries: List[str], location: str) -> dict:
+    """Search every query at every store concurrently; failed or slow calls become entries in "errors"."""
+    t0 = time.perf_counter(); calls = {}; waits = {}
+    _waits.set(waits)
+    jobs = [(q, s) for q in queries for s in stores]
+    done = await asyncio.gather(*(_timed(s, s.search_items(q, location), calls) for q, s in jobs),
+                                return_exceptions=True)
+    results = {q: {} for q in queries}; errors = []
+    for (q, s), r in zip(jobs, done):
+        if isinstance(r, BaseException):
+            errors.append(_error(s, "query", q, r))
+        else:
+            results[q][s.name] = r
+    return {"results": results, "errors": errors, "elapsed_s": round(time.perf_counter() - t0, 4),
+            "stores": _store_stats(calls, waits)}
+
+async def fan_out_prices(stores: Dict[str, object], skus: List[tuple], location: str) -> dict:
+    """skus: [(store name, sku)] -> {"prices": {(store, sku): price}, "errors": [...]}."""
+    calls = {}; waits = {}
+    _waits.set(waits)
+    done = await asyncio.gather(*(_timed(stores[st], stores[st].get_price(sku, location), calls) for st, sku in skus),
+                                return_exceptions=True)
+    prices = {}; errors = []
+    for (st, sku), r in zip(skus, done):
+        if isinstance(r, BaseException):
+            errors.append(_error(stores[st], "sku", sku, r))
+        else:
+            prices[(st, sku)] = r
+    return {"prices": prices, "errors": errors, "stores": _store_stats(calls, waits)}
+
+
+def search_all(stores: list, queries: List[str], location: str) -> dict:
+    """Blocking wrapper around fan_out_search for synchronous callers."""
+    async def run():
+        try:
+            return await fan_out_search(stores, queries, location)
+        finally:
+            for s in stores:
+                s.close()
+    return asyncio.run(run())
+
+def default_stores(timeout_s: float = 2.0, urls: Optional[Dict[str, str]] = None) -> list:
+    """HTTP stores for names in urls, mock module adapters for the rest."""
+    from . import costco, instacart, walmart
+    urls = urls or {}
+    return [HttpStore(m.__name__.split(".")[-1], urls[m.__name__.split(".")[-1]], timeout_s=timeout_s)
+            if m.__name__.split(".")[-1] in urls else ModuleStore(m, timeout_s=timeout_s)
+            for m in (costco, walmart, instacart)]
@@ -0,0 +1,220 @@
+import re
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Optional
+import numpy as np
+from .common import Item
+
+# Canonical SKU catalog for matching recipe ingredients to store items.
+#
+# Items are stored column-wise (array/bytearray per field, interned store and
+# unit strings, allergens as a bitmask over the taxonomy's allergen enums,
+# nutrition as one flat CSR-style block) so a store's few hundred thousand SKUs
+# cost tens of bytes each instead of a dataclass + __dict__ per item. SKU and
+# GTIN resolve through per-store dicts (one GTIN is often sold at several
+# stores); ingredient names through a token -> rows index with a sorted token
+# list for prefix matches.
+#
+#   cat = Catalog(); cat.add(sku="W-1", name="Red Lentils 2 lb", store="walmart", price_usd=3.98, unit="2 lb")
+#   cat.get_gtin("walmart", "00012345678905") -> row;   cat.gtin_rows("00012345678905") -> [row, ...]
+#   cat.search("lentil")      -> [row, ...];   cat.item(row) -> dict
+#   cat.price_per_100(row)    -> (0.44, "g")
+
+ALLERGENS = ("peanuts", "tree_nuts", "milk", "egg", "fish", "crustacean_shellfish", "wheat", "soy", "sesame",
+             "sulfites", "celery", "mustard", "lupin", "mollusks")
+
+# ----- Units -----
+# quantity in grams (mass) or millilitres (volume); "each" has no base quantity
+UNIT_BASE = {"g": (1.0, "g"), "gram": (1.0, "g"), "grams": (1.0, "g"), "kg": (1000.0, "g"),
+             "mg": (0.001, "g"), "oz": (28.349523125, "g"), "lb": (453.59237, "g"), "lbs": (453.59237, "g"),
+             "ml": (1.0, "ml"), "l": (1000.0, "ml"), "liter": (1000.0, "ml"), "litre": (1000.0, "ml"),
+             "fl oz": (29.5735295625, "ml"), "floz": (29.5735295625, "ml"), "gal": (3785.411784, "ml"),
+             "qt": (946.352946, "ml"), "pt": (473.176473, "ml")}
+_UNIT_RE = re.compile(r"^\s*(?:(\d+(?:\.\d+)?)\s*[x×]\s*)?(\d+(?:\.\d+)?)?\s*(fl\.?\s*oz|[a-z]+)\.?\s*$")
+
+def parse_unit(unit: str):
+    """'16 oz' -> (453.59, 'g'); '2 x 400 g' -> (800.0, 'g'); '1 gal' -> (3785.41, 'ml'); 'each' -> (None, 'each')."""
+    m = _UNIT_RE.match((unit or "").lower())
+    if not m:
+        return None, "each"
+    packs, qty, name = m.groups()
+    name = re.sub(r"[.\s]", "", name) if name.startswith("fl") else name
+    base = UNIT_BASE.get(name)
+    if base is None:
+        return None, "each"
+    return float(packs or 1) * float(qty or 1) * base[0], base[1]
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokens(text: str) -> List[str]:
+    """Lower-cased word tokens; plural 's' is dropped so 'lentils' matches 'lentil'."""
+    out = []
+    for t in _TOKEN_RE.findall(text.lower()):
+        if len(t) > 3 and t.endswith("s") and not t.endswith("ss"):
+            t = t[:-1]
+        out.append(t)
+    return out
+
+
+class _Interned:
+    __slots__ = ("ids", "values")
+
+    def __init__(self):
+        self.ids = {}; self.values = []
+
+    def id(self, value) -> int:
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values); self.values.append(value)
+        return i
+
+
+class Catalog:
+    """Columnar item store with SKU/GTIN hash indexes and a token/prefix name index."""
+
+    def __init__(self):
+        self.sku = []; self.name = []
+        self.gtin = array("q"); self.store = array("H"); self.unit = array("H")
+        self.price = array("d"); self.base_qty = array("d")  # base_qty: g or ml per pack, NaN for "each"
+        self.allergens = array("Q"); self.in_stock = bytearray()
+        self.nut_off = array("I", [0]); self.nut_key = array("H"); self.nut_val = array("d")
+        self._stores = _Interned(); self._units = _Interned(); self._bases = array("B")  # base unit id per unit id
+        self._nutrients = _Interned(); self._allergens = _Interned()
+        for a in ALLERGENS:
+            self._allergens.id(a)
+        self.by_sku = {}; self.by_gtin = {}
+        self._tokens = {}        # token -> array of rows
+        self._sorted = None      # sorted token list for prefix search, rebuilt lazily
+
+    def __len__(self):
+        return len(self.price)
+
+    # ----- building -----
+    def add(self, sku: str, name: str, store: str, price_usd: float, unit: str = "each", in_stock: bool = True,
+            gtin: Optional[str] = None, allergens: Iterable[str] = (), nutrition: Optional[dict] = None, **_) -> int:
+        row = len(self.price)
+        self.sku.append(sku); self.name.append(name)
+        g = int(gtin) if gtin else 0
+        self.gtin.append(g); self.store.append(self._stores.id(store))
+        qty, base = parse_unit(unit)
+        u = self._units.id(unit)
+        if u == len(self._bases):
+            self._bases.append(("g", "ml", "each").index(base))
+        self.unit.append(u)
+        self.price.append(float(price_usd)); self.base_qty.append(qty if qty else float("nan"))
+        mask = 0
+        for a in allergens:
+            bit = self._allergens.id(a)
+            if bit >= 64:
+                raise ValueError(f"more than 64 distinct allergens (at {a!r})")
+            mask |= 1 << bit
+        self.allergens.append(mask); self.in_stock.append(1 if in_stock else 0)
+        for k, v in (nutrition or {}).items():
+            self.nut_key.append(self._nutrients.id(k)); self.nut_val.append(v)
+        self.nut_off.append(len(self.nut_key))
+        self.by_sku.setdefault(store, {})[sku] = row
+        if g:
+            self.by_gtin.setdefault(store, {})[g] = row
+        for t in set(tokens(name)):
+            rows = self._tokens.get(t)
+            if rows is None:
+                rows = self._tokens[t] = array("i"); self._sorted = None
+            rows.append(row)
+        return row
+
+    def add_items(self, items: Iterable[Item]) -> None:
+        for i in items:
+            self.add(i.sku, i.name, i.store, i.price_usd, i.unit, i.in_stock, nutrition=i.nutrition_hint)
+
+    # ----- lookups -----
+    def get_sku(self, store: str, sku: str) -> Optional[int]:
+        return self.by_sku.get(store, {}).get(sku)
+
+    def get_gtin(self, store: str, gtin) -> Optional[int]:
+        return self.by_gtin.get(store, {}).get(int(gtin))
+
+    def gtin_rows(self, gtin) -> List[int]:
+        """Rows for one GTIN across all stores (the same product sold at several), in store order."""
+        g = int(gtin)
+        return [rows[g] for rows in self.by_gtin.values() if g in rows]
+
+    def _prefix_rows(self, prefix: str):
+        if self._sorted is None:
+            self._sorted = sorted(self._tokens)
+        out = []
+        for j in range(bisect_left(self._sorted, prefix), len(self._sorted)):
+            t = self._sorted[j]
+            if not t.startswith(prefix):
+                break
+            out.append(self._tokens[t])
+        return out
+
+    def search(self, text: str, limit: int = 10, store: Optional[str] = None, in_stock_only: bool = False) -> List[int]:
+        """Rows ranked by matched query tokens (exact 2 points, prefix 1), then price; last token may be partial."""
+        qt = tokens(text)
+        rows = []; weights = []
+        for n, t in enumerate(qt):
+            exact = self._tokens.get(t)
+            if exact is not None:
+                rows.append(np.frombuffer(exact, dtype=np.int32)); weights.append(2)
+            if n == len(qt) - 1 or exact is None:
+                for r in self._prefix_rows(t):
+                    if r is not exact:
+                        rows.append(np.frombuffer(r, dtype=np.int32)); weights.append(1)
+        if not rows:
+            return []
+        cand = np.concatenate(rows)
+        w = np.repeat(np.asarray(weights, dtype=np.int64), [len(r) for r in rows])
+        keep = np.ones(len(cand), dtype=bool)
+        if store is not None:
+            sid = self._stores.ids.get(store)
+            if sid is None:
+                return []
+            keep &= np.frombuffer(self.store, dtype=np.uint16)[cand] == sid
+        if in_stock_only:
+            keep &= np.frombuffer(self.in_stock, dtype=np.uint8)[cand] == 1
+        uniq, inv = np.unique(cand[keep], return_inverse=True)
+        score = np.bincount(inv, weights=w[keep], minlength=len(uniq))
+        price = np.frombuffer(self.price, dtype=np.float64)[uniq]
+        order = np.lexsort((uniq, price, -score))[:limit]
+        return uniq[order].tolist()
+
+    # ----- per-row views -----
+    def price_per_100(self, row: int):
+        """(price per 100 g or 100 ml, base unit), or (price, 'each') for count units."""
+        qty = self.base_qty[row]
+        base = ("g", "ml", "each")[self._bases[self.unit[row]]]
+        if qty != qty or not qty:  # NaN: counted, not weighed
+            return round(self.price[row], 4), "each"
+        return round(self.price[row] * 100.0 / qty, 4), base
+
+    def allergen_names(self, row: int) -> List[str]:
+        mask = self.allergens[row]
+        return [a for bit, a in enumerate(self._allergens.values) if mask >> bit & 1]
+
+    def has_allergen(self, row: int, names: Iterable[str]) -> bool:
+        mask = 0
+        for a in names:
+            bit = self._allergens.ids.get(a)
+            if bit is not None:
+                mask |= 1 << bit
+        return bool(self.allergens[row] & mask)
+
+    def nutrition(self, row: int) -> dict:
+        a, b = self.nut_off[row], self.nut_off[row + 1]
+        names = self._nutrients.values
+        return {names[self.nut_key[k]]: float(self.nut_val[k]) for k in range(a, b)}
+
+    def item(self, row: int) -> dict:
+        per, base = self.price_per_100(row)
+        return {"sku": self.sku[row], "gtin": str(self.gtin[row]).zfill(14) if self.gtin[row] else None, "name": self.name[row],
+                "store": self._stores.values[self.store[row]], "price_usd": self.price[row],
+                "unit": self._units.values[self.unit[row]], "in_stock": bool(self.in_stock[row]),
+                "allergens": self.allergen_names(row), "nutrition": self.nutrition(row),
+                "price_per_100": per, "per_unit": base}
+
+    def to_item(self, row: int) -> Item:
+        d = self.item(row)
+        return Item(sku=d["sku"], name=d["name"], store=d["store"], price_usd=d["price_usd"], unit=d["unit"],
+                    in_stock=d["in_stock"], nutrition_hint=d["nutrition"] or None)
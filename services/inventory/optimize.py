@@ -0,0 +1,112 @@
+from itertools import combinations
+from typing import Dict, List, Optional
+import numpy as np
+from .common import Item, build_cart
+
+# Cross-store cart optimizer.
+#
+# Every ingredient gets one in-stock candidate item. Candidates that would trip
+# the guardrail oracle are dropped up front: items from a store other than the
+# profile's, or whose SKU names another store (the store_item_unavailable
+# check). The remaining choice is a price matrix (ingredients x stores, inf when
+# a store has nothing usable); a store set S costs sum(min over S of each row)
+# + store_penalty_usd * |S|. Store sets are enumerated smallest first with a
+# lower bound (per-ingredient minimum over all stores), which stops the search
+# as soon as no larger set can win. Sets whose items cost more than
+# profile.budget_usd are skipped during the search, so the best set that fits
+# is returned and carts pass budget_exceeded by construction.
+
+# SKU substrings that tie an item to one store (own-brand lines included)
+STORE_MARKERS = {"costco": ("costco", "kirkland"), "walmart": ("walmart", "great_value"), "trader_joes": ("trader_joe",),
+                 "whole_foods": ("whole_foods",), "sams_club": ("sams_club", "members_mark"), "target": ("good_gather",),
+                 "kroger": ("kroger",), "safeway": ("safeway",), "publix": ("publix",), "harris_teeter": ("harris_teeter",),
+                 "amazon_fresh": ("amazon_fresh",)}
+
+
+def store_key(name: str) -> str:
+    """'Trader Joes' / "trader joe's" / 'trader_joes' -> 'trader_joes'."""
+    return "_".join("".join(c if c.isalnum() else " " for c in name.lower().replace("'", "")).split())
+
+
+def _names_other_store(item: Item, store: str) -> bool:
+    sku = store_key(item.sku)
+    return any(s != store and any(m in sku for m in marks) for s, marks in STORE_MARKERS.items())
+
+
+def eligible(item: Item, store: Optional[str]) -> bool:
+    if not item.in_stock:
+        return False
+    if store:
+        s = store_key(store)
+        return store_key(item.store) == s and not _names_other_store(item, s)
+    return True
+
+
+def optimize_cart(ingredients: List[str], candidates: Dict[str, List[Item]], profile: Optional[dict] = None,
+                  store_penalty_usd: float = 0.0, max_stores: Optional[int] = None) -> dict:
+    """Cheapest in-stock cart for ingredients.
+
+    candidates: ingredient -> items from any store (e.g. merged fan_out_search results).
+    profile: optional "budget_usd" and "store". store_penalty_usd trades cost against the
+    number of stores visited; max_stores caps it outright.
+    Returns {"feasible", "cart", "stores", "unavailable", "min_total_usd", "reason"}.
+    """
+    profile = profile or {}
+    store = profile.get("store")
+    # best item per (ingredient, store)
+    stores = []; sidx = {}
+    best = []
+    for ing in ingredients:
+        row = {}
+        for it in candidates.get(ing, ()):
+            if not eligible(it, store):
+                continue
+            s = sidx.setdefault(store_key(it.store), len(sidx))
+            if s == len(stores):
+                stores.append(store_key(it.store))
+            cur = row.get(s)
+            if cur is None or (it.price_usd, it.sku) < (cur.price_usd, cur.sku):
+                row[s] = it
+        best.append(row)
+    unavailable = [ing for ing, row in zip(ingredients, best) if not row]
+    if unavailable:
+        return {"feasible": False, "cart": None, "stores": [], "unavailable": unavailable, "min_total_usd": None,
+                "reason": "no eligible in-stock item"}
+
+    P = np.full((len(ingredients), len(stores)), np.inf)
+    for i, row in enumerate(best):
+        for s, it in row.items():
+            P[i, s] = it.price_usd
+    lower = float(P.min(axis=1).sum()) if len(ingredients) else 0.0
+
+    # the budget applies to each candidate set, so a dearer set with fewer stores never hides one that fits
+    budget = profile.get("budget_usd")
+    chosen = None; chosen_cost = np.inf
+    if not ingredients:
+        chosen, chosen_cost = (), 0.0  # nothing to buy: the empty cart
+    cheapest = np.inf  # lowest item total of any complete set within max_stores, budget aside
+    limit = min(len(stores), max_stores or len(stores))
+    for size in range(1, limit + 1):
+        if lower + store_penalty_usd * size >= chosen_cost:
+            break  # no set of this size or larger can beat the best found
+        for S in combinations(range(len(stores)), size):
+            price = float(P[:, S].min(axis=1).sum())
+            cheapest = min(cheapest, price)
+            if budget is not None and price > budget:
+                continue
+            cost = price + store_penalty_usd * size
+            if cost < chosen_cost:
+                chosen, chosen_cost = S, cost
+    if chosen is None:
+        if cheapest < np.inf:
+            return {"feasible": False, "cart": None, "stores": [], "unavailable": [], "min_total_usd": round(cheapest, 2),
+                    "reason": f"cheapest cart {round(cheapest, 2)} exceeds budget {budget}"}
+        return {"feasible": False, "cart": None, "stores": [], "unavailable": [], "min_total_usd": None,
+                "reason": f"needs more than {limit} stores"}
+
+    cols = list(chosen)
+    pick = np.asarray(cols)[P[:, cols].argmin(axis=1)] if len(ingredients) else []
+    items = [best[i][int(s)] for i, s in enumerate(pick)]
+    cart = build_cart(items)
+    return {"feasible": True, "cart": cart, "stores": sorted({stores[int(s)] for s in pick}), "unavailable": [],
+            "min_total_usd": cart["total_usd"], "reason": None}
@@ -0,0 +1,84 @@
+import argparse, asyncio, json, random, zlib
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-in for a store API, for exercising fanout.HttpStore.
+#
+# Serves GET /search?q=&location= and /price?sku=&location= over keep-alive
+# HTTP/1.1, with injected latency (ms, uniform between min and max), a share of
+# requests answered with HTTP 503, and a share that never answers (timeouts).
+#
+#   python -m services.inventory.stub_server --store walmart --port 8801 --latency-ms 20,80 --fail 0.05
+
+
+class StubStore:
+    def __init__(self, store: str, latency_ms=(0, 0), fail_rate: float = 0.0, hang_rate: float = 0.0,
+                 price_usd: float = 3.49, seed: int = 0):
+        self.store = store; self.latency_ms = latency_ms
+        self.fail_rate = fail_rate; self.hang_rate = hang_rate; self.price_usd = price_usd
+        self.rng = random.Random(seed)
+        self.requests = 0; self.connections = 0
+
+    def respond(self, path: str, q: dict):
+        if path == "/search":
+            query = q.get("q", [""])[0]
+            item = {"sku": f"{self.store.upper()}-{zlib.crc32(query.encode('utf-8')) % 100000:05d}", "name": f"{query} (stub)",
+                    "store": self.store, "price_usd": self.price_usd, "unit": "each", "in_stock": True}
+            return 200, {"items": [item]}
+        if path == "/price":
+            return 200, {"sku": q.get("sku", [""])[0], "price_usd": self.price_usd}
+        return 404, {"error": "not found"}
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\r\n")
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                self.requests += 1
+                u = urlsplit(line.split(b" ")[1].decode("latin-1"))
+                lo, hi = self.latency_ms
+                await asyncio.sleep(self.rng.uniform(lo, hi) / 1000)
+                roll = self.rng.random()
+                if roll < self.hang_rate:
+                    await asyncio.sleep(3600)
+                status, payload = (503, {"error": "injected"}) if roll < self.hang_rate + self.fail_rate \
+                    else self.respond(u.path, parse_qs(u.query))
+                body = json.dumps(payload).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1") + body)
+                await writer.drain()
+        except asyncio.CancelledError:
+            pass  # server shutting down
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        """Start serving; returns (server, port)."""
+        server = await asyncio.start_server(self.handle, host, port)
+        return server, server.sockets[0].getsockname()[1]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--store", default="walmart")
+    ap.add_argument("--port", type=int, default=8801)
+    ap.add_argument("--latency-ms", default="0,0", help="min,max")
+    ap.add_argument("--fail", type=float, default=0.0, help="share of requests answered with 503")
+    ap.add_argument("--hang", type=float, default=0.0, help="share of requests never answered")
+    args = ap.parse_args()
+    lo, hi = (float(x) for x in args.latency_ms.split(","))
+
+    async def run():
+        server, port = await StubStore(args.store, (lo, hi), args.fail, args.hang).start(port=args.port)
+        print(f"stub {args.store} on http://127.0.0.1:{port}")
+        async with server:
+            await server.serve_forever()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import asyncio, time
+
+from services.inventory import costco
+from services.inventory.fanout import HttpStore, ModuleStore, fan_out_search
+from services.inventory.stub_server import StubStore
+
+
+def _search(stub: StubStore, queries, **store_kw):
+    async def go():
+        server, port = await stub.start()
+        store = HttpStore(stub.store, f"http://127.0.0.1:{port}", **store_kw)
+        try:
+            async with server:
+                out = await fan_out_search([store], queries, "94107")
+                pool = next(iter(store._pools.values()))
+                return out, pool.opened
+        finally:
+            store.close()
+    return asyncio.run(go())
+
+
+def test_queueing_for_a_connection_does_not_count_against_the_timeout():
+    queries = [f"item{i}" for i in range(40)]
+    out, opened = _search(StubStore("walmart", latency_ms=(20, 30)), queries, max_connections=4, timeout_s=0.15)
+    assert out["errors"] == []
+    assert all(out["results"][q]["walmart"] for q in queries)
+    assert opened == 4
+    stats = out["stores"]["walmart"]
+    assert stats["calls"] == 40 and stats["wait_max_ms"] > 150  # queued well past timeout_s, yet no timeouts
+
+
+def test_slow_request_still_times_out():
+    out, _ = _search(StubStore("walmart", hang_rate=1.0), ["onion", "rice"], max_connections=2, timeout_s=0.1)
+    assert [e["error"] for e in out["errors"]] == ["timeout", "timeout"]
+    assert out["results"] == {"onion": {}, "rice": {}}
+
+
+def test_module_store_timeout_starts_after_its_concurrency_slot():
+    class Slow:
+        @staticmethod
+        def search_items(query, location):
+            time.sleep(0.05)
+            return costco.search_items(query, location)
+
+    store = ModuleStore(Slow, max_concurrency=1, timeout_s=0.1, name="slow")
+    out = asyncio.run(fan_out_search([store], ["onion", "rice", "lentils", "tofu"], "94107"))
+    assert out["errors"] == []
+    assert out["stores"]["slow"]["wait_max_ms"] >= 100
@@ -0,0 +1,33 @@
+from services.inventory.normalize import Catalog, parse_unit
+
+GTIN = "00012345678905"
+
+
+def catalog():
+    cat = Catalog()
+    cat.add(sku="W-1", name="Red Lentils 2 lb", store="walmart", price_usd=3.98, unit="2 lb", gtin=GTIN)
+    cat.add(sku="C-9", name="Red Lentils 2 lb", store="costco", price_usd=3.49, unit="2 lb", gtin=GTIN)
+    cat.add(sku="W-2", name="Green Lentils", store="walmart", price_usd=2.50, unit="16 oz")
+    return cat
+
+
+def test_gtin_sold_at_two_stores_keeps_both_rows():
+    cat = catalog()
+    assert cat.get_gtin("walmart", GTIN) == 0
+    assert cat.get_gtin("costco", int(GTIN)) == 1
+    assert cat.gtin_rows(GTIN) == [0, 1]
+    assert cat.get_gtin("kroger", GTIN) is None and cat.gtin_rows("1") == []
+    assert cat.item(1)["gtin"] == GTIN
+
+
+def test_sku_is_per_store():
+    cat = catalog()
+    assert cat.get_sku("walmart", "W-2") == 2 and cat.get_sku("costco", "W-2") is None
+
+
+def test_search_and_units():
+    cat = catalog()
+    assert cat.search("lentil", store="walmart") == [2, 0]
+    assert cat.search("red lent") == [1, 0, 2]
+    assert cat.price_per_100(2) == (round(2.50 * 100 / 453.59237, 4), "g")
+    assert parse_unit("2 x 400 g") == (800.0, "g") and parse_unit("each") == (None, "each")
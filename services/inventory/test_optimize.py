@@ -0,0 +1,47 @@
+from services.inventory.common import Item
+from services.inventory.optimize import optimize_cart
+
+
+def item(ing, store, price, in_stock=True):
+    return Item(sku=f"{store}-{ing}", name=ing, store=store, price_usd=price, unit="each", in_stock=in_stock)
+
+
+# one store: 22.00; mixing two stores: 20.00
+CANDIDATES = {"oats": [item("oats", "costco", 11.0), item("oats", "walmart", 9.0)],
+              "rice": [item("rice", "costco", 11.0), item("rice", "walmart", 13.0), item("rice", "kroger", 11.0)]}
+
+
+def test_penalty_prefers_fewer_stores_when_the_budget_allows():
+    out = optimize_cart(["oats", "rice"], CANDIDATES, {"budget_usd": 30}, store_penalty_usd=5)
+    assert out["feasible"] and out["stores"] == ["costco"] and out["cart"]["total_usd"] == 22.0
+
+
+def test_budget_is_applied_per_store_set_during_the_search():
+    out = optimize_cart(["oats", "rice"], CANDIDATES, {"budget_usd": 21}, store_penalty_usd=5)
+    assert out["feasible"], out["reason"]
+    assert out["cart"]["total_usd"] == 20.0 and len(out["stores"]) == 2
+
+
+def test_over_budget_reports_the_cheapest_cart():
+    out = optimize_cart(["oats", "rice"], CANDIDATES, {"budget_usd": 19}, store_penalty_usd=5)
+    assert not out["feasible"] and out["cart"] is None
+    assert out["min_total_usd"] == 20.0 and out["reason"] == "cheapest cart 20.0 exceeds budget 19"
+
+
+def test_max_stores():
+    out = optimize_cart(["oats", "rice"], CANDIDATES, {"budget_usd": 21}, max_stores=1)
+    assert not out["feasible"] and out["min_total_usd"] == 22.0
+    split = {"oats": [item("oats", "walmart", 1.0)], "rice": [item("rice", "kroger", 1.0)]}
+    assert optimize_cart(["oats", "rice"], split, max_stores=1)["reason"] == "needs more than 1 stores"
+
+
+def test_unavailable_and_store_profile():
+    cands = dict(CANDIDATES, tofu=[item("tofu", "walmart", 2.0, in_stock=False)])
+    assert optimize_cart(["oats", "tofu"], cands)["unavailable"] == ["tofu"]
+    out = optimize_cart(["oats", "rice"], CANDIDATES, {"store": "Kroger"})
+    assert out["unavailable"] == ["oats"]
+
+
+def test_empty_ingredient_list_is_an_empty_feasible_cart():
+    out = optimize_cart([], {}, {"budget_usd": 10}, store_penalty_usd=5)
+    assert out["feasible"] and out["cart"] == {"items": [], "total_usd": 0} and out["stores"] == []
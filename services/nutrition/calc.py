@@ -1,7 +1,286 @@
+from itertools import repeat
+import numpy as np
+from ..common.tracing import traced
+
 # Deterministic roll-up: ingredient -> recipe -> day plan
+@traced("nutrition.sum_nutrients")
 def sum_nutrients(ingredients):
-    keys=set().union(*[i["nutrients"].keys() for i in ingredients]) if ingredients else set()
-    return {k: round(sum(i["nutrients"].get(k,0) for i in ingredients),2) for k in keys}
+    totals = {}
+    for i in ingredients:
+        for k, v in i["nutrients"].items():
+            totals[k] = totals.get(k, 0) + v
+    return {k: round(v, 2) for k, v in totals.items()}
+@traced("nutrition.enforce_thresholds")
 def enforce_thresholds(totals, limits):
     violations = {k: totals.get(k,0) for k,v in limits.items() if totals.get(k,0) > v}
     return {"violations": violations, "hard_fail": bool(violations)}
+
+
+# ----- Columnar roll-up -----
+# The plan hierarchy is flattened into one float matrix per level (rows = nodes,
+# columns = nutrients) plus a parent-index array per level. Each level's totals
+# are a segmented sum of the rounded totals one level down, so every number
+# equals what chained sum_nutrients calls would give: np.bincount adds in child
+# order exactly like sum(), and round2 matches round(x, 2).
+
+LEVELS = ("ingredient", "recipe", "meal", "day", "week")
+CHILD_KEYS = ("ingredients", "recipes", "meals", "days")  # children of recipe, meal, day, week
+
+
+class _ColumnIndex(dict):
+    """name -> column; indexing an unseen name assigns the next column (get() does not)."""
+    __slots__ = ("names",)
+
+    def __missing__(self, name):
+        c = self[name] = len(self.names)
+        self.names.append(name)
+        return c
+
+
+class NutrientColumns:
+    """Stable nutrient name -> column index."""
+
+    def __init__(self, names=()):
+        self.index = _ColumnIndex(); self.names = self.index.names = []
+        for n in names:
+            self.col(n)
+
+    def col(self, name) -> int:
+        return self.index[name]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def round2(a: np.ndarray) -> np.ndarray:
+    """round(x, 2) elementwise; np.round only disagrees next to a half-cent, so those cells use round()."""
+    r = np.round(a, 2)
+    frac = np.abs(a * 100) % 1
+    for k in np.flatnonzero(np.abs(frac - 0.5) < 1e-6):
+        r.flat[k] = round(float(a.flat[k]), 2)
+    return r
+
+def segment_sum(parent: np.ndarray, vals: np.ndarray, n: int) -> np.ndarray:
+    """Row sums of vals grouped by parent, accumulated in row order."""
+    m = vals.shape[1]
+    cells = (parent[:, None] * m + np.arange(m)).ravel()
+    return np.bincount(cells, weights=vals.ravel(), minlength=n * m).reshape(n, m)
+
+
+def _children(node, key):
+    return node.get(key, ()) if isinstance(node, dict) else node
+
+
+class PlanRollup:
+    """Totals for every recipe, meal, day and week of a plan.
+
+    plan is a list of weeks; each node is either a dict holding its child list
+    ({"days": [...]}, {"meals": [...]}, {"recipes": [...]}, {"ingredients": [...]})
+    or the child list itself. Ingredients are {"nutrients": {name: value}}.
+    """
+
+    def __init__(self, plan, columns: NutrientColumns = None):
+        self.columns = columns or NutrientColumns()
+        # one pass over the fixed-depth plan; nutrient names are mapped to columns in bulk afterwards
+        ing_p = []; rec_p = []; meal_p = []; day_p = []  # parent index of each ingredient, recipe, meal, day
+        names = []; vals = []; widths = []
+        recipes = self.recipes = []  # ingredient list of each recipe, by recipe index
+        n_week = n_day = n_meal = 0
+        for week in plan:
+            for day in _children(week, "days"):
+                day_p.append(n_week)
+                for meal in _children(day, "meals"):
+                    meal_p.append(n_day)
+                    for recipe in _children(meal, "recipes"):
+                        rec_p.append(n_meal)
+                        ings = list(_children(recipe, "ingredients"))
+                        ing_p.extend(repeat(len(recipes), len(ings)))
+                        recipes.append(ings)
+                        for ing in ings:
+                            nut = ing["nutrients"]
+                            names.extend(nut); vals.extend(nut.values()); widths.append(len(nut))
+                    n_meal += 1
+                n_day += 1
+            n_week += 1
+        cols = np.fromiter(map(self.columns.index.__getitem__, names), np.int64, len(names))  # new names get columns
+        self.counts = counts = [len(ing_p), len(recipes), n_meal, n_day, n_week]
+        # parents[k]: index of each level-k node's parent on level k+1
+        self.parents = [np.asarray(p, dtype=np.int64) for p in (ing_p, rec_p, meal_p, day_p)]
+        m = len(self.columns)
+        cells = np.repeat(np.arange(counts[0]) * m, widths) + cols  # a nutrient occurs once per ingredient
+        shape = (counts[0], m)
+        self.values = np.bincount(cells, np.fromiter(vals, np.float64, len(vals)), counts[0] * m).reshape(shape)
+        self.present = np.bincount(cells, minlength=counts[0] * m).reshape(shape).astype(np.float64)
+        self.totals = {}; self.has = {}
+        self.rollup()
+
+    def rollup(self) -> dict:
+        """Recompute every level: {level: (nodes x nutrients) rounded totals}."""
+        vals = self.values; pres = self.present
+        for k, level in enumerate(LEVELS[1:], 1):
+            vals = round2(segment_sum(self.parents[k - 1], vals, self.counts[k]))
+            self.totals[level] = vals
+            if level not in self.has:  # structure only; unchanged by value edits
+                pres = self.has[level] = segment_sum(self.parents[k - 1], pres, self.counts[k]) > 0
+            else:
+                pres = self.has[level]
+        return self.totals
+
+    def totals_dict(self, level: str, k: int) -> dict:
+        """Totals of one node in sum_nutrients form (only nutrients that occur below it)."""
+        row = self.totals[level][k]
+        return {self.columns.names[c]: float(row[c]) for c in np.flatnonzero(self.has[level][k])}
+
+    def check_thresholds(self, limits: dict) -> dict:
+        """limits: {level: {nutrient: max}}, all levels compared at once.
+
+        Returns {level: {"hard_fail": bool per node, "violations": {node: {nutrient: total}}}};
+        violations[k] equals enforce_thresholds(totals of k, limits[level])["violations"].
+        """
+        out = {}
+        for level, lim in limits.items():
+            totals = self.totals[level]
+            names = list(lim)
+            # nutrients that never occur map to column -1, an appended zero column (totals.get(k, 0));
+            # this also covers plans with no nutrient columns at all
+            cols = np.fromiter((self.columns.index.get(name, -1) for name in names), dtype=np.int64, count=len(names))
+            cap = np.fromiter(lim.values(), dtype=np.float64, count=len(names))
+            vals = np.hstack([totals, np.zeros((len(totals), 1))])[:, cols]
+            over = vals > cap
+            violations = {}
+            for k, j in zip(*(ix.tolist() for ix in np.nonzero(over))):
+                violations.setdefault(k, {})[names[j]] = float(vals[k, j]) if cols[j] >= 0 else 0
+            out[level] = {"hard_fail": over.any(axis=1), "violations": violations}
+        return out
+
+
+# ----- Incremental edits -----
+# IncrementalPlan keeps every total above the recipe level as integer cents, so
+# an edit adds one delta row per ancestor (recipe -> meal -> day -> week) and
+# the result is exact: summing 2-decimal values and rounding, as sum_nutrients
+# does, lands on the same cent. Only the edited recipe is re-summed from its
+# ingredients. Thresholds are re-checked for the columns the delta touched, and
+# each edit returns the (level, node, nutrient) flags that flipped.
+
+class IncrementalPlan:
+    """Editable plan with running totals; see PlanRollup for the plan layout."""
+
+    def __init__(self, plan, limits: dict = None):
+        r = PlanRollup(plan)
+        self.columns = r.columns
+        self.limits = limits or {}
+        self.ingredients = r.recipes
+        # parent[level][k] for recipe, meal and day nodes; children of each meal
+        self.parent = {lv: r.parents[i].tolist() for i, lv in enumerate(LEVELS[1:-1], 1)}
+        self.recipes_of = [[] for _ in range(r.counts[2])]
+        for k, m in enumerate(self.parent["recipe"]):
+            self.recipes_of[m].append(k)
+        self.alive = [True] * r.counts[1]
+        # cents[level]: (nodes x nutrients) int64; occurs[level]: children in which a nutrient occurs
+        self.cents = {lv: np.rint(r.totals[lv] * 100).astype(np.int64) for lv in LEVELS[1:]}
+        self.occurs = {"recipe": r.has["recipe"].astype(np.int64)}
+        for i, lv in enumerate(LEVELS[2:], 2):
+            self.occurs[lv] = segment_sum(r.parents[i - 1], r.has[LEVELS[i - 1]].astype(np.float64), r.counts[i]).astype(np.int64)
+        self.flags = set()  # (level, node, nutrient) currently over the limit
+        for lv, lim in self.limits.items():
+            for name, cap in lim.items():
+                c = self.columns.index.get(name)
+                if c is None:
+                    if 0 > cap:
+                        self.flags.update((lv, k, name) for k in range(len(self.cents[lv])))
+                    continue
+                for k in np.flatnonzero(self.cents[lv][:, c] / 100 > cap).tolist():
+                    self.flags.add((lv, k, name))
+
+    # ----- queries -----
+    def total(self, level: str, k: int, nutrient: str) -> float:
+        c = self.columns.index.get(nutrient)
+        return 0 if c is None else float(self.cents[level][k, c] / 100)
+
+    def totals_dict(self, level: str, k: int) -> dict:
+        row = self.cents[level][k]
+        return {self.columns.names[c]: float(row[c] / 100) for c in np.flatnonzero(self.occurs[level][k])}
+
+    # ----- edits -----
+    def replace_ingredient(self, recipe: int, i: int, ingredient: dict) -> list:
+        self.ingredients[recipe][i] = ingredient
+        return self._recipe_changed(recipe)
+
+    def add_ingredient(self, recipe: int, ingredient: dict) -> list:
+        self.ingredients[recipe].append(ingredient)
+        return self._recipe_changed(recipe)
+
+    def remove_ingredient(self, recipe: int, i: int) -> list:
+        del self.ingredients[recipe][i]
+        return self._recipe_changed(recipe)
+
+    def replace_recipe(self, recipe: int, ingredients: list) -> list:
+        self.ingredients[recipe] = list(ingredients)
+        return self._recipe_changed(recipe)
+
+    def add_recipe(self, meal: int, ingredients: list) -> tuple:
+        """Append a recipe to a meal; returns (recipe index, flipped flags)."""
+        k = len(self.ingredients)
+        self.ingredients.append(list(ingredients)); self.alive.append(True)
+        self.parent["recipe"].append(meal); self.recipes_of[meal].append(k)
+        m = len(self.columns)
+        self.cents["recipe"] = np.vstack([self.cents["recipe"], np.zeros((1, m), dtype=np.int64)])
+        self.occurs["recipe"] = np.vstack([self.occurs["recipe"], np.zeros((1, m), dtype=np.int64)])
+        return k, self._recipe_changed(k)
+
+    def remove_recipe(self, recipe: int) -> list:
+        """Drop a recipe from its meal; its index stays reserved with zero totals."""
+        self.ingredients[recipe] = []
+        flipped = self._recipe_changed(recipe)
+        self.alive[recipe] = False
+        self.recipes_of[self.parent["recipe"][recipe]].remove(recipe)
+        return flipped
+
+    # ----- propagation -----
+    def _grow(self, m: int):
+        for store in (self.cents, self.occurs):
+            for lv, a in store.items():
+                store[lv] = np.hstack([a, np.zeros((a.shape[0], m - a.shape[1]), dtype=np.int64)])
+
+    def _recipe_changed(self, recipe: int) -> list:
+        total = sum_nutrients(self.ingredients[recipe])
+        col = self.columns.col
+        cs = [col(name) for name in total]
+        m = len(self.columns)
+        if m > self.cents["recipe"].shape[1]:
+            self._grow(m)
+        new = np.zeros(m, dtype=np.int64); new_has = np.zeros(m, dtype=np.int64)
+        new[cs] = [round(v * 100) for v in total.values()]; new_has[cs] = 1
+        delta = new - self.cents["recipe"][recipe]
+        d_has = new_has - self.occurs["recipe"][recipe]
+        flipped = []
+        k = recipe
+        for i, lv in enumerate(LEVELS[1:], 1):
+            self.cents[lv][k] += delta
+            occ = self.occurs[lv][k]
+            was = occ > 0
+            occ += d_has
+            changed = np.flatnonzero(delta)
+            if lv in self.limits and len(changed):
+                flipped += self._recheck(lv, k, changed)
+            if i == len(LEVELS) - 1:
+                break
+            d_has = (occ > 0).astype(np.int64) - was
+            k = self.parent[lv][k]
+        return flipped
+
+    def _recheck(self, lv: str, k: int, cols) -> list:
+        lim = self.limits[lv]; names = self.columns.names
+        row = self.cents[lv][k]
+        flipped = []
+        for c in cols.tolist():
+            cap = lim.get(names[c])
+            if cap is None:
+                continue
+            key = (lv, k, names[c])
+            now = bool(row[c] / 100 > cap)
+            if now != (key in self.flags):
+                (self.flags.add if now else self.flags.discard)(key)
+                flipped.append({"level": lv, "node": k, "nutrient": names[c], "total": float(row[c] / 100),
+                                "limit": cap, "violation": now})
+        return flipped
@@ -0,0 +1,96 @@
+import random
+
+from services.nutrition.calc import LEVELS, IncrementalPlan, PlanRollup, enforce_thresholds, sum_nutrients
+
+NUTRIENTS = ("kcal", "protein_g", "sodium_mg", "potassium_mg", "vit_a_mcg")
+
+
+def make_plan(rng, weeks=2):
+    return [{"days": [{"meals": [{"recipes": [{"ingredients": [
+        {"nutrients": {k: round(rng.uniform(0, 400), 2) for k in rng.sample(NUTRIENTS, rng.randint(0, len(NUTRIENTS)))}}
+        for _ in range(rng.randint(0, 5))]} for _ in range(rng.randint(1, 3))]} for _ in range(3)]} for _ in range(7)]}
+        for _ in range(weeks)]
+
+
+def test_rollup_matches_chained_sum_nutrients():
+    rng = random.Random(7)
+    plan = make_plan(rng)
+    r = PlanRollup(plan)
+    want = {"recipe": [], "meal": [], "day": [], "week": []}
+    for week in plan:
+        day_totals = []
+        for day in week["days"]:
+            meal_totals = []
+            for meal in day["meals"]:
+                recipe_totals = [sum_nutrients(rc["ingredients"]) for rc in meal["recipes"]]
+                want["recipe"] += recipe_totals
+                meal_totals.append(sum_nutrients([{"nutrients": t} for t in recipe_totals]))
+            want["meal"] += meal_totals
+            day_totals.append(sum_nutrients([{"nutrients": t} for t in meal_totals]))
+        want["day"] += day_totals
+        want["week"].append(sum_nutrients([{"nutrients": t} for t in day_totals]))
+    for level, totals in want.items():
+        assert [r.totals_dict(level, k) for k in range(len(totals))] == totals, level
+
+
+def test_thresholds_match_enforce_thresholds():
+    rng = random.Random(3)
+    plan = make_plan(rng, weeks=1)
+    r = PlanRollup(plan)
+    limits = {"sodium_mg": 900, "kcal": 1500, "fiber_g": -1}  # fiber_g never occurs
+    got = r.check_thresholds({"day": limits})["day"]
+    for k in range(r.counts[3]):
+        want = enforce_thresholds(r.totals_dict("day", k), limits)
+        assert got["violations"].get(k, {}) == want["violations"]
+        assert bool(got["hard_fail"][k]) == want["hard_fail"]
+
+
+def test_thresholds_on_a_plan_without_nutrients():
+    r = PlanRollup([{"days": [{"meals": [{"recipes": [{"ingredients": []}]}]}]}])
+    assert r.check_thresholds({"day": {"kcal": 5}})["day"]["violations"] == {}
+    got = r.check_thresholds({"recipe": {"kcal": -1}})["recipe"]
+    assert got["violations"] == {0: {"kcal": 0}} == {0: enforce_thresholds({}, {"kcal": -1})["violations"]}
+    assert PlanRollup([]).check_thresholds({"week": {"kcal": 5}})["week"]["violations"] == {}
+
+
+def with_recipes(plan, ingredients):
+    """plan with its recipes' ingredient lists replaced, in plan order."""
+    it = iter(ingredients)
+    return [{"days": [{"meals": [{"recipes": [{"ingredients": list(next(it))} for _ in meal["recipes"]]}
+                                 for meal in day["meals"]]} for day in week["days"]]} for week in plan]
+
+
+def test_incremental_edits_match_a_fresh_rollup():
+    rng = random.Random(11)
+    plan = make_plan(rng, weeks=1)
+    limits = {"day": {"sodium_mg": 1500, "kcal": 2500}, "week": {"sodium_mg": 9000}}
+    inc = IncrementalPlan(plan, limits)
+    for _ in range(200):
+        k = rng.randrange(len(inc.ingredients))
+        new = {"nutrients": {n: round(rng.uniform(0, 400), 2) for n in rng.sample(NUTRIENTS + ("fiber_g",), 2)}}
+        if inc.ingredients[k] and rng.random() < 0.4:
+            inc.remove_ingredient(k, rng.randrange(len(inc.ingredients[k])))
+        elif inc.ingredients[k] and rng.random() < 0.5:
+            inc.replace_ingredient(k, rng.randrange(len(inc.ingredients[k])), new)
+        else:
+            inc.add_ingredient(k, new)
+    fresh = PlanRollup(with_recipes(plan, inc.ingredients))
+    flags = set()
+    for level in LEVELS[1:]:
+        for k in range(fresh.counts[LEVELS.index(level)]):
+            want = fresh.totals_dict(level, k)
+            assert inc.totals_dict(level, k) == {n: round(v, 2) for n, v in want.items()}, (level, k)
+            flags |= {(level, k, n) for n in enforce_thresholds(want, limits.get(level, {}))["violations"]}
+    assert inc.flags == flags
+
+
+def test_edits_report_flipped_flags():
+    plan = [{"days": [{"meals": [{"recipes": [{"ingredients": [{"nutrients": {"sodium_mg": 600}}]}]}]}]}]
+    inc = IncrementalPlan(plan, {"day": {"sodium_mg": 1000}, "recipe": {"kcal": 900}})
+    assert inc.flags == set()
+    flipped = inc.add_ingredient(0, {"nutrients": {"sodium_mg": 500, "kcal": 100}})
+    assert flipped == [{"level": "day", "node": 0, "nutrient": "sodium_mg", "total": 1100.0, "limit": 1000,
+                        "violation": True}]
+    assert inc.add_ingredient(0, {"nutrients": {"protein_g": 5}}) == []  # no limit crosses
+    flipped = inc.remove_ingredient(0, 0)
+    assert [(f["level"], f["violation"]) for f in flipped] == [("day", False)] and inc.flags == set()
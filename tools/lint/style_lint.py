@@ -1,13 +1,168 @@
-import sys
+import json, os, sys
+from typing import Iterable, List, NamedTuple
 BANNED = ["just trust me", "probably fine"]
 VOICE = "friendly"
+
+# Banned phrases are compiled once into an Aho-Corasick DFA (case-insensitive),
+# so a text is scanned in one pass whatever the number of phrases, and input
+# can be fed in chunks: state, offsets and line/column carry across chunks.
+#
+#   python tools/lint/style_lint.py < cookbook.txt
+#   python tools/lint/style_lint.py --ndjson --field output < outputs.jsonl
+#   python tools/lint/style_lint.py --config phrases.json        # or STYLE_LINT_CONFIG=...
+
+CHUNK = 1 << 16
+
+
+class Match(NamedTuple):
+    phrase: str
+    offset: int  # character offset of the match start
+    line: int    # 1-based
+    col: int     # 1-based
+
+
+def load_banned(path: str = None) -> List[str]:
+    """Phrases from a JSON list / {"banned": [...]} file or a text file (one per line); BANNED without a path."""
+    path = path or os.environ.get("STYLE_LINT_CONFIG")
+    if not path:
+        return list(BANNED)
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    if path.endswith(".json"):
+        data = json.loads(raw)
+        return list(data["banned"] if isinstance(data, dict) else data)
+    return [ln.strip() for ln in raw.splitlines() if ln.strip() and not ln.lstrip().startswith("#")]
+
+
+def _lower(text: str) -> str:
+    low = text.lower()
+    if len(low) == len(text):
+        return low
+    # a few characters lower-case to two (e.g. 'İ'); keep offsets aligned
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class PhraseMatcher:
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = [p for p in dict.fromkeys(phrases) if p]
+        goto = [{}]; fail = [0]; out = [()]
+        for p in self.phrases:
+            s = 0
+            for ch in _lower(p):
+                nxt = goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(goto); goto[s][ch] = nxt; goto.append({}); fail.append(0); out.append(())
+                s = nxt
+            out[s] = out[s] + (p,)
+        # breadth-first: fail links, then fold them into a full transition table (a DFA)
+        order = list(goto[0].values()); k = 0
+        while k < len(order):
+            s = order[k]; k += 1
+            for ch, t in goto[s].items():
+                f = fail[s]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[t] = goto[f].get(ch, 0)
+                out[t] = out[t] + out[fail[t]]
+                order.append(t)
+        delta = [dict(g) for g in goto]
+        for s in order:  # parents before children, so fail[s] is complete
+            for ch, t in delta[fail[s]].items():
+                delta[s].setdefault(ch, t)
+        self.delta = delta; self.out = out
+        self.maxlen = max((len(p) for p in self.phrases), default=0)
+
+    def stream(self) -> "LintStream":
+        return LintStream(self)
+
+    def find(self, text: str) -> List[Match]:
+        st = self.stream()
+        return st.feed(text)
+
+    def find_many(self, texts: Iterable[str]) -> List[List[Match]]:
+        """Batch API: one match list per document."""
+        return [self.find(t) for t in texts]
+
+
+class LintStream:
+    """Incremental scan; feed() chunks in order and collect the matches each returns."""
+
+    def __init__(self, m: PhraseMatcher):
+        self.m = m; self.state = 0
+        self.offset = 0            # characters consumed so far
+        self.tail = ""             # last maxlen characters, for matches straddling chunks
+        self.tail_line = 1; self.tail_col = 1  # position of tail[0]
+
+    def feed(self, chunk: str) -> List[Match]:
+        delta = self.m.delta; out = self.m.out
+        s = self.state; hits = []
+        for i, ch in enumerate(_lower(chunk)):
+            s = delta[s].get(ch, 0)
+            if out[s]:
+                hits.append((i, out[s]))
+        self.state = s
+        buf = self.tail + chunk
+        base = self.offset - len(self.tail)  # global offset of buf[0]
+        matches = []
+        for i, phrases in hits:
+            end = len(self.tail) + i + 1      # buf index just past the match
+            for p in phrases:
+                b = end - len(p)
+                nl = buf.rfind("\n", 0, b)
+                line = self.tail_line + buf.count("\n", 0, b)
+                col = b - nl if nl >= 0 else self.tail_col + b
+                matches.append(Match(p, base + b, line, col))
+        # keep enough of the end of buf to place matches that finish in the next chunk
+        keep = max(self.m.maxlen - 1, 0)
+        cut = max(len(buf) - keep, 0)
+        nl = buf.rfind("\n", 0, cut)
+        self.tail_line += buf.count("\n", 0, cut)
+        self.tail_col = cut - nl if nl >= 0 else self.tail_col + cut
+        self.tail = buf[cut:]
+        self.offset += len(chunk)
+        return matches
+
+
+_DEFAULT = None
+
+def default_matcher() -> PhraseMatcher:
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = PhraseMatcher(load_banned())
+    return _DEFAULT
+
 def lint(txt: str):
     errs=[]
-    for b in BANNED:
-        if b.lower() in txt.lower(): errs.append(f"banned phrase: {b}")
+    found = {m.phrase for m in default_matcher().find(txt)}
+    for b in default_matcher().phrases:
+        if b in found: errs.append(f"banned phrase: {b}")
     return errs
+
+def lint_many(texts: Iterable[str]) -> List[List[Match]]:
+    return default_matcher().find_many(texts)
+
+
 if __name__=="__main__":
-    data=sys.stdin.read()
-    errs=lint(data)
-    if errs: print("\\n".join(errs)); sys.exit(1)
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", help="banned phrases: .json list or text file, one per line")
+    ap.add_argument("--ndjson", action="store_true", help="lint each input line as its own document")
+    ap.add_argument("--field", help="with --ndjson: lint this JSON field instead of the raw line")
+    a = ap.parse_args()
+    m = PhraseMatcher(load_banned(a.config))
+    n = 0
+    if a.ndjson:
+        for doc, line in enumerate(sys.stdin, 1):
+            text = json.loads(line).get(a.field, "") if a.field and line.strip() else line
+            for x in m.find(str(text)):
+                print(f"doc {doc}: banned phrase: {x.phrase} (line {x.line}, col {x.col}, offset {x.offset})"); n += 1
+    else:
+        st = m.stream()
+        while True:
+            chunk = sys.stdin.read(CHUNK)
+            if not chunk:
+                break
+            for x in st.feed(chunk):
+                print(f"banned phrase: {x.phrase} (line {x.line}, col {x.col}, offset {x.offset})"); n += 1
+    if n: sys.exit(1)
     print("OK"); sys.exit(0)